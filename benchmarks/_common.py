@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared benchmark helpers - timing and raw-SQL seeding of products,
+customers and sales
+
+The seeders insert straight through the writer connection (far faster
+than the DatabaseManager API) and store amounts in halalas, as
+DatabaseManager does.
+"""
+
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def timed(func: Callable, repeat: int = 5) -> float:
+    """Median wall time of ``repeat`` calls to ``func``, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def seed_products(manager, count: int, rng: Optional[random.Random] = None, start: int = 0, **columns):
+    """Insert ``count`` products numbered from ``start``
+
+    Keyword arguments set other columns or override the defaults; a
+    callable is called as ``value(i, rng)`` for each product.
+    """
+    rng = rng or random.Random(count)
+    values = {
+        'name': lambda i, _: f"P{i}",
+        'category': 'accessories',
+        'price': lambda i, rng: rng.randint(500, 300000),
+        'stock_quantity': lambda i, rng: rng.randint(0, 60),
+        'min_stock_level': 5,
+        'description': 'وصف المنتج بالتفصيل',
+    }
+    values.update(columns)
+    names = list(values)
+    rows = (tuple(value(i, rng) if callable(value) else value for value in values.values())
+            for i in range(start, start + count))
+    with manager.pool.writer() as conn:
+        conn.executemany(f"INSERT INTO products ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                         rows)
+
+
+def seed_customers(manager, count: int):
+    """Insert ``count`` customers with distinct phone numbers"""
+    with manager.pool.writer() as conn:
+        conn.executemany("INSERT INTO customers (name, phone) VALUES (?, ?)",
+                         ((f"customer {i}", f"05{i:08d}") for i in range(count)))
+
+
+def daily_times(rng: random.Random, start: datetime, days: int, per_day: int) -> Iterator[datetime]:
+    """``per_day`` times within opening hours (10 hours from ``start``'s time) on each of ``days`` days"""
+    for day in range(days):
+        for _ in range(per_day):
+            yield start + timedelta(days=day, seconds=rng.randint(0, 36000))
+
+
+def random_times(rng: random.Random, count: int, days: int = 365) -> Iterator[datetime]:
+    """``count`` times spread over the last ``days`` days"""
+    start = datetime.now() - timedelta(days=days)
+    for _ in range(count):
+        yield start + timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def seed_sales(manager, times: Iterable[datetime], rng: random.Random, customers: int = 0,
+               products: int = 0, notes: bool = False):
+    """Insert a sale at each of ``times``
+
+    Sales go to a random one of the first ``customers`` customers and
+    carry one line item of a random one of the first ``products``
+    products, when those are given.
+    """
+    def sales():
+        for created_at in times:
+            amount = rng.randint(1000, 500000)
+            yield (rng.randint(1, customers) if customers else None, amount, amount * 15 // 100,
+                   rng.choice(('cash', 'card', 'transfer')), "ملاحظة " * rng.randint(0, 8) if notes else None,
+                   created_at.strftime("%Y-%m-%d %H:%M:%S"))
+
+    insert = '''
+        INSERT INTO sales (customer_id, total_amount, discount_amount, tax_amount, payment_method, notes, created_at)
+        VALUES (?, ?, 0, ?, ?, ?, ?)
+    '''
+    with manager.pool.writer() as conn:
+        if not products:
+            conn.executemany(insert, sales())
+            return
+        for sale in sales():
+            sale_id = conn.execute(insert, sale).lastrowid
+            conn.execute('''
+                INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
+                VALUES (?, ?, 1, ?, ?)
+            ''', (sale_id, rng.randint(1, products), sale[1], sale[1]))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - disk used by a day of hourly backups: full copies vs. the
+incremental page chain, plus point-in-time restore time
+
+Usage: python benchmarks/bench_backup_chain.py [--products 200000] [--hours 24] [--sales-per-hour 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from database import backup_chain
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backup chain benchmark")
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--sales-per-hour', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'shop.db'))
+        manager.backup_dir = os.path.join(tmp, 'chains')
+        full_dir = os.path.join(tmp, 'full')
+        os.makedirs(full_dir)
+        manager.initialize_database()
+        with manager.pool.writer() as conn:
+            conn.executemany("INSERT INTO products (name, price, stock_quantity, description) VALUES (?, 50, 1000000, ?)",
+                             ((f"P{i}", f"وصف المنتج رقم {i} " * 8) for i in range(args.products)))
+        print(f"database {os.path.getsize(manager.db_path) / 1e6:.0f} MB, {args.hours} hourly backups")
+
+        full_seconds = chain_seconds = 0.0
+        for hour in range(args.hours):
+            manager.add_sales_batch([
+                ({'total_amount': 50.0, 'payment_method': 'cash'},
+                 [{'product_id': rng.randint(1, args.products), 'quantity': 1,
+                   'unit_price': 50.0, 'total_price': 50.0}])
+                for _ in range(args.sales_per_hour)
+            ])
+            start = time.perf_counter()
+            backup_chain.online_copy(manager.db_path, os.path.join(full_dir, f"{hour:02d}.db"))
+            full_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            manager.incremental_backup()
+            chain_seconds += time.perf_counter() - start
+
+        print(f"{'':<14} {'disk (MB)':>10} {'avg backup (s)':>15}")
+        print(f"{'full copies':<14} {dir_size(full_dir) / 1e6:>10.1f} {full_seconds / args.hours:>15.2f}")
+        print(f"{'page chain':<14} {dir_size(manager.backup_dir) / 1e6:>10.1f} {chain_seconds / args.hours:>15.2f}")
+
+        points = manager.list_restore_points()
+        middle = points[len(points) // 2]
+        target = os.path.join(tmp, 'restored.db')
+        start = time.perf_counter()
+        manager.restore_point_to_file(middle['chain'], middle['seq'], target)
+        restore_seconds = time.perf_counter() - start
+
+        # The restored file must match the full copy taken at the same hour
+        expected = sqlite3.connect(os.path.join(full_dir, f"{middle['seq']:02d}.db"))
+        restored = sqlite3.connect(target)
+        query = "SELECT COUNT(*), SUM(stock_quantity) FROM products"
+        assert expected.execute(query).fetchone() == restored.execute(query).fetchone()
+        assert restored.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        print(f"restore point #{middle['seq']} rebuilt in {restore_seconds:.2f}s and matches the full copy")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - branch sync cost against database size: after a first full
+sync, a day's changes (sales, price updates, new customers) are exported,
+carried over as a changeset file and imported at a second branch; compared
+with copying the whole database file
+
+Usage: python benchmarks/bench_branch_sync.py [--sales 50000 200000] [--changes 500]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import random_times, seed_customers, seed_products, seed_sales
+
+PRODUCTS = 2000
+
+
+def day_of_changes(manager: DatabaseManager, changes: int):
+    """Sales, with a price update and a new customer for every tenth"""
+    rng = random.Random(changes)
+    for i in range(changes):
+        product_id = rng.randint(1, PRODUCTS)
+        manager.add_sale({'total_amount': 99.5, 'payment_method': 'card'},
+                         [{'product_id': product_id, 'quantity': 1, 'unit_price': 99.5, 'total_price': 99.5}])
+        if i % 10 == 0:
+            product = manager.get_products_by_ids([product_id])[0]
+            product['price'] = product['price'] + 1
+            manager.update_product(product_id, product)
+            manager.add_customer({'name': f"new {i}", 'phone': f"06{i:08d}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Branch sync benchmark")
+    parser.add_argument('--sales', type=int, nargs='+', default=[50000, 200000])
+    parser.add_argument('--changes', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.changes} sales (+ {args.changes // 10} price updates and customers) after the first sync")
+    print(f"{'sales':>8} {'db (MiB)':>9} {'full (KiB)':>11} {'delta (KiB)':>12} "
+          f"{'export ms':>10} {'import ms':>10}")
+    for count in args.sales:
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = os.path.join(tmp, 'usb')
+            branches = []
+            for name in ('a', 'b'):
+                manager = DatabaseManager(os.path.join(tmp, name, 'shop.db'))
+                manager.initialize_database()
+                branches.append(manager)
+            main_branch, other = branches
+            rng = random.Random(25)
+            seed_products(main_branch, PRODUCTS, rng, stock_quantity=1000000, barcode=lambda i, _: f"B{i:06d}")
+            seed_customers(main_branch, count // 20)
+            seed_sales(main_branch, random_times(rng, count), rng, customers=count // 20, products=PRODUCTS)
+            full_path = main_branch.export_changeset(shared)
+            other.import_changesets(shared)
+            for manager in branches:
+                # Start the measured sync from a checkpointed WAL at both branches
+                with manager.pool.writer() as conn:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+            day_of_changes(main_branch, args.changes)
+            start = time.perf_counter()
+            delta_path = main_branch.export_changeset(shared)
+            export_time = time.perf_counter() - start
+            start = time.perf_counter()
+            stats = other.import_changesets(shared)
+            import_time = time.perf_counter() - start
+            assert stats['inserted'] >= args.changes and not stats['conflicts'] and not stats['pending']
+            assert other.count_sales() == main_branch.count_sales()
+
+            db_size = os.path.getsize(main_branch.db_path) / 2 ** 20
+            print(f"{count:>8} {db_size:>9.1f} {os.path.getsize(full_path) / 1024:>11.0f} "
+                  f"{os.path.getsize(delta_path) / 1024:>12.1f} {export_time * 1000:>10.1f} {import_time * 1000:>10.1f}")
+            for manager in branches:
+                manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - refreshing a large list after one edit: the full reload vs.
+the change_log rows since the last load, and what the change triggers
+cost a sale
+
+Usage: python benchmarks/bench_change_feed.py [--customers 50000] [--sales 3000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from database.migrations import migration_008_change_log
+from _common import timed
+
+
+def incremental(manager: DatabaseManager, since: int):
+    """What CustomersModule.refresh_data() fetches after an edit"""
+    changes, version = manager.get_changes(since, ['customers'])
+    return manager.get_customers_by_ids([row_id for _, row_id, _ in changes], row_format='record'), version
+
+
+def set_change_triggers(manager: DatabaseManager, enabled: bool):
+    with manager.pool.writer() as conn:
+        if enabled:
+            migration_008_change_log(conn.cursor())
+            return
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                    "AND name LIKE 'trg_%_change_%'").fetchall():
+            conn.execute(f"DROP TRIGGER {name}")
+
+
+def random_sale(rng: random.Random, customers: int):
+    return ({'customer_id': rng.randint(1, customers), 'total_amount': 50.0, 'payment_method': 'cash'},
+            [{'product_id': rng.randint(1, 1000), 'quantity': 1, 'unit_price': 50.0, 'total_price': 50.0}])
+
+
+def sell(manager: DatabaseManager, rng: random.Random, customers: int, count: int) -> float:
+    """Sales per second, one commit each"""
+    start = time.perf_counter()
+    for _ in range(count):
+        manager.add_sale(*random_sale(rng, customers))
+    return count / (time.perf_counter() - start)
+
+
+def statement_cost(manager: DatabaseManager, rng: random.Random, customers: int, count: int) -> float:
+    """Microseconds per sale inside one transaction, i.e. without the commit"""
+    sales = [random_sale(rng, customers) for _ in range(count)]
+    start = time.perf_counter()
+    with manager.pool.writer() as conn:
+        manager._insert_sales(conn.cursor(), sales)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change feed benchmark")
+    parser.add_argument('--customers', type=int, default=50000)
+    parser.add_argument('--sales', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        with manager.pool.writer() as conn:
+            conn.executemany("INSERT INTO customers (name, phone, city) VALUES (?, ?, 'الرياض')",
+                             ((f"عميل {i}", f"05{i:08d}") for i in range(args.customers)))
+            conn.executemany("INSERT INTO products (name, price, stock_quantity) VALUES (?, 50, 1000000)",
+                             ((f"P{i}",) for i in range(1000)))
+
+        since = manager.get_change_version()
+        with manager.pool.writer() as conn:
+            conn.execute("UPDATE customers SET loyalty_points = loyalty_points + 10 WHERE id = ?",
+                         (args.customers // 2,))
+        rows, version = incremental(manager, since)
+        assert len(rows) == 1 and version == since + 1
+
+        print(f"refresh after one edit, {args.customers:,} customers")
+        print(f"{'full reload':<24} {timed(lambda: manager.get_customers(row_format='record')) * 1000:>8.2f} ms")
+        print(f"{'changes since load':<24} {timed(lambda: incremental(manager, since)) * 1000:>8.2f} ms")
+
+        # Alternate rounds so WAL and cache drift affect both sides equally
+        rates = {False: [], True: []}
+        costs = {False: [], True: []}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                set_change_triggers(manager, enabled)
+                rates[enabled].append(sell(manager, rng, args.customers, args.sales // args.rounds))
+                costs[enabled].append(statement_cost(manager, rng, args.customers, args.sales // args.rounds))
+        for enabled, label in ((False, 'without change log'), (True, 'with change log')):
+            print(f"checkout {label:<19} {statistics.median(rates[enabled]):>8,.0f} sales/s "
+                  f"{statistics.median(costs[enabled]):>7.1f} us/sale before commit")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - pooled connections vs. a fresh sqlite3.connect per call
+
+Usage: python benchmarks/bench_connection_pool.py [--ops 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection_pool import ConnectionPool
+from database.db_manager import DatabaseManager
+from _common import seed_products
+
+
+class PerCallPool(ConnectionPool):
+    """Reproduces the old behaviour: a new connection for every call
+
+    Connections run the same on-connect hooks as the pool (the manager's
+    profile PRAGMAs and SQL functions), so both sides differ only in
+    reconnecting.
+    """
+
+    def _open(self) -> sqlite3.Connection:
+        conn = super()._open()
+        with self._lock:
+            # Closed by the caller, not kept for close_all()
+            self._all_connections.remove(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        return self._open()
+
+    @contextmanager
+    def reader(self):
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            yield held
+            return
+        conn = self._open()
+        self._local.reader = conn
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            conn.close()
+
+    @contextmanager
+    def snapshot(self, attach=None):
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            yield held
+            return
+        conn = self._open()
+        self._local.reader = conn
+        try:
+            for schema, path in (attach or {}).items():
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+                conn.execute("BEGIN")
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield conn
+        finally:
+            self._local.reader = None
+            conn.close()
+
+    @contextmanager
+    def writer(self):
+        if self.in_write():
+            with super().writer() as conn:
+                yield conn
+            return
+        with self._writer_lock:
+            # The base writer() uses this connection for one transaction
+            self._writer = self._open()
+            try:
+                with super().writer() as conn:
+                    yield conn
+            finally:
+                self._writer.close()
+                self._writer = None
+
+    def close_all(self):
+        pass
+
+
+def make_manager(db_path: str, per_call: bool) -> DatabaseManager:
+    manager = DatabaseManager(db_path)
+    if per_call:
+        manager.pool.close_all()
+        manager.pool = PerCallPool(db_path, on_connect=manager.pool.on_connect,
+                                   on_commit=manager.pool.on_commit)
+    manager.initialize_database()
+    return manager
+
+
+def measure(label: str, ops: int, func) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    elapsed = time.perf_counter() - start
+    rate = ops / elapsed if elapsed else float('inf')
+    print(f"  {label:<14} {rate:>10,.0f} ops/sec")
+    return rate
+
+
+def run(per_call: bool, ops: int, products: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(os.path.join(tmp, 'bench.db'), per_call)
+        seed_products(manager, products, category='phones', stock_quantity=1000000,
+                      barcode=lambda i, _: f"BC{i:08d}")
+        item = {'product_id': 1, 'quantity': 1, 'unit_price': 100.0, 'total_price': 100.0}
+
+        print("per-call connect:" if per_call else "pooled:")
+        results = {
+            'get_setting': measure('get_setting', ops, lambda i: manager.get_setting('tax_rate')),
+            'get_products': measure('get_products', max(1, ops // 10),
+                                    lambda i: manager.get_products(category='phones')),
+            'add_sale': measure('add_sale', max(1, ops // 4), lambda i: manager.add_sale(
+                {'total_amount': 100.0, 'payment_method': 'cash'}, [item])),
+        }
+        manager.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=200)
+    args = parser.parse_args()
+
+    baseline = run(True, args.ops, args.products)
+    pooled = run(False, args.ops, args.products)
+
+    print("speed-up:")
+    for name in baseline:
+        print(f"  {name:<14} {pooled[name] / baseline[name]:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
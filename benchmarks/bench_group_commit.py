@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - sustained add_sale throughput from several tills at once, one
+transaction per sale vs. group commit (writes arriving within 5 ms share a
+transaction), with per-sale latency percentiles; per profile
+
+Usage: python benchmarks/bench_group_commit.py [--tills 8] [--seconds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+
+SALE = ({'total_amount': 99.5, 'tax_amount': 14.93, 'payment_method': 'cash'},
+        [{'product_id': 1, 'quantity': 1, 'unit_price': 99.5, 'total_price': 99.5}])
+
+
+def till(manager: DatabaseManager, deadline: float, latencies: list):
+    """add_sale back to back until ``deadline``"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        manager.add_sale(*SALE)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def run(manager: DatabaseManager, tills: int, seconds: float) -> dict:
+    latencies = [[] for _ in range(tills)]
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=till, args=(manager, deadline, latencies[i])) for i in range(tills)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    merged = sorted(latency for per_till in latencies for latency in per_till)
+    return {'sales': len(merged), 'rate': len(merged) / seconds, 'p50': statistics.median(merged),
+            'p99': merged[int(len(merged) * 0.99) - 1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group commit benchmark")
+    parser.add_argument('--tills', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.tills} tills calling add_sale back to back; latency in ms")
+    print(f"{'profile':<12} {'commit':<8} {'sales':>7} {'sales/s':>9} {'p50':>7} {'p99':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ('balanced', 'safe'):
+            for grouped in (False, True):
+                manager = DatabaseManager(os.path.join(tmp, f'{profile}_{grouped}', 'bench.db'), profile=profile)
+                manager.initialize_database()
+                manager.add_product({'name': 'bench', 'price': 99.5, 'stock_quantity': 10000000})
+                if grouped:
+                    manager.enable_group_commit()
+                result = run(manager, args.tills, args.seconds)
+                count = manager.count_sales()
+                manager.close()
+                assert count == result['sales']
+                print(f"{profile:<12} {'group' if grouped else 'single':<8} {result['sales']:>7} "
+                      f"{result['rate']:>9.0f} {result['p50']:>7.2f} {result['p99']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - inventory summary cards at growing catalog sizes: product
+columns plus numpy math vs. the trigger-maintained inventory_stats row
+
+Requires numpy for the columns baseline.
+
+Usage: python benchmarks/bench_inventory_stats.py [--sizes 10000 100000 500000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import seed_products, timed
+
+
+def columns_summary(manager: DatabaseManager):
+    """The summary math before the counters"""
+    products = manager.get_products(row_format='columns')
+    stock = products['stock_quantity']
+    return (len(products['id']), float((products['price'] * stock).sum()),
+            int((stock <= products['min_stock_level']).sum()), int((stock <= 0).sum()))
+
+
+def counters_summary(manager: DatabaseManager):
+    stats = manager.get_inventory_stats()
+    return (stats['product_count'], stats['stock_value'],
+            stats['low_stock_count'], stats['out_of_stock_count'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventory counters benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+
+        print(f"{'products':>9} {'columns (ms)':>13} {'counters (ms)':>14}")
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed_products(manager, size - seeded, rng, start=seeded)
+            seeded = size
+            before, after = columns_summary(manager), counters_summary(manager)
+            assert before[0] == after[0] and before[2:] == after[2:]
+            assert abs(before[1] - after[1]) < 0.01 * max(before[1], 1) * 1e-6
+            assert manager.check_inventory_stats() == {}
+            print(f"{size:>9,} {timed(lambda: columns_summary(manager)) * 1000:>13.1f} "
+                  f"{timed(lambda: counters_summary(manager)) * 1000:>14.3f}")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
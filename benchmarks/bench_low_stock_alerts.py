@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - low stock detection: the old full-scan poll vs. the
+trigger-recorded alerts, and what the post-commit alert check costs a sale
+
+Usage: python benchmarks/bench_low_stock_alerts.py [--products 200000] [--sales 3000] [--low-share 0.01]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import timed
+
+
+def scan(manager: DatabaseManager):
+    """The five-minute poll before the alerts table"""
+    with manager.pool.reader() as conn:
+        return conn.execute('''
+            SELECT * FROM products WHERE stock_quantity <= min_stock_level ORDER BY stock_quantity ASC
+        ''').fetchall()
+
+
+def sell(manager: DatabaseManager, rng: random.Random, products: int, count: int) -> float:
+    """Sales per second, one commit each"""
+    start = time.perf_counter()
+    for _ in range(count):
+        manager.add_sale({'total_amount': 50.0, 'payment_method': 'cash'},
+                         [{'product_id': rng.randint(1, products), 'quantity': 1,
+                           'unit_price': 50.0, 'total_price': 50.0}])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Low stock alerts benchmark")
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--sales', type=int, default=3000)
+    parser.add_argument('--low-share', type=float, default=0.01)
+    parser.add_argument('--rounds', type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        with manager.pool.writer() as conn:
+            conn.executemany('''
+                INSERT INTO products (name, price, stock_quantity, min_stock_level, description)
+                VALUES (?, 50, ?, 5, 'وصف المنتج بالتفصيل')
+            ''', ((f"P{i}", rng.randint(0, 5) if rng.random() < args.low_share else rng.randint(6, 200))
+                  for i in range(args.products)))
+
+        assert len(scan(manager)) == len(manager.get_low_stock_products())
+        print(f"{args.products:,} products, {len(scan(manager)):,} at or below minimum")
+        print(f"{'full-scan poll':<24} {timed(lambda: scan(manager)) * 1000:>8.1f} ms")
+        print(f"{'alerts-backed list':<24} {timed(manager.get_low_stock_products) * 1000:>8.1f} ms")
+
+        # Alternate rounds so WAL and cache drift affect both sides equally
+        crossings = []
+        rates = {False: [], True: []}
+        for _ in range(args.rounds):
+            for listening in (False, True):
+                if listening:
+                    manager.add_low_stock_listener(crossings.extend)
+                rates[listening].append(sell(manager, rng, args.products, args.sales // args.rounds))
+                if listening:
+                    manager.remove_low_stock_listener(crossings.extend)
+        print(f"checkout without listener {statistics.median(rates[False]):>8,.0f} sales/s")
+        print(f"checkout with listener    {statistics.median(rates[True]):>8,.0f} sales/s "
+              f"({len(crossings)} crossings reported as they committed)")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
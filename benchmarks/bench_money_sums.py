@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - summing sale amounts stored as REAL currency units vs. INTEGER
+halalas: aggregate speed, and how far REAL totals (a SUM, and a running
+total like the rollup triggers keep) drift from exact
+
+Usage: python benchmarks/bench_money_sums.py [--sales 2000000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.money import MINOR_UNITS
+from _common import timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Money column aggregation benchmark")
+    parser.add_argument('--sales', type=int, default=2000000)
+    parser.add_argument('--days', type=int, default=730)
+    args = parser.parse_args()
+
+    rng = random.Random(19)
+    halalas = [rng.randint(100, 500000) for _ in range(args.sales)]
+    days = [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(args.days)]
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        for table, scale in (('sales_real', MINOR_UNITS), ('sales_minor', 1)):
+            conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, day TEXT, total_amount DECIMAL(10,2))")
+            conn.executemany(f"INSERT INTO {table} (day, total_amount) VALUES (?, ?)",
+                             ((days[i % args.days], amount / scale) for i, amount in enumerate(halalas)))
+        conn.commit()
+
+        exact = sum(halalas)
+        real_total = conn.execute("SELECT SUM(total_amount) FROM sales_real").fetchone()[0]
+        minor_total = conn.execute("SELECT SUM(total_amount) FROM sales_minor").fetchone()[0]
+        assert minor_total == exact
+        print(f"{args.sales:,} sales, exact total {exact // MINOR_UNITS:,}.{exact % MINOR_UNITS:02d}")
+        print(f"REAL total drift     {abs(real_total * MINOR_UNITS - exact):.4f} halalas")
+        print(f"INTEGER total drift  {minor_total - exact} halalas")
+
+        # What the rollup triggers do: add each sale to a stored running total
+        for table, scale in (('running_real', MINOR_UNITS), ('running_minor', 1)):
+            conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, gross DECIMAL(12,2))")
+            conn.execute(f"INSERT INTO {table} VALUES (1, 0)")
+            conn.executemany(f"UPDATE {table} SET gross = gross + ? WHERE id = 1",
+                             ((amount / scale,) for amount in halalas))
+        running_real = conn.execute("SELECT gross FROM running_real").fetchone()[0]
+        running_minor = conn.execute("SELECT gross FROM running_minor").fetchone()[0]
+        assert running_minor == exact
+        print(f"REAL running total drift     {abs(running_real * MINOR_UNITS - exact):.4f} halalas")
+        print(f"INTEGER running total drift  {running_minor - exact} halalas")
+
+        for label, query in (("SUM over all sales", "SELECT SUM(total_amount) FROM {table}"),
+                             ("SUM per day", "SELECT day, SUM(total_amount) FROM {table} GROUP BY day")):
+            real = timed(lambda: conn.execute(query.format(table='sales_real')).fetchall())
+            minor = timed(lambda: conn.execute(query.format(table='sales_minor')).fetchall())
+            print(f"{label:<20} REAL {real * 1000:>8.1f} ms   INTEGER {minor * 1000:>8.1f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
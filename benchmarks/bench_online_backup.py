@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - checkout latency while an online backup runs
+
+Seeds a database, then records add_sale latency with no backup running
+and while backup_database() copies the file on another thread.
+
+Usage: python benchmarks/bench_online_backup.py [--products 200000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+
+
+def checkout_latencies(manager: DatabaseManager, stop: threading.Event, limit: int) -> list:
+    sale_items = [{'product_id': 1, 'quantity': 1, 'unit_price': 50.0, 'total_price': 50.0}]
+    latencies = []
+    while not stop.is_set() and len(latencies) < limit:
+        start = time.perf_counter()
+        manager.add_sale({'total_amount': 50.0, 'payment_method': 'cash'}, sale_items)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def describe(name: str, latencies: list, seconds: float):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<16} {len(latencies) / seconds:>9.0f}/s {statistics.median(latencies):>8.2f} {p99:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup benchmark")
+    parser.add_argument('--products', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.backup_dir = tmp
+        manager.initialize_database()
+        with manager.pool.writer() as conn:
+            conn.executemany("INSERT INTO products (name, price, stock_quantity, description) VALUES (?, 50, 1000000, ?)",
+                             ((f"P{i}", "وصف " * 60) for i in range(args.products)))
+        print(f"database {os.path.getsize(manager.db_path) / 1e6:.0f} MB")
+        print(f"{'':<16} {'sales':>11} {'p50 (ms)':>8} {'p99 (ms)':>8}")
+
+        start = time.perf_counter()
+        idle = checkout_latencies(manager, threading.Event(), 2000)
+        describe("no backup", idle, time.perf_counter() - start)
+
+        steps = []
+        stop = threading.Event()
+
+        def backup():
+            manager.backup_database(progress=lambda copied, total: steps.append(copied))
+            stop.set()
+
+        worker = threading.Thread(target=backup)
+        start = time.perf_counter()
+        worker.start()
+        during = checkout_latencies(manager, stop, 10 ** 9)
+        worker.join()
+        elapsed = time.perf_counter() - start
+        describe("during backup", during, elapsed)
+        print(f"backup took {elapsed:.2f}s in {len(steps)} progress steps")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
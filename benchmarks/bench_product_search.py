@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - products screen search latency (FTS5) vs. the old LIKE scan
+
+Usage: python benchmarks/bench_product_search.py [--products 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import seed_products, timed
+
+BRANDS = ['سامسونج', 'أبل', 'هواوي', 'شاومي', 'أوبو', 'Nokia', 'Realme']
+WORDS = ['هاتف', 'شاحن', 'سماعة', 'غطاء', 'كابل', 'شاشة', 'بطارية', 'حافظة', 'لاصقة']
+QUERIES = ['سام', 'ابل', 'شاحن سريع', 'هاتف هواوي', 'حافظه', 'nok', 'بطاريه اصليه']
+
+
+def like_search(manager: DatabaseManager, term: str):
+    pattern = f"%{term}%"
+    with manager.pool.reader() as conn:
+        return conn.execute('''
+            SELECT * FROM products
+            WHERE name LIKE ? OR brand LIKE ? OR model LIKE ? OR barcode LIKE ?
+            ORDER BY name LIMIT 200
+        ''', [pattern] * 4).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        seed_products(manager, args.products, random.Random(42),
+                      name=lambda i, rng: f"{rng.choice(WORDS)} {rng.choice(['سريع', 'أصلي', 'مقاوم'])} {i}",
+                      brand=lambda i, rng: rng.choice(BRANDS), model=lambda i, _: f"M{i % 500}",
+                      stock_quantity=5, barcode=lambda i, _: f"{6000000000000 + i}",
+                      description=lambda i, rng: f"{rng.choice(WORDS)} أصلية ضمان سنة")
+
+        print(f"{args.products:,} products")
+        print(f"{'query':<16} {'LIKE (ms)':>10} {'ranked (ms)':>12} {'page (ms)':>10} {'hits':>6}")
+        for term in QUERIES:
+            like_ms = timed(lambda: like_search(manager, term)) * 1000
+            ranked_ms = timed(lambda: manager.search_products(term)) * 1000
+            page_ms = timed(lambda: manager.get_products_page(term, limit=200)) * 1000
+            hits = len(manager.search_products(term))
+            print(f"{term:<16} {like_ms:>10.2f} {ranked_ms:>12.2f} {page_ms:>10.2f} {hits:>6}")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
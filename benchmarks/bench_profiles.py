@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - add_sale throughput and get_sales_report latency per profile
+
+Usage: python benchmarks/bench_profiles.py [--sales 2000] [--reports 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from database.profiles import PERFORMANCE_PROFILES
+
+
+def run_profile(profile: str, sales: int, reports: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'), profile=profile)
+        manager.initialize_database()
+        manager.add_product({
+            'name': 'Phone', 'price': 100.0, 'cost': 80.0,
+            'stock_quantity': 10 ** 9, 'barcode': 'BC1'
+        })
+        item = {'product_id': 1, 'quantity': 1, 'unit_price': 100.0, 'total_price': 100.0}
+
+        start = time.perf_counter()
+        for _ in range(sales):
+            manager.add_sale({'total_amount': 100.0, 'payment_method': 'cash'}, [item])
+        throughput = sales / (time.perf_counter() - start)
+
+        timings = []
+        for _ in range(reports):
+            start = time.perf_counter()
+            manager.get_sales_report('2000-01-01', '2100-01-01')
+            timings.append((time.perf_counter() - start) * 1000)
+
+        manager.close()
+        return throughput, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--reports', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'profile':<16} {'add_sale/sec':>14} {'report p50 (ms)':>16}")
+    for profile in PERFORMANCE_PROFILES:
+        throughput, latency = run_profile(profile, args.sales, args.reports)
+        print(f"{profile:<16} {throughput:>14,.0f} {latency:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - sales/inventory report aggregation over dict rows vs. numpy columns
+
+Covers the fetch plus the summary and daily-chart math of ReportsModule
+(table rendering is Qt work and is left out). Requires numpy.
+
+Usage: python benchmarks/bench_report_columns.py [--days 365] [--per-day 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import daily_times, seed_customers, seed_products, seed_sales, timed
+
+
+def fetch_dicts(manager: DatabaseManager, start: str, end: str):
+    return manager.get_sales_report(start, end), manager.get_products()
+
+
+def fetch_columns(manager: DatabaseManager, start: str, end: str):
+    return (manager.get_sales_report(start, end, row_format='columns'),
+            manager.get_products(row_format='columns'))
+
+
+def dict_math(sales, products):
+    """The report math before the columns format"""
+    total_sales = sum(s['total_amount'] for s in sales)
+    total_tax = sum(s['tax_amount'] for s in sales)
+    daily_sales = {}
+    for sale in sales:
+        date = sale['created_at'][:10]
+        daily_sales[date] = daily_sales.get(date, 0) + sale['total_amount']
+
+    total_value = sum(p['price'] * p['stock_quantity'] for p in products if p['price'] and p['stock_quantity'])
+    low_stock = len([p for p in products if p['stock_quantity'] <= p['min_stock_level']])
+    return total_sales, total_tax, len(daily_sales), total_value, low_stock
+
+
+def columns_math(sales, products):
+    total_sales = float(sales['total_amount'].sum())
+    total_tax = float(sales['tax_amount'].sum())
+    days, day_index = np.unique(sales['created_at'].astype('datetime64[D]'), return_inverse=True)
+    np.bincount(day_index, weights=sales['total_amount'])
+
+    stock = products['stock_quantity']
+    total_value = float(np.dot(products['price'], stock))
+    low_stock = int(np.count_nonzero(stock <= products['min_stock_level']))
+    return total_sales, total_tax, len(days), total_value, low_stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report aggregation benchmark")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=300)
+    parser.add_argument('--products', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        rng = random.Random(3)
+        seed_customers(manager, 500)
+        seed_products(manager, args.products, rng)
+        seed_sales(manager, daily_times(rng, datetime(2025, 1, 1, 9), args.days, args.per_day), rng,
+                   customers=500, notes=True)
+
+        start, end = "2025-01-01", "2025-12-31"
+        dicts, columns = fetch_dicts(manager, start, end), fetch_columns(manager, start, end)
+        before, after = dict_math(*dicts), columns_math(*columns)
+        assert all(abs(x - y) <= 1e-6 * max(abs(x), 1) for x, y in zip(before, after)), (before, after)
+
+        print(f"{args.days * args.per_day:,} sales, {args.products:,} products")
+        print(f"{'':<9} {'fetch (ms)':>11} {'math (ms)':>10} {'total (ms)':>11}")
+        results = {}
+        for name, fetch, math in (('dict', fetch_dicts, dict_math), ('columns', fetch_columns, columns_math)):
+            fetch_s = timed(lambda: fetch(manager, start, end), repeat=3)
+            data = fetch(manager, start, end)
+            math_s = timed(lambda: math(*data), repeat=3)
+            results[name] = (fetch_s, math_s)
+            print(f"{name:<9} {fetch_s * 1000:>11.0f} {math_s * 1000:>10.1f} {(fetch_s + math_s) * 1000:>11.0f}")
+        (dict_fetch, dict_m), (col_fetch, col_m) = results['dict'], results['columns']
+        print(f"speedup   {dict_fetch / col_fetch:>10.1f}x {dict_m / col_m:>9.1f}x "
+              f"{(dict_fetch + dict_m) / (col_fetch + col_m):>10.1f}x")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
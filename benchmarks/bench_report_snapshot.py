@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - checkout latency while a heavy report runs: add_sale p50/p99
+alone, with a report thread looping over per-product and per-day sales
+aggregates, and with the report also loading a year of sales rows into
+Python; per profile (rollback journal vs. WAL with the report on its read
+snapshot)
+
+Usage: python benchmarks/bench_report_snapshot.py [--sales 300000] [--seconds 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import random_times, seed_products, seed_sales
+
+SALE = ({'total_amount': 99.5, 'tax_amount': 14.93, 'payment_method': 'cash'},
+        [{'product_id': 1, 'quantity': 1, 'unit_price': 99.5, 'total_price': 99.5}])
+
+
+def heavy_report(manager: DatabaseManager, rows: bool):
+    """Per-product and per-day aggregates (and a year of sales rows), read from one snapshot"""
+    start = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+    with manager.report_snapshot():
+        with manager.pool.reader() as conn:
+            conn.execute('''
+                SELECT si.product_id, COUNT(*), SUM(si.total_price), AVG(s.total_amount)
+                FROM sale_items si JOIN sales s ON s.id = si.sale_id
+                GROUP BY si.product_id ORDER BY 3 DESC
+            ''').fetchall()
+            conn.execute("SELECT business_date, COUNT(*), SUM(total_amount) FROM sales GROUP BY 1").fetchall()
+        if rows:
+            manager.get_sales_report(start, row_format='tuple')
+
+
+def checkouts(manager: DatabaseManager, seconds: float) -> dict:
+    """add_sale at a till's pace for ``seconds``; latency percentiles in ms"""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            manager.add_sale(*SALE)
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    latencies.sort()
+    return {'count': len(latencies), 'errors': errors, 'p50': statistics.median(latencies),
+            'p99': latencies[int(len(latencies) * 0.99) - 1], 'max': latencies[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout latency under report load")
+    parser.add_argument('--sales', type=int, default=300000)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data', 'bench.db')
+        seeder = DatabaseManager(path)
+        seeder.initialize_database()
+        rng = random.Random(23)
+        seed_products(seeder, 200, rng, price=9950, stock_quantity=10000000)
+        seed_sales(seeder, random_times(rng, args.sales), rng, products=200)
+        seeder.close()
+
+        print(f"{args.sales:,} sales; add_sale latency in ms")
+        print(f"{'profile':<12} {'load':<8} {'sales':>6} {'errors':>6} {'p50':>7} {'p99':>7} {'max':>8} {'reports':>8}")
+        for profile in ('safe', 'balanced'):
+            manager = DatabaseManager(path, profile=profile)
+            manager.initialize_database()
+            # A lock wait shows up as latency, bounded like a real till would be
+            manager.pool.timeout = 2.0
+            manager.pool.close_all()
+            for load, rows in (('idle', None), ('report', False), ('rows', True)):
+                stop = threading.Event()
+                reports = []
+
+                def run_reports():
+                    while not stop.is_set():
+                        try:
+                            heavy_report(manager, rows)
+                            reports.append(1)
+                        except sqlite3.OperationalError:
+                            pass
+
+                worker = threading.Thread(target=run_reports)
+                if rows is not None:
+                    worker.start()
+                    time.sleep(0.5)
+                result = checkouts(manager, args.seconds)
+                stop.set()
+                if rows is not None:
+                    worker.join()
+                print(f"{profile:<12} {load:<8} {result['count']:>6} {result['errors']:>6} "
+                      f"{result['p50']:>7.2f} {result['p99']:>7.2f} {result['max']:>8.2f} {len(reports):>8}")
+            manager.close()
+
+
+if __name__ == "__main__":
+    main()
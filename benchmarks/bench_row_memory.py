@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - memory held by a full product listing as dicts, records and tuples
+
+Usage: python benchmarks/bench_row_memory.py [--products 100000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import seed_products
+
+
+def measure(manager: DatabaseManager, row_format: str):
+    """Return (MB still held by the list, seconds to fetch it)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    products = manager.get_products(row_format=row_format)
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del products
+    return held / (1024 * 1024), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        seed_products(manager, args.products, name=lambda i, _: f"هاتف ذكي {i}", brand='سامسونج',
+                      model=lambda i, _: f"SM-{i % 900}", category='smartphones', price=150000, cost=120000,
+                      stock_quantity=lambda i, _: i % 40, barcode=lambda i, _: f"{6000000000000 + i}",
+                      description="شاشة 6.5 بوصة، ذاكرة 128 جيجا، كاميرا ثلاثية، ضمان سنتين")
+
+        print(f"{args.products:,} products")
+        print(f"{'format':<8} {'MB held':>9} {'fetch (s)':>10} {'vs dict':>8}")
+        baseline = None
+        for row_format in ('dict', 'record', 'tuple'):
+            held, elapsed = measure(manager, row_format)
+            baseline = baseline or held
+            print(f"{row_format:<8} {held:>9.1f} {elapsed:>10.2f} {held / baseline:>7.0%}")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
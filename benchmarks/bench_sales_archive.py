@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - four years of sales before and after archiving everything
+older than 18 months: live database size, report latency for a recent
+month, and for a month that now lives in an archive file
+
+Usage: python benchmarks/bench_sales_archive.py [--days 1460] [--per-day 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import daily_times, seed_products, seed_sales, timed
+
+
+def live_size(manager: DatabaseManager) -> float:
+    """MiB of pages in use (the file keeps freed pages for new sales until VACUUM)"""
+    with manager.pool.reader() as conn:
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return pages * page_size / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales archive benchmark")
+    parser.add_argument('--days', type=int, default=1460)
+    parser.add_argument('--per-day', type=int, default=200)
+    args = parser.parse_args()
+
+    today = datetime.now()
+    recent = ((today - timedelta(days=30)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"))
+    old = ((today - timedelta(days=900)).strftime("%Y-%m-%d"), (today - timedelta(days=870)).strftime("%Y-%m-%d"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'data', 'bench.db'))
+        manager.initialize_database()
+        rng = random.Random(22)
+        seed_products(manager, 1, rng, stock_quantity=0)
+        start = today.replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+        seed_sales(manager, daily_times(rng, start, args.days, args.per_day), rng, products=1, notes=True)
+
+        def measure():
+            return (live_size(manager),
+                    timed(lambda: manager.get_sales_report(*recent, by_business_date=True)),
+                    timed(lambda: manager.get_sales_report(*old, by_business_date=True)),
+                    len(manager.get_sales_report(*old, by_business_date=True)),
+                    manager.count_sales())
+
+        before = measure()
+        start = time.perf_counter()
+        moved = manager.archive_sales()
+        archive_time = time.perf_counter() - start
+        after = measure()
+        assert (before[3], before[4]) == (after[3], after[4])
+        assert not manager.check_sales_rollups()
+
+        print(f"{args.days * args.per_day:,} sales; archived {sum(moved.values()):,} "
+              f"in {len(moved)} year files in {archive_time:.1f} s")
+        print(f"{'':<28} {'before':>10} {'after':>10}")
+        print(f"{'live data (MiB)':<28} {before[0]:>10.1f} {after[0]:>10.1f}")
+        print(f"{'recent month report (ms)':<28} {before[1] * 1000:>10.1f} {after[1] * 1000:>10.1f}")
+        print(f"{'archived month report (ms)':<28} {before[2] * 1000:>10.1f} {after[2] * 1000:>10.1f}")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - sales/sec for the old per-item add_sale loop, the batched
+add_sale and add_sales_batch
+
+Usage: python benchmarks/bench_sales_ingest.py [--sales 3000] [--items 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+
+
+def legacy_add_sale(manager: DatabaseManager, sale_data: dict, sale_items: list) -> int:
+    """The add_sale implementation before batching: one statement per item"""
+    with manager.pool.writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO sales (customer_id, total_amount, discount_amount,
+                             tax_amount, payment_method, status, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (sale_data.get('customer_id'), sale_data.get('total_amount'),
+              sale_data.get('discount_amount', 0), sale_data.get('tax_amount', 0),
+              sale_data.get('payment_method'), sale_data.get('status', 'completed'),
+              sale_data.get('notes')))
+        sale_id = cursor.lastrowid
+        for item in sale_items:
+            cursor.execute('''
+                INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (sale_id, item['product_id'], item['quantity'],
+                  item['unit_price'], item['total_price']))
+            cursor.execute('''
+                UPDATE products SET stock_quantity = stock_quantity - ?
+                WHERE id = ?
+            ''', (item['quantity'], item['product_id']))
+        if sale_data.get('customer_id'):
+            cursor.execute('''
+                UPDATE customers SET
+                    total_purchases = total_purchases + ?,
+                    loyalty_points = loyalty_points + ?
+                WHERE id = ?
+            ''', (sale_data.get('total_amount'), int(sale_data.get('total_amount', 0) / 10),
+                  sale_data.get('customer_id')))
+        return sale_id
+
+
+def make_sales(count: int, items: int, products: int, customers: int) -> list:
+    rng = random.Random(7)
+    sales = []
+    for _ in range(count):
+        sale_items = [{'product_id': rng.randint(1, products), 'quantity': 1,
+                       'unit_price': 50.0, 'total_price': 50.0} for _ in range(items)]
+        sales.append(({'customer_id': rng.randint(1, customers), 'total_amount': 50.0 * items,
+                       'payment_method': 'cash'}, sale_items))
+    return sales
+
+
+def run(mode: str, sales: list, products: int, customers: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        manager.upsert_products({'name': f"P{i}", 'barcode': f"B{i}", 'price': 50.0,
+                                 'stock_quantity': 10 ** 9} for i in range(products))
+        with manager.pool.writer() as conn:
+            conn.executemany("INSERT INTO customers (name, phone) VALUES (?, ?)",
+                             [(f"C{i}", f"05{i:08d}") for i in range(customers)])
+
+        start = time.perf_counter()
+        if mode == 'legacy add_sale':
+            for sale_data, sale_items in sales:
+                legacy_add_sale(manager, sale_data, sale_items)
+        elif mode == 'add_sale':
+            for sale_data, sale_items in sales:
+                manager.add_sale(sale_data, sale_items)
+        else:
+            manager.add_sales_batch(sales)
+        rate = len(sales) / (time.perf_counter() - start)
+        manager.close()
+        return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales ingest benchmark")
+    parser.add_argument('--sales', type=int, default=3000)
+    parser.add_argument('--items', type=int, default=4)
+    args = parser.parse_args()
+
+    sales = make_sales(args.sales, args.items, products=500, customers=200)
+    baseline = None
+    for mode in ('legacy add_sale', 'add_sale', 'add_sales_batch'):
+        rate = run(mode, sales, products=500, customers=200)
+        baseline = baseline or rate
+        print(f"{mode:<16} {rate:>10,.0f} sales/sec {rate / baseline:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
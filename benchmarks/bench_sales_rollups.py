@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - sales summary and daily chart data over two years: scanning
+every sale vs. reading the trigger-maintained rollups, plus the cost the
+rollup triggers add to checkout writes
+
+Usage: python benchmarks/bench_sales_rollups.py [--days 730] [--per-day 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+from _common import daily_times, seed_sales, timed
+
+
+def scan(manager: DatabaseManager, start: str, end: str):
+    """The summary and chart math before the rollups: group every sale in Python"""
+    sales = manager.get_sales_report(start, end, by_business_date=True)
+    daily_sales = {}
+    for sale in sales:
+        daily_sales[sale['business_date']] = daily_sales.get(sale['business_date'], 0) + sale['total_amount']
+    return len(sales), sum(s['total_amount'] for s in sales), daily_sales
+
+
+def rollup(manager: DatabaseManager, start: str, end: str):
+    totals = manager.get_sales_rollup(start, end)
+    daily_sales = {row['period']: row['gross'] for row in totals}
+    return sum(row['sale_count'] for row in totals), sum(row['gross'] for row in totals), daily_sales
+
+
+def checkout_rate(manager: DatabaseManager, count: int) -> float:
+    """Sales per second through add_sale, one commit each"""
+    start = time.perf_counter()
+    for i in range(count):
+        manager.add_sale({'total_amount': 99.5, 'tax_amount': 14.93, 'payment_method': 'cash'},
+                         [{'product_id': 1, 'quantity': 1, 'unit_price': 99.5, 'total_price': 99.5}])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales rollup benchmark")
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--per-day', type=int, default=300)
+    parser.add_argument('--checkouts', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        manager.initialize_database()
+        rng = random.Random(7)
+        seed_sales(manager, daily_times(rng, datetime(2024, 1, 1, 9), args.days, args.per_day), rng)
+        manager.add_product({'name': 'P', 'price': 99.5, 'stock_quantity': 10 ** 9})
+
+        start, end = "2024-01-01", "2025-12-31"
+        scanned, rolled = scan(manager, start, end), rollup(manager, start, end)
+        assert scanned[0] == rolled[0] and abs(scanned[1] - rolled[1]) < 0.01 * len(rolled[2])
+        assert scanned[2].keys() == rolled[2].keys()
+
+        print(f"{scanned[0]:,} sales over {len(rolled[2])} days")
+        scan_s = timed(lambda: scan(manager, start, end), repeat=3)
+        rollup_s = timed(lambda: rollup(manager, start, end), repeat=3)
+        print(f"{'scan every sale':<18} {scan_s * 1000:>9.1f} ms")
+        print(f"{'read rollups':<18} {rollup_s * 1000:>9.1f} ms  ({scan_s / rollup_s:,.0f}x)")
+
+        with_triggers = checkout_rate(manager, args.checkouts)
+        with manager.pool.writer() as conn:
+            for trigger in ('insert', 'update', 'delete'):
+                conn.execute(f"DROP TRIGGER trg_sales_rollup_{trigger}")
+        without_triggers = checkout_rate(manager, args.checkouts)
+        print(f"checkout with rollup triggers    {with_triggers:>8,.0f} sales/s")
+        print(f"checkout without rollup triggers {without_triggers:>8,.0f} sales/s")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
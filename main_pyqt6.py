@@ -44,8 +44,10 @@ class MobileShopApp:
         self.settings_manager = SettingsManager()
         
         # Initialize database
-        self.db_manager = DatabaseManager()
+        self.db_manager = DatabaseManager(profile=self.settings_manager.get_db_profile())
         self.db_manager.initialize_database()
+        if self.settings_manager.current.group_commit:
+            self.db_manager.enable_group_commit()
         
     def load_fonts(self):
         """Load Arabic fonts"""
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arabic Text - Normalization used for indexing and searching product text
+"""
+
+import re
+from typing import List
+
+# Tashkeel (harakat, tanween, shadda, sukun, superscript alef) and tatweel
+_DIACRITICS = re.compile('[\u064B-\u065F\u0670\u0640]')
+
+_CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize_arabic(text) -> str:
+    """Fold alef forms, taa marbuta, yaa/alef maqsura and Arabic digits; drop tashkeel"""
+    if text is None:
+        return ''
+    text = _DIACRITICS.sub('', str(text))
+    return text.translate(_CHAR_MAP).lower()
+
+
+def search_tokens(text: str) -> List[str]:
+    """Split normalized search text into word tokens"""
+    return _TOKEN.findall(normalize_arabic(text))
+
+
+def fts_prefix_query(text: str) -> str:
+    """Build an FTS5 MATCH expression where every token must match as a prefix"""
+    return ' '.join(f'"{token}"*' for token in search_tokens(text))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive - Closed sales periods kept in per-year database files
+
+Sales older than the live window move, with their items, from the live
+database into ``sales_YYYY.db`` files (one per business year). The live
+``sales_archives`` table records, for each year, the business day before
+which that year's sales were archived. Readers ATTACH a year's file only
+when a query's date range reaches it (as schema ``sales_YYYY``), and read
+only the rows below its bound, so a restored older database never sees a
+sale twice.
+
+Moving a year takes two transactions: rows are copied into the archive
+file first, then deleted from the live database and the bound advanced.
+A crash in between leaves copies the bound hides; the next run finishes
+the move. The daily/monthly rollups keep the archived periods' totals.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+ARCHIVE_FILE_PATTERN = re.compile(r"^sales_(?P<year>\d{4})\.db$")
+
+# Indexes the archive files keep, matching the live report indexes
+ARCHIVE_INDEXES = {
+    'idx_sales_created_at': 'sales (created_at)',
+    'idx_sales_business_date': 'sales (business_date)',
+    'idx_sales_customer': 'sales (customer_id, created_at)',
+    'idx_sale_items_sale': 'sale_items (sale_id)',
+}
+
+
+def archive_path(archive_dir: str, year: int) -> str:
+    """Path of the archive file holding one business year"""
+    return os.path.join(archive_dir, f"sales_{year}.db")
+
+
+def archive_schema(year: int) -> str:
+    """Schema name a year's archive file is attached as"""
+    return f"sales_{year}"
+
+
+def archive_files(archive_dir: str) -> List[Tuple[int, str]]:
+    """Get (year, path) for every archive file in a directory, oldest first"""
+    if not os.path.isdir(archive_dir):
+        return []
+    files = []
+    for name in sorted(os.listdir(archive_dir)):
+        match = ARCHIVE_FILE_PATTERN.match(name)
+        if match:
+            files.append((int(match.group('year')), os.path.join(archive_dir, name)))
+    return files
+
+
+def modified_time(path: str) -> float:
+    """Time of the last change to an archive file, counting commits still in its WAL"""
+    wal = path + "-wal"
+    return max(os.path.getmtime(path), os.path.getmtime(wal) if os.path.exists(wal) else 0)
+
+
+def archive_cutoff(today: date, months: int) -> str:
+    """First day of the month ``months`` before today's month, as 'YYYY-MM-DD'
+
+    Whole months are archived, so the monthly rollups split cleanly.
+    """
+    index = today.year * 12 + today.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def list_archives(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+    """Get (year, archived_before) for every archived year, oldest first"""
+    return [tuple(row) for row in conn.execute(
+        "SELECT year, archived_before FROM sales_archives ORDER BY year"
+    )]
+
+
+def live_since(conn: sqlite3.Connection) -> Optional[str]:
+    """First business day still kept in the live sales table (None if nothing is archived)"""
+    return conn.execute("SELECT MAX(archived_before) FROM sales_archives").fetchone()[0]
+
+
+def archives_in_range(archives: List[Tuple[int, str]], start_date: Optional[str],
+                      end_date: Optional[str], by_business_date: bool = False) -> List[Tuple[int, str]]:
+    """Select the archived years an inclusive date range reaches
+
+    created_at is UTC while years are split by local business day, so
+    created_at ranges are widened by a day on each side.
+    """
+    margin = timedelta(days=0 if by_business_date else 1)
+    start = end = None
+    if start_date:
+        start = (datetime.strptime(start_date[:10], "%Y-%m-%d") - margin).strftime("%Y-%m-%d")
+    if end_date:
+        end = (datetime.strptime(end_date[:10], "%Y-%m-%d") + margin).strftime("%Y-%m-%d")
+    return [(year, before) for year, before in archives
+            if (start is None or start < before) and (end is None or end >= f"{year:04d}-01-01")]
+
+
+def is_attached(conn: sqlite3.Connection, schema: str) -> bool:
+    """Whether ``schema`` is attached to the connection"""
+    return any(row[1] == schema for row in conn.execute("PRAGMA database_list"))
+
+
+@contextmanager
+def attached(conn: sqlite3.Connection, path: str, schema: str) -> Iterator[sqlite3.Connection]:
+    """ATTACH an archive file as ``schema`` for the duration of the block
+
+    A schema that is already attached (a report snapshot attaches its
+    archives up front) is used as is. Otherwise the block must start
+    outside a transaction; any transaction it leaves open is rolled back
+    before the file is detached.
+    """
+    if is_attached(conn, schema):
+        yield conn
+        return
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute(f"DETACH DATABASE {schema}")
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+    """(name, declared type) of a live table's columns, in order"""
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA main.table_info({table})")]
+
+
+def create_archive_tables(conn: sqlite3.Connection, schema: str):
+    """Create the sales tables in an attached archive file, mirroring the live columns"""
+    for table in ('sales', 'sale_items'):
+        columns = ", ".join("id INTEGER PRIMARY KEY" if name == 'id' else f"{name} {kind}"
+                            for name, kind in _columns(conn, table))
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{table} ({columns})")
+    for name, target in ARCHIVE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{name} ON {target}")
+
+
+def copy_period(conn: sqlite3.Connection, schema: str, start: str, before: str) -> int:
+    """Copy live sales with start <= business_date < before, and their items, into the archive
+
+    Rows already in the archive (from an interrupted run) are kept.
+    Returns the number of sales copied.
+    """
+    period = "SELECT id FROM main.sales WHERE business_date >= ? AND business_date < ?"
+    sale_columns = ", ".join(name for name, _ in _columns(conn, 'sales'))
+    item_columns = ", ".join(name for name, _ in _columns(conn, 'sale_items'))
+    copied = conn.execute(f'''
+        INSERT OR IGNORE INTO {schema}.sales ({sale_columns})
+        SELECT {sale_columns} FROM main.sales WHERE business_date >= ? AND business_date < ?
+    ''', (start, before)).rowcount
+    conn.execute(f'''
+        INSERT OR IGNORE INTO {schema}.sale_items ({item_columns})
+        SELECT {item_columns} FROM main.sale_items WHERE sale_id IN ({period})
+    ''', (start, before))
+    return copied
+
+
+def remove_period(conn: sqlite3.Connection, year: int, start: str, before: str) -> int:
+    """Delete archived sales from the live database and advance the year's bound
+
+    The sales triggers are set aside for the delete: the rollups keep the
+    archived totals and the change feed does not report archiving as
+    deletes. Items go with their sales (ON DELETE CASCADE). Returns the
+    number of sales removed.
+    """
+    triggers = conn.execute('''
+        SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'sales'
+    ''').fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+
+    removed = conn.execute('''
+        DELETE FROM main.sales WHERE business_date >= ? AND business_date < ?
+    ''', (start, before)).rowcount
+
+    for _, sql in triggers:
+        conn.execute(sql)
+
+    conn.execute('''
+        INSERT INTO sales_archives (year, archived_before, sale_count) VALUES (?, ?, ?)
+        ON CONFLICT (year) DO UPDATE SET
+            archived_before = MAX(archived_before, excluded.archived_before),
+            sale_count = sale_count + excluded.sale_count
+    ''', (year, before, removed))
+    return removed
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backup Chain - Incremental page-level backups with point-in-time restore
+
+A chain is a directory holding one full snapshot followed by incremental
+entries. Every entry stores only the database pages whose content changed
+since the previous entry, each page zlib-compressed and tagged with its
+BLAKE2b hash. ``manifest.json`` lists the committed entries and is
+replaced last, so an interrupted backup never becomes a restore point.
+
+Usage:
+    python src/database/backup_chain.py list <backup_dir>
+    python src/database/backup_chain.py restore <chain_dir> <target.db> [seq]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+CHAIN_PREFIX = "chain_"
+MANIFEST = "manifest.json"
+ENTRY_MAGIC = b"MSBKPG01"
+ENTRY_HEADER = struct.Struct(">8sIIII")  # magic, seq, page_size, page_count, stored pages
+PAGE_HEADER = struct.Struct(">I16sI")    # pgno, blake2b digest, compressed length
+DIGEST_SIZE = 16
+
+# A new full snapshot starts after this many increments, or when an
+# increment would carry more than this share of the database anyway
+MAX_INCREMENTS = 24
+FULL_SNAPSHOT_RATIO = 0.5
+
+
+def online_copy(db_path: str, target_path: str, pages_per_step: int = 256,
+                progress: Optional[Callable[[int, int], None]] = None):
+    """Copy a live database into a standalone file with the SQLite backup API
+
+    In WAL mode the copy runs from one pinned read snapshot; without it
+    every commit made between two steps restarts the copy. With a rollback
+    journal a held read lock would block writers for the whole copy, so
+    each step reads on its own and a commit in between restarts it.
+    """
+    def report(status, remaining, total):
+        progress(total - remaining, total)
+
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(target_path)
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+            # The snapshot is taken by the first read of the transaction
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages_per_step, progress=report if progress else None)
+        if source.in_transaction:
+            source.rollback()
+        # Keep the copy a single self-contained file
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+
+
+def _page_digest(page: bytes) -> bytes:
+    return hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+
+
+def _read_page_size(path: str) -> int:
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    page_size = struct.unpack(">H", header[16:18])[0]
+    return 65536 if page_size == 1 else page_size
+
+
+def _load_manifest(chain_dir: str) -> Dict:
+    with open(os.path.join(chain_dir, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_atomic(path: str, data: bytes):
+    with open(path + ".part", 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".part", path)
+
+
+def list_chains(backup_dir: str) -> List[str]:
+    """Get chain directories with a committed manifest, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    chains = []
+    for name in sorted(os.listdir(backup_dir)):
+        chain_dir = os.path.join(backup_dir, name)
+        if name.startswith(CHAIN_PREFIX) and os.path.exists(os.path.join(chain_dir, MANIFEST)):
+            chains.append(chain_dir)
+    return chains
+
+
+def list_restore_points(backup_dir: str) -> List[Dict]:
+    """Get every restore point in every chain, oldest first"""
+    points = []
+    for chain_dir in list_chains(backup_dir):
+        for entry in _load_manifest(chain_dir)['entries']:
+            points.append({'chain': chain_dir, **entry})
+    return points
+
+
+def write_backup(db_path: str, backup_dir: str, pages_per_step: int = 256,
+                 progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Add a restore point: a full snapshot or the pages changed since the last entry
+
+    Returns the new manifest entry with its ``chain`` directory.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    fd, snapshot = tempfile.mkstemp(suffix=".snapshot", dir=backup_dir)
+    os.close(fd)
+    try:
+        online_copy(db_path, snapshot, pages_per_step, progress)
+        return _store_snapshot(snapshot, backup_dir)
+    finally:
+        os.remove(snapshot)
+
+
+def _store_snapshot(snapshot: str, backup_dir: str) -> Dict:
+    """Diff a standalone snapshot against the latest chain and store the changed pages"""
+    page_size = _read_page_size(snapshot)
+    page_count = os.path.getsize(snapshot) // page_size
+
+    chains = list_chains(backup_dir)
+    manifest = _load_manifest(chains[-1]) if chains else None
+    previous = b""
+    if manifest and manifest['page_size'] == page_size and len(manifest['entries']) <= MAX_INCREMENTS:
+        last = manifest['entries'][-1]
+        with open(os.path.join(chains[-1], last['hashes']), 'rb') as f:
+            previous = f.read()
+    else:
+        manifest = None
+
+    # Hash every page; keep the numbers of pages that differ from the last entry
+    digests = bytearray()
+    changed = []
+    with open(snapshot, 'rb') as f:
+        for pgno in range(1, page_count + 1):
+            digest = _page_digest(f.read(page_size))
+            offset = (pgno - 1) * DIGEST_SIZE
+            if previous[offset:offset + DIGEST_SIZE] != digest:
+                changed.append(pgno)
+            digests += digest
+
+    if manifest and len(changed) > page_count * FULL_SNAPSHOT_RATIO:
+        manifest = None
+    if manifest is None:
+        chain_dir = os.path.join(backup_dir, CHAIN_PREFIX + datetime.now().strftime("%Y%m%d_%H%M%S_%f"))
+        os.makedirs(chain_dir)
+        manifest = {'page_size': page_size, 'entries': []}
+        changed = list(range(1, page_count + 1))
+    else:
+        chain_dir = chains[-1]
+
+    seq = len(manifest['entries'])
+    kind = 'full' if seq == 0 else 'incremental'
+    entry_file = f"{seq:04d}_{kind}.pages"
+    hashes_file = f"{seq:04d}.hashes"
+
+    with open(snapshot, 'rb') as source, open(os.path.join(chain_dir, entry_file + ".part"), 'wb') as out:
+        out.write(ENTRY_HEADER.pack(ENTRY_MAGIC, seq, page_size, page_count, len(changed)))
+        for pgno in changed:
+            source.seek((pgno - 1) * page_size)
+            data = zlib.compress(source.read(page_size), 6)
+            digest = bytes(digests[(pgno - 1) * DIGEST_SIZE:pgno * DIGEST_SIZE])
+            out.write(PAGE_HEADER.pack(pgno, digest, len(data)))
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(os.path.join(chain_dir, entry_file + ".part"), os.path.join(chain_dir, entry_file))
+    _write_atomic(os.path.join(chain_dir, hashes_file), bytes(digests))
+
+    entry = {
+        'seq': seq,
+        'kind': kind,
+        'file': entry_file,
+        'hashes': hashes_file,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'page_count': page_count,
+        'pages': len(changed),
+        'bytes': os.path.getsize(os.path.join(chain_dir, entry_file)),
+    }
+    manifest['entries'].append(entry)
+    _write_atomic(os.path.join(chain_dir, MANIFEST),
+                  json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8'))
+
+    # Only the newest entry's page hashes are needed for the next diff
+    if seq > 0:
+        stale = os.path.join(chain_dir, manifest['entries'][seq - 1]['hashes'])
+        if os.path.exists(stale):
+            os.remove(stale)
+    return {'chain': chain_dir, **entry}
+
+
+def _index_entry(path: str):
+    """Yield (pgno, digest, data_offset, length) for every page stored in an entry file"""
+    with open(path, 'rb') as f:
+        magic, _, _, _, stored = ENTRY_HEADER.unpack(f.read(ENTRY_HEADER.size))
+        if magic != ENTRY_MAGIC:
+            raise ValueError(f"Not a backup entry: {path}")
+        for _ in range(stored):
+            pgno, digest, length = PAGE_HEADER.unpack(f.read(PAGE_HEADER.size))
+            offset = f.tell()
+            yield pgno, digest, offset, length
+            f.seek(length, os.SEEK_CUR)
+
+
+def restore(chain_dir: str, target_path: str, seq: Optional[int] = None,
+            progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Rebuild the database as of entry ``seq`` (default: the newest) into ``target_path``
+
+    Entries are indexed newest first so each page is read, checked and
+    written exactly once, however long the chain is.
+    """
+    manifest = _load_manifest(chain_dir)
+    entries = manifest['entries']
+    seq = len(entries) - 1 if seq is None else seq
+    if not 0 <= seq < len(entries):
+        raise ValueError(f"No restore point {seq} in {chain_dir}")
+    page_size = manifest['page_size']
+    page_count = entries[seq]['page_count']
+
+    sources = {}
+    for entry in reversed(entries[:seq + 1]):
+        path = os.path.join(chain_dir, entry['file'])
+        for pgno, digest, offset, length in _index_entry(path):
+            if pgno <= page_count and pgno not in sources:
+                sources[pgno] = (path, digest, offset, length)
+        if len(sources) == page_count:
+            break
+    if len(sources) != page_count:
+        raise ValueError(f"Backup chain {chain_dir} is missing pages for restore point {seq}")
+
+    handles = {}
+    try:
+        with open(target_path + ".part", 'wb') as out:
+            for pgno in range(1, page_count + 1):
+                path, digest, offset, length = sources[pgno]
+                source = handles.get(path)
+                if source is None:
+                    source = handles[path] = open(path, 'rb')
+                source.seek(offset)
+                page = zlib.decompress(source.read(length))
+                if len(page) != page_size or _page_digest(page) != digest:
+                    raise ValueError(f"Page {pgno} in {path} is corrupt")
+                out.write(page)
+                if progress and pgno % 1024 == 0:
+                    progress(pgno, page_count)
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        os.remove(target_path + ".part")
+        raise
+    finally:
+        for source in handles.values():
+            source.close()
+
+    os.replace(target_path + ".part", target_path)
+    if progress:
+        progress(page_count, page_count)
+    return target_path
+
+
+def prune_chains(backup_dir: str, cutoff: datetime) -> List[str]:
+    """Delete whole chains whose newest restore point is older than ``cutoff``
+
+    The newest chain is always kept, since the next increment builds on it.
+    """
+    removed = []
+    for chain_dir in list_chains(backup_dir)[:-1]:
+        newest = _load_manifest(chain_dir)['entries'][-1]['created_at']
+        if datetime.fromisoformat(newest) < cutoff:
+            shutil.rmtree(chain_dir)
+            removed.append(chain_dir)
+    return removed
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) >= 2 and argv[0] == 'list':
+        for point in list_restore_points(argv[1]):
+            print(f"{os.path.basename(point['chain'])}  #{point['seq']:<4} {point['created_at']}  "
+                  f"{point['kind']:<11} {point['pages']:>8} pages {point['bytes'] / 1e6:>9.1f} MB")
+        return 0
+    if len(argv) in (3, 4) and argv[0] == 'restore':
+        seq = int(argv[3]) if len(argv) == 4 else None
+        print(restore(argv[1], argv[2], seq))
+        return 0
+    print(__doc__.strip().split("Usage:")[1])
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar - NumPy column arrays for report and summary queries
+"""
+
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy comes with matplotlib; only the 'columns' row format needs it
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def _to_array(values: Sequence, dtype: str):
+    """Build one typed column; NULL numbers become 0, NULL timestamps NaT"""
+    if dtype == 'int64':
+        try:
+            return np.array(values, dtype=np.int64)
+        except TypeError:
+            return np.fromiter((0 if value is None else value for value in values),
+                               dtype=np.int64, count=len(values))
+    if dtype == 'float64':
+        return np.nan_to_num(np.array(values, dtype=np.float64), copy=False)
+    if dtype.startswith('datetime64'):
+        return np.array(values, dtype=dtype)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def rows_to_columns(rows: List[tuple], fields: Sequence[str], dtypes: Sequence[str]) -> Dict[str, 'np.ndarray']:
+    """Transpose fetched tuples into {field: array}; every array has len(rows) items"""
+    if np is None:
+        raise RuntimeError("The 'columns' row format requires numpy")
+
+    columns = list(zip(*rows)) if rows else [()] * len(fields)
+    return {field: _to_array(values, dtype)
+            for field, dtype, values in zip(fields, dtypes, columns)}
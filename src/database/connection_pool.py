@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Connection Pool - Long-lived SQLite connections for DatabaseManager
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+
+class ConnectionPool:
+    """Keeps SQLite connections open instead of reconnecting per call.
+
+    Three kinds of connection are handed out:
+
+    * ``connection()`` - one long-lived connection per thread, used by
+      legacy ``DatabaseManager.get_connection()`` callers.
+    * ``reader()`` - a connection checked out of a bounded reader pool.
+    * ``writer()`` - the single writer connection, serialized by a lock and
+      committed (or rolled back) when the block exits. ``on_commit`` hooks
+      run after each successful commit, ``after_commit()`` callbacks after
+      the commit of the transaction that registered them.
+    * ``snapshot()`` - a per-thread, query-only connection outside the
+      reader pool, holding one read transaction for a whole report.
+    """
+
+    def __init__(self, db_path: str, max_readers: int = 4,
+                 on_connect: Optional[List[Callable[[sqlite3.Connection], None]]] = None,
+                 on_commit: Optional[List[Callable[[], None]]] = None,
+                 timeout: float = 30.0):
+        self.db_path = db_path
+        self.max_readers = max(1, max_readers)
+        self.timeout = timeout
+        self.on_connect = list(on_connect or [])
+        self.on_commit = list(on_commit or [])
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._all_connections: List[sqlite3.Connection] = []
+
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._checked_out: Set[sqlite3.Connection] = set()
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+
+    def _open(self) -> sqlite3.Connection:
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key constraints
+        for hook in self.on_connect:
+            hook(conn)
+        with self._lock:
+            self._all_connections.append(conn)
+        return conn
+
+    def add_connect_hook(self, hook: Callable[[sqlite3.Connection], None]):
+        """Register a hook run on every connection, including already open ones"""
+        self.on_connect.append(hook)
+        with self._lock:
+            connections = list(self._all_connections)
+        for conn in connections:
+            hook(conn)
+
+    def connection(self) -> sqlite3.Connection:
+        """Get the calling thread's long-lived connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'generation', -1) != self._generation:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Check out a read connection from the pool"""
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            # Re-entrant use on the same thread shares the checked-out reader
+            yield held
+            return
+
+        conn = self._acquire_reader()
+        with self._lock:
+            self._checked_out.add(conn)
+        self._local.reader = conn
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._release_reader(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._reader_count < self.max_readers
+            if can_open:
+                self._reader_count += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._reader_count -= 1
+                raise
+
+        try:
+            return self._idle_readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("timed out waiting for a reader connection") from None
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._checked_out.discard(conn)
+            stale = conn not in self._all_connections
+        if stale:
+            # The pool was reset while this reader was checked out
+            conn.close()
+            return
+        self._idle_readers.put(conn)
+
+    @contextmanager
+    def snapshot(self, attach: Optional[Dict[str, str]] = None) -> Iterator[sqlite3.Connection]:
+        """Read from one consistent snapshot on the calling thread's report connection
+
+        In WAL mode the block runs inside a single read transaction, so every
+        query sees the database as of its start while writers keep
+        committing. With a rollback journal each query reads on its own (a
+        held read lock would stall writers). ``reader()`` calls made in the
+        block share the snapshot connection. ``attach`` maps schema names to
+        database files attached for the block (ATTACH is not possible once
+        the transaction has started).
+        """
+        held = getattr(self._local, 'reader', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = getattr(self._local, 'snapshot_conn', None)
+        if conn is None or getattr(self._local, 'snapshot_generation', -1) != self._generation:
+            conn = self._open()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.snapshot_conn = conn
+            self._local.snapshot_generation = self._generation
+
+        attached = []
+        with self._lock:
+            self._checked_out.add(conn)
+        self._local.reader = conn
+        try:
+            for schema, path in (attach or {}).items():
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                attached.append(schema)
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+                # The snapshot is taken by the first read of the transaction
+                conn.execute("BEGIN")
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield conn
+        finally:
+            self._local.reader = None
+            if conn.in_transaction:
+                conn.rollback()
+            for schema in attached:
+                conn.execute(f"DETACH DATABASE {schema}")
+            with self._lock:
+                self._checked_out.discard(conn)
+                stale = conn not in self._all_connections
+            if stale:
+                conn.close()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Use the single writer connection inside one transaction"""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+
+            depth = getattr(self._local, 'write_depth', 0)
+            if depth == 0:
+                self._local.after_commit = []
+            self._local.write_depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                if depth == 0:
+                    self._local.after_commit = []
+                    conn.rollback()
+                raise
+            else:
+                if depth == 0:
+                    conn.commit()
+                    callbacks, self._local.after_commit = self._local.after_commit, []
+                    for callback in callbacks:
+                        callback()
+                    for hook in self.on_commit:
+                        hook()
+            finally:
+                self._local.write_depth = depth
+
+    def in_write(self) -> bool:
+        """Whether the calling thread is inside a writer() block"""
+        return getattr(self._local, 'write_depth', 0) > 0
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Run ``callback`` once the calling thread's write transaction commits
+
+        It is dropped if the transaction (or the savepoint() it was
+        registered in) rolls back. Outside a writer() block it runs now.
+        """
+        if not self.in_write():
+            callback()
+            return
+        self._local.after_commit.append(callback)
+
+    @contextmanager
+    def savepoint(self, name: str = "item") -> Iterator[sqlite3.Connection]:
+        """Run part of a writer() block in a SAVEPOINT
+
+        If the block raises, only its own changes (and its after_commit()
+        callbacks) are undone and the enclosing transaction carries on.
+        An error that made SQLite roll back the whole transaction leaves
+        ``conn.in_transaction`` false.
+        """
+        if not self.in_write():
+            raise RuntimeError("savepoint() must be used inside writer()")
+        conn = self._writer
+        callbacks = self._local.after_commit
+        mark = len(callbacks)
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            del callbacks[mark:]
+            if conn.in_transaction:
+                conn.execute(f"ROLLBACK TO {name}")
+                conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+
+    def close_all(self):
+        """Close every pooled connection; new ones open lazily on next use
+
+        Readers checked out by other threads are left to finish their query
+        and are closed when they are returned.
+        """
+        with self._writer_lock:
+            with self._lock:
+                connections = [conn for conn in self._all_connections if conn not in self._checked_out]
+                self._all_connections = []
+                self._reader_count = 0
+                self._generation += 1
+                self._writer = None
+                self._idle_readers = queue.LifoQueue()
+
+            for conn in connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
@@ -4,18 +4,58 @@
 Database Manager - SQLite Database Operations
 """
 
+import heapq
+import logging
+import shutil
 import sqlite3
 import os
-import shutil
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Callable
 from pathlib import Path
 
+from .connection_pool import ConnectionPool
+from .profiles import DEFAULT_PROFILE, PERFORMANCE_PROFILES, apply_profile
+from .arabic_text import normalize_arabic, fts_prefix_query
+from .records import ROW_FORMATS, PAGE_FORMATS, Record, ProductRow, CustomerRow, SaleRow
+from .columnar import rows_to_columns
+from .group_commit import DEFAULT_WINDOW, GroupCommitQueue, group_committed
+from . import archive, backup_chain, money, rollups, sync
+from .migrations import LATEST_VERSION, get_schema_version, run_migrations
+
+logger = logging.getLogger(__name__)
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "data/mobile_shop.db"):
+    RANKED_SEARCH_CANDIDATES = 2000
+    BACKUP_PAGES_PER_STEP = 256
+    RESTORE_PAGES_PER_STEP = 4096
+    CHANGE_LOG_KEEP = 100000
+    ARCHIVE_AFTER_MONTHS = 18
+    # Latest copy of every sales archive file, kept next to the backup chains
+    ARCHIVE_BACKUP_DIR = "archive"
+    # Archived rows are read only below their year's bound (see archive.py)
+    ARCHIVE_BOUND = " AND s.business_date < ?"
+    SALE_REPORT_COLUMNS = "s.*, c.name as customer_name, c.phone as customer_phone"
+    
+    def __init__(self, db_path: str = "data/mobile_shop.db", max_readers: int = 4,
+                 profile: str = DEFAULT_PROFILE):
         self.db_path = db_path
         self.backup_dir = "backups"
+        self.archive_dir = os.path.join(os.path.dirname(db_path), "archive")
+        self.profile = profile if profile in PERFORMANCE_PROFILES else DEFAULT_PROFILE
+        self._count_cache: Dict[Tuple, int] = {}
+        self._data_generation = 0
+        self._settings: Optional[Dict[str, str]] = None
+        self._settings_lock = threading.Lock()
+        self._low_stock_listeners: List[Callable[[List[ProductRow]], None]] = []
+        self._low_stock_seen = 0
+        self.write_queue: Optional[GroupCommitQueue] = None
         self.ensure_directories()
+        self.pool = ConnectionPool(db_path, max_readers=max_readers,
+                                   on_connect=[self.configure_connection],
+                                   on_commit=[self.invalidate_counts, self.dispatch_low_stock_alerts])
         
     def ensure_directories(self):
         """Ensure database and backup directories exist"""
@@ -23,163 +63,212 @@ class DatabaseManager:
         os.makedirs(self.backup_dir, exist_ok=True)
         
     def get_connection(self) -> sqlite3.Connection:
-        """Get database connection with proper settings"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key constraints
-        return conn
+        """Get the calling thread's long-lived database connection"""
+        return self.pool.connection()
+        
+    def configure_connection(self, conn: sqlite3.Connection):
+        """Apply per-connection settings when the pool opens a connection"""
+        apply_profile(conn, self.profile)
+        # Used by the products_fts triggers
+        conn.create_function('normalize_ar', 1, normalize_arabic, deterministic=True)
+        
+    def set_profile(self, profile: str):
+        """Switch performance profile; pooled connections are reopened with it"""
+        if profile not in PERFORMANCE_PROFILES or profile == self.profile:
+            return
+        self.profile = profile
+        self.pool.close_all()
+        
+    def enable_group_commit(self, window: float = DEFAULT_WINDOW):
+        """Commit concurrent small writes (sales, customers, products, settings) together
+        
+        Writes arriving within ``window`` seconds of each other share one
+        transaction and one disk sync; each caller still waits for the
+        commit and gets its own result or exception (see group_commit.py).
+        Worth it with several tills writing at once: a lone writer pays
+        the hand-off to the queue thread on every write.
+        """
+        if self.write_queue is None:
+            self.write_queue = GroupCommitQueue(self.pool, window)
+            
+    def disable_group_commit(self):
+        """Commit queued writes, then go back to one transaction per write"""
+        write_queue, self.write_queue = self.write_queue, None
+        if write_queue is not None:
+            write_queue.close()
+        
+    def close(self):
+        """Close all pooled connections"""
+        self.disable_group_commit()
+        self.pool.close_all()
         
     def initialize_database(self):
-        """Initialize database with all required tables"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        """Bring the database schema up to date"""
+        with self.pool.reader() as conn:
+            if get_schema_version(conn) >= LATEST_VERSION:
+                return
             
-            # Products table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    brand TEXT,
-                    model TEXT,
-                    category TEXT,
-                    price DECIMAL(10,2) NOT NULL,
-                    cost DECIMAL(10,2),
-                    stock_quantity INTEGER DEFAULT 0,
-                    min_stock_level INTEGER DEFAULT 5,
-                    barcode TEXT UNIQUE,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Customers table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    phone TEXT UNIQUE NOT NULL,
-                    email TEXT,
-                    address TEXT,
-                    city TEXT,
-                    total_purchases DECIMAL(10,2) DEFAULT 0,
-                    loyalty_points INTEGER DEFAULT 0,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Suppliers table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS suppliers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    company TEXT,
-                    phone TEXT,
-                    email TEXT,
-                    address TEXT,
-                    payment_terms TEXT,
-                    total_orders DECIMAL(10,2) DEFAULT 0,
-                    outstanding_balance DECIMAL(10,2) DEFAULT 0,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Sales table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_id INTEGER,
-                    total_amount DECIMAL(10,2) NOT NULL,
-                    discount_amount DECIMAL(10,2) DEFAULT 0,
-                    tax_amount DECIMAL(10,2) DEFAULT 0,
-                    payment_method TEXT,
-                    status TEXT DEFAULT 'completed',
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (customer_id) REFERENCES customers (id)
-                )
-            ''')
-            
-            # Sale items table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sale_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sale_id INTEGER NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit_price DECIMAL(10,2) NOT NULL,
-                    total_price DECIMAL(10,2) NOT NULL,
-                    FOREIGN KEY (sale_id) REFERENCES sales (id) ON DELETE CASCADE,
-                    FOREIGN KEY (product_id) REFERENCES products (id)
-                )
-            ''')
-            
-            # Services table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS services (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_id INTEGER,
-                    service_type TEXT NOT NULL,
-                    description TEXT,
-                    amount DECIMAL(10,2) NOT NULL,
-                    commission DECIMAL(10,2) DEFAULT 0,
-                    status TEXT DEFAULT 'completed',
-                    reference_number TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (customer_id) REFERENCES customers (id)
-                )
-            ''')
-            
-            # Settings table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            
-        # Insert default settings if they don't exist
-        self.setup_default_settings()
-        
-    def setup_default_settings(self):
-        """Insert default application settings"""
-        default_settings = {
-            'theme': 'light',
-            'language': 'ar',
-            'auto_backup': 'true',
-            'backup_frequency': 'daily',
-            'tax_rate': '15.0',
-            'currency': 'ريال',
-            'low_stock_alert': 'true'
-        }
-        
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            for key, value in default_settings.items():
-                cursor.execute('''
-                    INSERT OR IGNORE INTO settings (key, value)
-                    VALUES (?, ?)
-                ''', (key, value))
-            conn.commit()
-    
-    def backup_database(self) -> str:
-        """Create a backup of the database"""
+        with self.pool.writer() as conn:
+            run_migrations(conn)
+            
+    def backup_database(self, progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Create an online full backup of the database with the SQLite backup API
+        
+        Pages are copied BACKUP_PAGES_PER_STEP at a time from one read
+        snapshot, so the copy is consistent and, in WAL mode, sales keep
+        committing while it runs. ``progress(copied_pages, total_pages)``
+        is called after every step (from the calling thread). The sales
+        archive files are copied after the database into a directory next
+        to the backup file (see archive_backup_dir()).
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_filename = f"mobile_shop_backup_{timestamp}.db"
         backup_path = os.path.join(self.backup_dir, backup_filename)
+        partial_path = backup_path + ".part"
+        archives_path = self.archive_backup_dir(backup_path)
         
-        shutil.copy2(self.db_path, backup_path)
+        try:
+            backup_chain.online_copy(self.db_path, partial_path, self.BACKUP_PAGES_PER_STEP, progress)
+            # Copied second: a sale archived meanwhile is still in the database copy
+            self._copy_archives(archives_path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            shutil.rmtree(archives_path, ignore_errors=True)
+            raise
+            
+        os.replace(partial_path, backup_path)
         return backup_path
     
+    @staticmethod
+    def archive_backup_dir(backup_path: str) -> str:
+        """Directory holding the sales archive files that go with a backup file"""
+        return os.path.splitext(backup_path)[0] + "_archive"
+    
+    def _copy_archives(self, target_dir: str, only_changed: bool = False):
+        """Copy the sales archive files into ``target_dir`` with the backup API
+        
+        With ``only_changed``, a file whose copy there is as recent as the
+        archive is skipped. Archives only ever gain rows and each database
+        reads its years below its own bound, so the latest copies serve
+        every older restore point too.
+        """
+        for year, path in archive.archive_files(self.archive_dir):
+            target = archive.archive_path(target_dir, year)
+            modified = archive.modified_time(path)
+            if only_changed and os.path.exists(target) and os.path.getmtime(target) >= modified:
+                continue
+            os.makedirs(target_dir, exist_ok=True)
+            try:
+                backup_chain.online_copy(path, target + ".part", self.BACKUP_PAGES_PER_STEP)
+            except Exception:
+                if os.path.exists(target + ".part"):
+                    os.remove(target + ".part")
+                raise
+            # Dated as the archive before the copy: a change made during it is copied next time
+            os.utime(target + ".part", (modified, modified))
+            os.replace(target + ".part", target)
+    
+    def incremental_backup(self, progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Add a restore point holding only the pages changed since the last one
+        
+        Starts a new chain with a full snapshot when needed (see backup_chain).
+        Sales archive files changed since the last backup are copied to
+        ARCHIVE_BACKUP_DIR.
+        """
+        restore_point = backup_chain.write_backup(self.db_path, self.backup_dir,
+                                                  self.BACKUP_PAGES_PER_STEP, progress)
+        self._copy_archives(os.path.join(self.backup_dir, self.ARCHIVE_BACKUP_DIR), only_changed=True)
+        return restore_point
+    
+    def list_restore_points(self) -> List[Dict[str, Any]]:
+        """Get the restore points of all incremental backup chains, oldest first"""
+        return backup_chain.list_restore_points(self.backup_dir)
+    
+    def restore_point_to_file(self, chain_dir: str, seq: int, target_path: str) -> str:
+        """Rebuild a restore point into a standalone database file
+        
+        The backed up sales archives are copied next to it, where
+        restore_database() looks for them.
+        """
+        backup_chain.restore(chain_dir, target_path, seq)
+        archives_path = self.archive_backup_dir(target_path)
+        for year, path in archive.archive_files(os.path.join(self.backup_dir, self.ARCHIVE_BACKUP_DIR)):
+            os.makedirs(archives_path, exist_ok=True)
+            shutil.copyfile(path, archive.archive_path(archives_path, year))
+        return target_path
+    
+    def verify_backup(self, backup_path: str):
+        """Check that a backup file is an intact shop database this version can open
+        
+        Raises ValueError describing the first problem found.
+        """
+        if not os.path.isfile(backup_path):
+            raise ValueError(f"Backup file not found: {backup_path}")
+            
+        conn = sqlite3.connect(f"{Path(backup_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            try:
+                result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            except sqlite3.DatabaseError as e:
+                raise ValueError(f"Not a database file: {e}") from e
+            if result != 'ok':
+                raise ValueError(f"Backup failed quick_check: {result}")
+                
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = {'products', 'customers', 'sales', 'sale_items', 'settings'} - tables
+            if missing:
+                raise ValueError(f"Backup is missing tables: {', '.join(sorted(missing))}")
+            if get_schema_version(conn) > LATEST_VERSION:
+                raise ValueError("Backup was made by a newer version of the application")
+        finally:
+            conn.close()
+            
+    def restore_database(self, backup_path: str,
+                         progress: Optional[Callable[[int, int], None]] = None):
+        """Replace the live database with a verified backup without restarting
+        
+        The backup is loaded RESTORE_PAGES_PER_STEP pages at a time into the
+        writer connection, so other writes wait for the restore and readers
+        keep their snapshot until it completes. Afterwards every pooled
+        connection is reopened, the schema is migrated if the backup is
+        older than this version, and a branch that syncs gets a new branch
+        id (see sync.start_new_branch). Sales archive files saved with the
+        backup replace the local ones.
+        """
+        self.verify_backup(backup_path)
+        
+        def report(status, remaining, total):
+            progress(total - remaining, total)
+            
+        source = sqlite3.connect(f"{Path(backup_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            with self.pool.writer() as conn:
+                source.backup(conn, pages=self.RESTORE_PAGES_PER_STEP,
+                              progress=report if progress else None)
+        finally:
+            source.close()
+            
+        for year, path in archive.archive_files(self.archive_backup_dir(backup_path)):
+            os.makedirs(self.archive_dir, exist_ok=True)
+            target = archive.archive_path(self.archive_dir, year)
+            shutil.copyfile(path, target + ".part")
+            for stale in (target + "-wal", target + "-shm"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            os.replace(target + ".part", target)
+            
+        self.pool.close_all()
+        self.invalidate_counts()
+        self.invalidate_settings()
+        self.initialize_database()
+        
+        # Rows created from now on must not reuse keys already sent to other branches
+        with self.pool.writer() as conn:
+            sync.start_new_branch(conn)
+        
     def auto_cleanup_backups(self, keep_days: int = 30):
-        """Clean up old backup files"""
+        """Clean up old backup files and incremental chains"""
         cutoff_date = datetime.now() - timedelta(days=keep_days)
         
         for backup_file in os.listdir(self.backup_dir):
@@ -188,98 +277,672 @@ class DatabaseManager:
                 file_time = datetime.fromtimestamp(os.path.getctime(file_path))
                 if file_time < cutoff_date:
                     os.remove(file_path)
+                    shutil.rmtree(self.archive_backup_dir(file_path), ignore_errors=True)
+                    
+        # A chain goes only as a whole, once its newest restore point expires
+        backup_chain.prune_chains(self.backup_dir, cutoff_date)
     
+    # Listing helpers
+    @staticmethod
+    def _select_columns(record_cls: type, row_format: str, default: str = "*",
+                        formats: Tuple[str, ...] = ROW_FORMATS) -> str:
+        """Get the SELECT list for a listing: everything for dicts, the record's columns otherwise"""
+        if row_format not in formats:
+            raise ValueError(f"Unknown row format: {row_format}")
+        if row_format == 'dict':
+            return default
+        return ", ".join(record_cls._columns)
+    
+    @staticmethod
+    def _fetch_rows(conn: sqlite3.Connection, query: str, params: List,
+                    record_cls: type, row_format: str) -> List:
+        """Run a listing query and build rows as dicts, records, plain tuples or columns
+        
+        Money columns come back in currency units (see money.py).
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(query, params).fetchall()
+        names = [column[0] for column in cursor.description]
+        if row_format == 'columns':
+            columns = rows_to_columns(rows, record_cls.__slots__, record_cls._dtypes)
+            for name in money.MONEY_FIELDS.intersection(columns):
+                columns[name] /= money.MINOR_UNITS
+            return columns
+            
+        rows = money.rows_from_minor(rows, money.money_indexes(names))
+        if row_format == 'dict':
+            return [dict(zip(names, row)) for row in rows]
+        if row_format == 'record':
+            return [record_cls(*row) for row in rows]
+        return rows
+    
+    @staticmethod
+    def _row_value(row, key: str, record_cls: type, row_format: str) -> Any:
+        """Read one field from a row in any of the listing formats"""
+        if row_format == 'tuple':
+            return row[record_cls.field_index(key)]
+        return row[key]
+    
+    # Paging helpers
+    def _fetch_page(self, select: str, where: str, params: List, order: List[Tuple[str, str]],
+                    after: Optional[Tuple], limit: int, descending: bool = False,
+                    record_cls: type = Record, row_format: str = 'dict') -> Tuple[List, Optional[Tuple]]:
+        """Fetch one keyset page: the next ``limit`` rows after the ``after`` sort key
+        
+        ``order`` lists (sql_column, row_key) pairs; the last one must be unique.
+        """
+        columns = ", ".join(column for column, _ in order)
+        direction = "DESC" if descending else "ASC"
+        params = list(params)
+        
+        if after is not None:
+            placeholders = ", ".join("?" * len(order))
+            where += f" AND ({columns}) {'<' if descending else '>'} ({placeholders})"
+            params.extend(after)
+            
+        order_by = ", ".join(f"{column} {direction}" for column, _ in order)
+        query = f"{select} WHERE {where} ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+        
+        with self.pool.reader() as conn:
+            rows = self._fetch_rows(conn, query, params, record_cls, row_format)
+            
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = tuple(self._row_value(rows[-1], key, record_cls, row_format)
+                                for _, key in order)
+        return rows, next_cursor
+    
+    def _cached_count(self, query: str, params: List,
+                      attach: Optional[Tuple[str, str]] = None) -> int:
+        """Run a COUNT(*) query, reusing the result until data changes
+        
+        With ``attach`` (schema, archive file), the query runs with that
+        sales archive attached.
+        """
+        # Read before the query: a write committing meanwhile bumps the
+        # generation, so the count stored below is never looked up again
+        key = (self._data_generation, query, tuple(params), attach)
+        count = self._count_cache.get(key)
+        if count is None:
+            with self.pool.reader() as conn:
+                if attach is None:
+                    count = conn.execute(query, params).fetchone()[0]
+                else:
+                    with archive.attached(conn, attach[1], attach[0]):
+                        count = conn.execute(query, params).fetchone()[0]
+            self._count_cache[key] = count
+        return count
+    
+    def invalidate_counts(self):
+        """Drop cached listing counts after a write"""
+        self._data_generation += 1
+        self._count_cache.clear()
+    
+    @contextmanager
+    def report_snapshot(self) -> Iterator[None]:
+        """Run the block's reads on this thread's report connection, from one snapshot
+        
+        The connection is query-only and outside the reader pool, so a long
+        report neither waits for nor holds up the till. In WAL mode (the
+        default profile) every read in the block sees the same committed
+        state; see ConnectionPool.snapshot() for the rollback-journal case.
+        The sales archives are attached up front, newest first, leaving one
+        of SQLite's attach slots free; in WAL mode, reads in the block
+        leave out older years (see _sales_archives()).
+        """
+        with self.pool.reader() as conn:
+            archives = archive.list_archives(conn)
+            limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - 1
+        attach = {}
+        for year, _ in reversed(archives[-limit:] if limit > 0 else []):
+            archive_file = archive.archive_path(self.archive_dir, year)
+            if os.path.exists(archive_file):
+                attach[archive.archive_schema(year)] = archive_file
+        with self.pool.snapshot(attach):
+            yield
+            
+    # Change feed
+    def get_change_version(self) -> int:
+        """Get the latest change_log version (0 before any change)"""
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT COALESCE(MAX(version), 0) FROM change_log").fetchone()[0]
+    
+    def get_changes(self, since: int, tables: Iterable[str] = (),
+                    limit: Optional[int] = None) -> Tuple[Optional[List[Tuple[str, int, str]]], int]:
+        """Get (table_name, row_id, op) for rows changed after version ``since``
+        
+        Returns the changes and the version they bring the caller up to;
+        pass that version as ``since`` next time. Each row appears once, in
+        the order of its latest change and with its latest op, so a row
+        inserted and then updated reports 'update' (treat both as upserts).
+        With ``limit``, at most that many log entries are read and the
+        version stops at the last one.
+        
+        The changes are None when the log no longer reaches back to
+        ``since`` (pruned, or a restored database): reload everything.
+        """
+        where = "version > ? AND version <= ?"
+        tables = list(tables)
+        if tables:
+            where += f" AND table_name IN ({', '.join('?' * len(tables))})"
+        with self.pool.reader() as conn:
+            # Separate subqueries: MIN and MAX in one SELECT scan the whole log
+            oldest, latest = conn.execute('''
+                SELECT (SELECT MIN(version) FROM change_log),
+                       (SELECT COALESCE(MAX(version), 0) FROM change_log)
+            ''').fetchone()
+            if since > latest or (oldest is not None and since < oldest - 1):
+                return None, latest
+                
+            query = f"SELECT version, table_name, row_id, op FROM change_log WHERE {where} ORDER BY version"
+            params = [since, latest] + tables
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            rows = conn.execute(query, params).fetchall()
+            
+        if limit is not None and len(rows) == limit:
+            latest = rows[-1][0]
+            
+        changes: Dict[Tuple[str, int], str] = {}
+        for _, table_name, row_id, op in rows:
+            # Re-insert so the row moves to the position of its latest change
+            changes.pop((table_name, row_id), None)
+            changes[(table_name, row_id)] = op
+        return [(table_name, row_id, op) for (table_name, row_id), op in changes.items()], latest
+        
+    def prune_change_log(self, keep: Optional[int] = None) -> int:
+        """Drop all but the newest ``keep`` (CHANGE_LOG_KEEP) change_log entries
+        
+        Readers further behind get None from get_changes() and reload in full.
+        Returns the number of entries removed.
+        """
+        keep = max(keep or self.CHANGE_LOG_KEEP, 1)
+        with self.pool.writer() as conn:
+            return conn.execute('''
+                DELETE FROM change_log WHERE version <= (SELECT MAX(version) FROM change_log) - ?
+            ''', (keep,)).rowcount
+            
+    # Branch sync
+    def get_branch_id(self) -> str:
+        """Get this database's branch id, created on first use"""
+        with self.pool.reader() as conn:
+            branch = sync.local_branch(conn)
+        if branch is None:
+            with self.pool.writer() as conn:
+                branch = sync.ensure_local_branch(conn)
+        return branch
+        
+    def export_changeset(self, directory: str, since: Optional[int] = None) -> Optional[str]:
+        """Write the rows changed since the last export to a changeset file in ``directory``
+        
+        Rows are read from one snapshot while sales keep committing. The
+        first export, and any after change_log lost the entries since the
+        last one, carry every row. Pass ``since`` (0 for everything) to
+        export again for a branch that lost a file. Returns the file path,
+        or None when nothing changed.
+        """
+        branch = self.get_branch_id()
+        os.makedirs(directory, exist_ok=True)
+        with self.pool.snapshot() as conn:
+            if since is None:
+                since = sync.sync_version(conn, branch)
+            changes, latest = self.get_changes(since) if since else (None, self.get_change_version())
+            if changes == [] and latest == since:
+                return None
+            changeset = sync.build_changeset(conn, branch, since, latest, changes)
+            
+        path = None
+        if any(table['rows'] or table['deleted'] for table in changeset['tables'].values()):
+            path = sync.write_changeset(changeset, directory)
+        with self.pool.writer() as conn:
+            sync.set_sync_version(conn, branch, latest)
+        return path
+        
+    def import_changeset(self, path: str) -> Dict[str, int]:
+        """Apply another branch's changeset file in one transaction (see sync.py for the rules)
+        
+        Returns counts of inserted, updated, deleted, unchanged and
+        conflicting rows. Raises ValueError for a file from this branch
+        or one that starts after the last changeset imported from its
+        branch.
+        """
+        changeset = sync.read_changeset(path)
+        branch = self.get_branch_id()
+        with self.pool.writer() as conn:
+            return sync.apply_changeset(conn, branch, changeset)
+            
+    def import_changesets(self, directory: str) -> Dict[str, int]:
+        """Apply every new changeset other branches left in ``directory``, in order
+        
+        A file that does not follow on from the last one imported from its
+        branch is counted as 'pending' and applied once the missing file
+        arrives.
+        """
+        branch = self.get_branch_id()
+        totals = dict.fromkeys(('inserted', 'updated', 'deleted', 'unchanged', 'conflicts', 'pending'), 0)
+        for source, files in sync.list_changesets(directory).items():
+            if source == branch:
+                continue
+            with self.pool.reader() as conn:
+                imported = sync.sync_version(conn, source)
+            for since, version, path in files:
+                if version <= imported:
+                    continue
+                changeset = sync.read_changeset(path)
+                if not changeset['full'] and since > imported:
+                    totals['pending'] += 1
+                    continue
+                with self.pool.writer() as conn:
+                    stats = sync.apply_changeset(conn, branch, changeset)
+                for name, count in stats.items():
+                    totals[name] += count
+                imported = version
+        return totals
+        
+    def sync_branches(self, directory: str) -> Dict[str, Any]:
+        """Exchange changes through a shared folder: export this branch's, import the others'"""
+        exported = self.export_changeset(directory)
+        stats = self.import_changesets(directory)
+        stats['exported'] = exported
+        return stats
+        
+    def _fetch_by_ids(self, table: str, ids: Iterable[int], record_cls: type,
+                      row_format: str, chunk_size: int = 500) -> List:
+        """Fetch the rows with the given ids (missing ids are skipped)"""
+        columns = self._select_columns(record_cls, row_format, formats=PAGE_FORMATS)
+        ids = iter(ids)
+        rows = []
+        with self.pool.reader() as conn:
+            while True:
+                chunk = list(islice(ids, chunk_size))
+                if not chunk:
+                    return rows
+                rows.extend(self._fetch_rows(conn, f'''
+                    SELECT {columns} FROM {table} WHERE id IN ({", ".join("?" * len(chunk))})
+                ''', chunk, record_cls, row_format))
+                
     # Product operations
+    @group_committed
     def add_product(self, product_data: Dict[str, Any]) -> int:
         """Add a new product to the database"""
-        with self.get_connection() as conn:
+        with self.pool.writer() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.execute(f'''
                 INSERT INTO products (name, brand, model, category, price, cost, 
-                                    stock_quantity, min_stock_level, barcode, description)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    stock_quantity, min_stock_level, barcode, description, sync_clock)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {sync.CLOCK_NOW})
             ''', (
                 product_data.get('name'),
                 product_data.get('brand'),
                 product_data.get('model'),
                 product_data.get('category'),
-                product_data.get('price'),
-                product_data.get('cost'),
+                money.to_minor(product_data.get('price')),
+                money.to_minor(product_data.get('cost')),
                 product_data.get('stock_quantity', 0),
                 product_data.get('min_stock_level', 5),
                 product_data.get('barcode'),
                 product_data.get('description')
             ))
-            conn.commit()
             return cursor.lastrowid
     
-    def get_products(self, search_term: str = '', category: str = '') -> List[Dict]:
-        """Get products with optional filtering"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+    def upsert_products(self, products: Iterable[Dict[str, Any]], chunk_size: int = 1000) -> List[Dict]:
+        """Insert or update products keyed by barcode, one transaction per chunk
+        
+        ``products`` may be any iterable, including a generator reading a
+        price list file, and is consumed chunk by chunk. Fields missing from
+        a row keep their current value on update; new products need a name
+        and a price. Returns one outcome per input row: {'row', 'barcode',
+        'status', 'error'} where status is 'inserted', 'updated' or
+        'rejected'.
+        """
+        outcomes = []
+        rows = iter(products)
+        row_number = 0
+        
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            outcomes.extend(self._upsert_product_chunk(chunk, row_number))
+            row_number += len(chunk)
             
-            query = "SELECT * FROM products WHERE 1=1"
-            params = []
+        return outcomes
+    
+    def _upsert_product_chunk(self, chunk: List[Dict[str, Any]], first_row: int) -> List[Dict]:
+        """Validate and upsert one chunk of products inside a single transaction"""
+        outcomes = []
+        valid = []
+        
+        for row, product_data in enumerate(chunk, first_row):
+            barcode = str(product_data.get('barcode') or '').strip()
+            outcome = {'row': row, 'barcode': barcode, 'status': None, 'error': None}
+            outcomes.append(outcome)
             
-            if search_term:
-                query += " AND (name LIKE ? OR brand LIKE ? OR model LIKE ? OR barcode LIKE ?)"
-                search_pattern = f"%{search_term}%"
-                params.extend([search_pattern] * 4)
+            try:
+                if not barcode:
+                    raise ValueError("missing barcode")
+                price = money.to_minor(product_data['price']) if product_data.get('price') not in (None, '') else None
+                cost = money.to_minor(product_data['cost']) if product_data.get('cost') not in (None, '') else None
+                stock = int(product_data['stock_quantity']) if product_data.get('stock_quantity') not in (None, '') else None
+                min_stock = int(product_data['min_stock_level']) if product_data.get('min_stock_level') not in (None, '') else None
+            except (ValueError, TypeError) as e:
+                outcome['status'] = 'rejected'
+                outcome['error'] = str(e)
+                continue
                 
-            if category:
-                query += " AND category = ?"
-                params.append(category)
+            valid.append((outcome, (
+                product_data.get('name') or None,
+                product_data.get('brand'),
+                product_data.get('model'),
+                product_data.get('category'),
+                price,
+                cost,
+                stock,
+                min_stock,
+                barcode,
+                product_data.get('description')
+            )))
+            
+        if not valid:
+            return outcomes
+            
+        with self.pool.writer() as conn:
+            # Current name and price of existing barcodes: SQLite checks NOT NULL
+            # on the INSERT row before ON CONFLICT, so updates must carry them
+            barcodes = list({params[8] for _, params in valid})
+            existing = {}
+            for start in range(0, len(barcodes), 500):
+                batch = barcodes[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                existing.update((row[0], (row[1], row[2])) for row in conn.execute(
+                    f"SELECT barcode, name, price FROM products WHERE barcode IN ({placeholders})", batch
+                ))
+                
+            batch_params = []
+            for outcome, params in valid:
+                barcode = params[8]
+                if barcode in existing:
+                    name, price = existing[barcode]
+                    params = (params[0] or name,) + params[1:4] + (
+                        price if params[4] is None else params[4],
+                    ) + params[5:]
+                    outcome['status'] = 'updated'
+                else:
+                    if params[0] is None or params[4] is None:
+                        outcome['status'] = 'rejected'
+                        outcome['error'] = "missing name" if params[0] is None else "missing price"
+                        continue
+                    # New products get the same defaults as add_product()
+                    params = params[:6] + (
+                        0 if params[6] is None else params[6],
+                        5 if params[7] is None else params[7],
+                    ) + params[8:]
+                    outcome['status'] = 'inserted'
+                    existing[barcode] = (params[0], params[4])
+                batch_params.append((outcome, params))
+                
+            query = f'''
+                INSERT INTO products (name, brand, model, category, price, cost,
+                                    stock_quantity, min_stock_level, barcode, description, sync_clock)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {sync.CLOCK_NOW})
+                ON CONFLICT(barcode) DO UPDATE SET
+                    name = excluded.name,
+                    brand = COALESCE(excluded.brand, products.brand),
+                    model = COALESCE(excluded.model, products.model),
+                    category = COALESCE(excluded.category, products.category),
+                    price = COALESCE(excluded.price, products.price),
+                    cost = COALESCE(excluded.cost, products.cost),
+                    stock_quantity = COALESCE(excluded.stock_quantity, products.stock_quantity),
+                    min_stock_level = COALESCE(excluded.min_stock_level, products.min_stock_level),
+                    description = COALESCE(excluded.description, products.description),
+                    updated_at = CURRENT_TIMESTAMP,
+                    sync_clock = {sync.CLOCK_NEXT},
+                    sync_origin = NULL
+            '''
+            
+            conn.execute("SAVEPOINT upsert_chunk")
+            try:
+                conn.executemany(query, [params for _, params in batch_params])
+                conn.execute("RELEASE upsert_chunk")
+            except sqlite3.IntegrityError:
+                # Isolate the offending rows instead of failing the whole chunk
+                conn.execute("ROLLBACK TO upsert_chunk")
+                conn.execute("RELEASE upsert_chunk")
+                for outcome, params in batch_params:
+                    try:
+                        conn.execute(query, params)
+                    except sqlite3.IntegrityError as e:
+                        outcome['status'] = 'rejected'
+                        outcome['error'] = str(e)
+                        
+        return outcomes
+    
+    def _product_filters(self, search_term: str = '', category: str = '') -> Tuple[str, List]:
+        """Build the WHERE clause shared by product listings and counts"""
+        where = "1=1"
+        params = []
+        
+        match = fts_prefix_query(search_term) if search_term else ''
+        if match:
+            where += " AND id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)"
+            params.append(match)
+            
+        if category:
+            where += " AND category = ?"
+            params.append(category)
+            
+        return where, params
+    
+    def get_products(self, search_term: str = '', category: str = '',
+                     row_format: str = 'dict') -> List:
+        """Get products with optional filtering
+        
+        ``row_format`` is 'dict' (every column), 'record' (ProductRow),
+        'tuple' (ProductRow column order) or 'columns' ({field: numpy array}
+        for vectorized summaries); all but 'dict' skip description/cost.
+        """
+        columns = self._select_columns(ProductRow, row_format)
+        where, params = self._product_filters(search_term, category)
+        with self.pool.reader() as conn:
+            return self._fetch_rows(conn, f"SELECT {columns} FROM products WHERE {where} ORDER BY name, id",
+                                    params, ProductRow, row_format)
+    
+    def get_products_page(self, search_term: str = '', category: str = '',
+                          after: Optional[Tuple] = None, limit: int = 100,
+                          row_format: str = 'dict') -> Tuple[List, Optional[Tuple]]:
+        """Get the next page of products ordered by (name, id)
+        
+        Pass the returned cursor as ``after`` to fetch the following page;
+        it is None once the last page has been returned.
+        """
+        columns = self._select_columns(ProductRow, row_format, formats=PAGE_FORMATS)
+        where, params = self._product_filters(search_term, category)
+        return self._fetch_page(f"SELECT {columns} FROM products", where, params,
+                                [('name', 'name'), ('id', 'id')], after, limit,
+                                record_cls=ProductRow, row_format=row_format)
+    
+    def count_products(self, search_term: str = '', category: str = '') -> int:
+        """Count products matching the filters (cached until the next write)"""
+        where, params = self._product_filters(search_term, category)
+        return self._cached_count(f"SELECT COUNT(*) FROM products WHERE {where}", params)
+    
+    def get_products_by_ids(self, product_ids: Iterable[int], row_format: str = 'dict') -> List:
+        """Get the products with the given ids, e.g. the rows named by get_changes"""
+        return self._fetch_by_ids('products', product_ids, ProductRow, row_format)
+    
+    def search_products(self, search_term: str, category: str = '', limit: int = 50,
+                        row_format: str = 'dict') -> List:
+        """Ranked prefix search over name, brand, model, description and barcode
+        
+        Matching ignores alef forms, taa marbuta/haa, yaa/alef maqsura and
+        tashkeel, so 'احمد' finds 'أحمد'. Prefixes matching more than
+        RANKED_SEARCH_CANDIDATES products skip bm25 scoring (which costs
+        per match) and return the first matches by name instead.
+        """
+        columns = self._select_columns(ProductRow, row_format, formats=PAGE_FORMATS)
+        match = fts_prefix_query(search_term)
+        if not match:
+            return []
+            
+        if category:
+            hits = '''
+                SELECT f.rowid FROM products_fts f CROSS JOIN products p ON p.id = f.rowid
+                WHERE products_fts MATCH ? AND p.category = ?
+            '''
+            params = [match, category]
+        else:
+            hits = "SELECT rowid FROM products_fts WHERE products_fts MATCH ?"
+            params = [match]
+            
+        with self.pool.reader() as conn:
+            candidates = conn.execute(
+                f"SELECT COUNT(*) FROM ({hits} LIMIT ?)",
+                params + [self.RANKED_SEARCH_CANDIDATES + 1]
+            ).fetchone()[0]
+            ranked = candidates <= self.RANKED_SEARCH_CANDIDATES
+            
+            order = " ORDER BY rank" if ranked else ""
+            ids = [row[0] for row in conn.execute(f"{hits}{order} LIMIT ?", params + [limit])]
+            if not ids:
+                return []
                 
-            query += " ORDER BY name"
+            placeholders = ", ".join("?" * len(ids))
+            products = self._fetch_rows(
+                conn, f"SELECT {columns} FROM products WHERE id IN ({placeholders}) ORDER BY name",
+                ids, ProductRow, row_format
+            )
             
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+        if ranked:
+            position = {product_id: index for index, product_id in enumerate(ids)}
+            products.sort(key=lambda product: position[self._row_value(product, 'id', ProductRow, row_format)])
+        return products
     
+    @group_committed
     def update_product(self, product_id: int, product_data: Dict[str, Any]) -> bool:
         """Update product information"""
-        with self.get_connection() as conn:
+        with self.pool.writer() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.execute(f'''
                 UPDATE products SET 
                     name = ?, brand = ?, model = ?, category = ?, price = ?, 
                     cost = ?, stock_quantity = ?, min_stock_level = ?, 
-                    barcode = ?, description = ?, updated_at = CURRENT_TIMESTAMP
+                    barcode = ?, description = ?, updated_at = CURRENT_TIMESTAMP,
+                    sync_clock = {sync.CLOCK_NEXT}, sync_origin = NULL
                 WHERE id = ?
             ''', (
                 product_data.get('name'),
                 product_data.get('brand'),
                 product_data.get('model'),
                 product_data.get('category'),
-                product_data.get('price'),
-                product_data.get('cost'),
+                money.to_minor(product_data.get('price')),
+                money.to_minor(product_data.get('cost')),
                 product_data.get('stock_quantity'),
                 product_data.get('min_stock_level'),
                 product_data.get('barcode'),
                 product_data.get('description'),
                 product_id
             ))
-            conn.commit()
             return cursor.rowcount > 0
     
-    def get_low_stock_products(self) -> List[Dict]:
-        """Get products with stock below minimum level"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM products 
-                WHERE stock_quantity <= min_stock_level 
+    def get_low_stock_products(self, row_format: str = 'dict') -> List:
+        """Get products with stock below minimum level
+        
+        Reads the low_stock_alerts rows kept by triggers instead of scanning
+        every product.
+        """
+        columns = self._select_columns(ProductRow, row_format)
+        with self.pool.reader() as conn:
+            return self._fetch_rows(conn, f'''
+                SELECT {columns} FROM products 
+                WHERE id IN (SELECT product_id FROM low_stock_alerts) 
                 ORDER BY stock_quantity ASC
-            ''')
-            return [dict(row) for row in cursor.fetchall()]
+            ''', [], ProductRow, row_format)
+            
+    def add_low_stock_listener(self, callback: Callable[[List[ProductRow]], None]):
+        """Call ``callback(products)`` after each commit that makes products cross their minimum stock
+        
+        Products already low when the first listener is added are not
+        reported. Callbacks run on the committing thread.
+        """
+        if not self._low_stock_listeners:
+            self._low_stock_seen = self._latest_low_stock_alert()
+        self._low_stock_listeners.append(callback)
+        
+    def remove_low_stock_listener(self, callback: Callable[[List[ProductRow]], None]):
+        """Stop calling a low stock listener"""
+        if callback in self._low_stock_listeners:
+            self._low_stock_listeners.remove(callback)
+            
+    def _latest_low_stock_alert(self) -> int:
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM low_stock_alerts").fetchone()[0]
+            
+    def dispatch_low_stock_alerts(self):
+        """Report alerts recorded since the last dispatch (runs after every commit)"""
+        if not self._low_stock_listeners:
+            return
+        try:
+            # Still inside the committing writer block: this nested use gets the
+            # writer connection, whose page cache is warm, and commits nothing
+            with self.pool.writer() as conn:
+                latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM low_stock_alerts").fetchone()[0]
+                if latest <= self._low_stock_seen:
+                    # Lower ids mean a restored database replaced the alerts
+                    self._low_stock_seen = latest
+                    return
+                products = self._fetch_rows(conn, f'''
+                    SELECT {", ".join(ProductRow._columns)} FROM products
+                    WHERE id IN (SELECT product_id FROM low_stock_alerts WHERE id > ? AND id <= ?)
+                    ORDER BY stock_quantity ASC
+                ''', [self._low_stock_seen, latest], ProductRow, 'record')
+                self._low_stock_seen = latest
+        except sqlite3.Error as e:
+            print(f"Error reading low stock alerts: {e}")
+            return
+            
+        for callback in list(self._low_stock_listeners):
+            # The write has committed: a failing listener must not reach its
+            # caller or keep the remaining listeners and commit hooks from running
+            try:
+                callback(products)
+            except Exception:
+                logger.exception("Error in low stock listener")
+    
+    def get_inventory_stats(self) -> Dict[str, Any]:
+        """Get product count, stock units, stock value, low stock and out of stock counts
+        
+        Reads the one-row inventory_stats table kept current by triggers.
+        """
+        with self.pool.reader() as conn:
+            row = conn.execute(f'''
+                SELECT {", ".join(rollups.INVENTORY_COUNTERS)} FROM inventory_stats WHERE id = 1
+            ''').fetchone()
+            stats = dict(row)
+        stats['stock_value'] = money.from_minor(stats['stock_value'])
+        return stats
+    
+    def rebuild_inventory_stats(self):
+        """Recompute the inventory counters from the products table"""
+        with self.pool.writer() as conn:
+            rollups.rebuild_inventory_stats(conn.cursor())
+    
+    def check_inventory_stats(self) -> Dict[str, Tuple]:
+        """Get {counter: (expected, stored)} for counters that drifted from the products table"""
+        with self.pool.reader() as conn:
+            return rollups.check_inventory_stats(conn)
     
     # Customer operations
+    @group_committed
     def add_customer(self, customer_data: Dict[str, Any]) -> int:
         """Add a new customer"""
-        with self.get_connection() as conn:
+        with self.pool.writer() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO customers (name, phone, email, address, city, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
+            cursor.execute(f'''
+                INSERT INTO customers (name, phone, email, address, city, notes, sync_clock)
+                VALUES (?, ?, ?, ?, ?, ?, {sync.CLOCK_NOW})
             ''', (
                 customer_data.get('name'),
                 customer_data.get('phone'),
@@ -288,31 +951,77 @@ class DatabaseManager:
                 customer_data.get('city'),
                 customer_data.get('notes')
             ))
-            conn.commit()
             return cursor.lastrowid
     
-    def get_customers(self, search_term: str = '') -> List[Dict]:
-        """Get customers with optional search"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            if search_term:
-                cursor.execute('''
-                    SELECT * FROM customers 
-                    WHERE name LIKE ? OR phone LIKE ? OR email LIKE ?
-                    ORDER BY name
-                ''', (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-            else:
-                cursor.execute("SELECT * FROM customers ORDER BY name")
-                
-            return [dict(row) for row in cursor.fetchall()]
+    def _customer_filters(self, search_term: str = '') -> Tuple[str, List]:
+        """Build the WHERE clause shared by customer listings and counts"""
+        if not search_term:
+            return "1=1", []
+        search_pattern = f"%{search_term}%"
+        return "(name LIKE ? OR phone LIKE ? OR email LIKE ?)", [search_pattern] * 3
+    
+    def get_customers(self, search_term: str = '', row_format: str = 'dict') -> List:
+        """Get customers with optional search (see get_products for ``row_format``)"""
+        columns = self._select_columns(CustomerRow, row_format)
+        where, params = self._customer_filters(search_term)
+        with self.pool.reader() as conn:
+            return self._fetch_rows(conn, f"SELECT {columns} FROM customers WHERE {where} ORDER BY name, id",
+                                    params, CustomerRow, row_format)
+    
+    def get_customers_page(self, search_term: str = '', after: Optional[Tuple] = None,
+                           limit: int = 100, row_format: str = 'dict') -> Tuple[List, Optional[Tuple]]:
+        """Get the next page of customers ordered by (name, id)"""
+        columns = self._select_columns(CustomerRow, row_format, formats=PAGE_FORMATS)
+        where, params = self._customer_filters(search_term)
+        return self._fetch_page(f"SELECT {columns} FROM customers", where, params,
+                                [('name', 'name'), ('id', 'id')], after, limit,
+                                record_cls=CustomerRow, row_format=row_format)
+    
+    def count_customers(self, search_term: str = '') -> int:
+        """Count customers matching the search (cached until the next write)"""
+        where, params = self._customer_filters(search_term)
+        return self._cached_count(f"SELECT COUNT(*) FROM customers WHERE {where}", params)
+    
+    def get_customers_by_ids(self, customer_ids: Iterable[int], row_format: str = 'dict') -> List:
+        """Get the customers with the given ids, e.g. the rows named by get_changes"""
+        return self._fetch_by_ids('customers', customer_ids, CustomerRow, row_format)
     
     # Sales operations
+    @group_committed
     def add_sale(self, sale_data: Dict[str, Any], sale_items: List[Dict]) -> int:
         """Add a new sale with items"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        with self.pool.writer() as conn:
+            return self._insert_sales(conn.cursor(), [(sale_data, sale_items)])[0]
+    
+    def add_sales_batch(self, sales: Iterable[Tuple[Dict[str, Any], List[Dict]]],
+                        chunk_size: int = 200) -> List[int]:
+        """Add many (sale_data, sale_items) pairs, e.g. a till's offline queue
+        
+        Sales are committed in transactions of at most ``chunk_size`` sales;
+        each chunk is atomic. If a chunk fails the exception propagates and
+        earlier chunks stay committed. Returns the new sale ids in order.
+        """
+        sale_ids = []
+        pending = iter(sales)
+        
+        while True:
+            chunk = list(islice(pending, chunk_size))
+            if not chunk:
+                break
+            with self.pool.writer() as conn:
+                sale_ids.extend(self._insert_sales(conn.cursor(), chunk))
+                
+        return sale_ids
+    
+    def _insert_sales(self, cursor: sqlite3.Cursor,
+                      sales: List[Tuple[Dict[str, Any], List[Dict]]]) -> List[int]:
+        """Write sales inside the caller's transaction with batched item/stock statements"""
+        sale_ids = []
+        item_rows = []
+        stock_changes: Dict[int, int] = {}
+        customer_changes: Dict[int, List] = {}
+        
+        for sale_data, sale_items in sales:
             # Add sale record
             cursor.execute('''
                 INSERT INTO sales (customer_id, total_amount, discount_amount, 
@@ -320,92 +1029,364 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 sale_data.get('customer_id'),
-                sale_data.get('total_amount'),
-                sale_data.get('discount_amount', 0),
-                sale_data.get('tax_amount', 0),
+                money.to_minor(sale_data.get('total_amount')),
+                money.to_minor(sale_data.get('discount_amount', 0)),
+                money.to_minor(sale_data.get('tax_amount', 0)),
                 sale_data.get('payment_method'),
                 sale_data.get('status', 'completed'),
                 sale_data.get('notes')
             ))
             
             sale_id = cursor.lastrowid
+            sale_ids.append(sale_id)
             
-            # Add sale items and update stock
             for item in sale_items:
-                cursor.execute('''
-                    INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
+                item_rows.append((
                     sale_id,
                     item['product_id'],
                     item['quantity'],
-                    item['unit_price'],
-                    item['total_price']
+                    money.to_minor(item['unit_price']),
+                    money.to_minor(item['total_price'])
                 ))
+                stock_changes[item['product_id']] = stock_changes.get(item['product_id'], 0) + item['quantity']
                 
-                # Update product stock
-                cursor.execute('''
-                    UPDATE products SET stock_quantity = stock_quantity - ?
-                    WHERE id = ?
-                ''', (item['quantity'], item['product_id']))
-            
-            # Update customer total purchases
             if sale_data.get('customer_id'):
-                cursor.execute('''
-                    UPDATE customers SET 
-                        total_purchases = total_purchases + ?,
-                        loyalty_points = loyalty_points + ?
-                    WHERE id = ?
-                ''', (
-                    sale_data.get('total_amount'),
-                    int(sale_data.get('total_amount', 0) / 10),  # 1 point per 10 units
-                    sale_data.get('customer_id')
-                ))
-            
-            conn.commit()
-            return sale_id
+                totals = customer_changes.setdefault(sale_data['customer_id'], [0, 0])
+                totals[0] += money.to_minor(sale_data.get('total_amount'))
+                totals[1] += int(sale_data.get('total_amount', 0) / 10)  # 1 point per 10 units
+                
+        # Add sale items and update stock, one statement each for the whole batch
+        cursor.executemany('''
+            INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
+            VALUES (?, ?, ?, ?, ?)
+        ''', item_rows)
+        
+        cursor.executemany('''
+            UPDATE products SET stock_quantity = stock_quantity - ?
+            WHERE id = ?
+        ''', [(quantity, product_id) for product_id, quantity in stock_changes.items()])
+        
+        # Update customer total purchases
+        cursor.executemany('''
+            UPDATE customers SET 
+                total_purchases = total_purchases + ?,
+                loyalty_points = loyalty_points + ?
+            WHERE id = ?
+        ''', [(amount, points, customer_id) for customer_id, (amount, points) in customer_changes.items()])
+        
+        return sale_ids
     
-    def get_sales_report(self, start_date: str = None, end_date: str = None) -> List[Dict]:
-        """Get sales report with date filtering"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+    def _sales_filters(self, start_date: str = None, end_date: str = None,
+                       customer_id: Optional[int] = None, payment_method: Optional[str] = None,
+                       status: Optional[str] = None, by_business_date: bool = False) -> Tuple[str, List]:
+        """Build the WHERE clause shared by sales listings and counts
+        
+        Dates are inclusive 'YYYY-MM-DD' days, matched as a half-open range on
+        the raw column so the created_at (or business_date) index is used.
+        """
+        where = "1=1"
+        params = []
+        
+        date_column = "s.business_date" if by_business_date else "s.created_at"
+        
+        if start_date:
+            where += f" AND {date_column} >= ?"
+            params.append(start_date)
+            
+        if end_date:
+            where += f" AND {date_column} < ?"
+            params.append(self._next_day(end_date))
+            
+        if customer_id is not None:
+            where += " AND s.customer_id = ?"
+            params.append(customer_id)
+            
+        if payment_method:
+            where += " AND s.payment_method = ?"
+            params.append(payment_method)
+            
+        if status:
+            where += " AND s.status = ?"
+            params.append(status)
             
-            query = '''
-                SELECT s.*, c.name as customer_name, c.phone as customer_phone
-                FROM sales s
+        return where, params
+    
+    def get_sales_report(self, start_date: str = None, end_date: str = None,
+                         customer_id: Optional[int] = None, payment_method: Optional[str] = None,
+                         status: Optional[str] = None, by_business_date: bool = False,
+                         row_format: str = 'dict') -> List:
+        """Get sales report with date and optional customer/payment/status filtering
+        
+        Archived years the date range reaches are read from their archive
+        files and merged in, so the report spans live and archived sales.
+        """
+        columns = self._select_columns(SaleRow, row_format, self.SALE_REPORT_COLUMNS)
+        where, params = self._sales_filters(start_date, end_date, customer_id,
+                                            payment_method, status, by_business_date)
+        
+        def query(table: str, bound: str = '') -> str:
+            return f'''
+                SELECT {columns}
+                FROM {table} s
                 LEFT JOIN customers c ON s.customer_id = c.id
-                WHERE 1=1
+                WHERE {where}{bound}
+                ORDER BY s.created_at DESC, s.id DESC
             '''
-            params = []
             
-            if start_date:
-                query += " AND DATE(s.created_at) >= ?"
-                params.append(start_date)
+        with self.pool.reader() as conn:
+            archives = self._sales_archives(conn, start_date, end_date, by_business_date)
+            if not archives:
+                return self._fetch_rows(conn, query('sales'), params, SaleRow, row_format)
                 
-            if end_date:
-                query += " AND DATE(s.created_at) <= ?"
-                params.append(end_date)
-                
-            query += " ORDER BY s.created_at DESC"
+            # Merged as tuples and converted to columns once at the end
+            merge_format = 'tuple' if row_format == 'columns' else row_format
+            results = [self._fetch_rows(conn, query('sales'), params, SaleRow, merge_format)]
+            for schema, archive_file, before in archives:
+                with archive.attached(conn, archive_file, schema):
+                    results.append(self._fetch_rows(conn, query(f'{schema}.sales', self.ARCHIVE_BOUND),
+                                                    params + [before], SaleRow, merge_format))
+                    
+        rows = self._merge_newest_first(results, SaleRow, merge_format)
+        if row_format == 'columns':
+            return rows_to_columns(rows, SaleRow.__slots__, SaleRow._dtypes)
+        return rows
+    
+    def get_sales_page(self, start_date: str = None, end_date: str = None,
+                       after: Optional[Tuple] = None, limit: int = 100,
+                       row_format: str = 'dict', **filters) -> Tuple[List, Optional[Tuple]]:
+        """Get the next page of sales, newest first, ordered by (created_at, id)
+        
+        ``filters`` are the optional keyword filters of get_sales_report().
+        Pages continue into the archived years the date range reaches.
+        """
+        columns = self._select_columns(SaleRow, row_format, self.SALE_REPORT_COLUMNS, PAGE_FORMATS)
+        where, params = self._sales_filters(start_date, end_date, **filters)
+        order = [('s.created_at', 'created_at'), ('s.id', 'id')]
+        
+        def select(table: str) -> str:
+            return f'''
+                SELECT {columns}
+                FROM {table} s
+                LEFT JOIN customers c ON s.customer_id = c.id
+            '''
             
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+        with self.pool.reader() as conn:
+            archives = self._sales_archives(conn, start_date, end_date,
+                                            filters.get('by_business_date', False))
+            if not archives:
+                return self._fetch_page(select('sales'), where, params, order, after, limit,
+                                        descending=True, record_cls=SaleRow, row_format=row_format)
+                                        
+            # Each source's next page, merged; the page's last row is the cursor
+            pages = [self._fetch_page(select('sales'), where, params, order, after, limit,
+                                      descending=True, record_cls=SaleRow, row_format=row_format)[0]]
+            for schema, archive_file, before in archives:
+                with archive.attached(conn, archive_file, schema):
+                    pages.append(self._fetch_page(select(f'{schema}.sales'),
+                                                  where + self.ARCHIVE_BOUND, params + [before], order,
+                                                  after, limit, descending=True,
+                                                  record_cls=SaleRow, row_format=row_format)[0])
+                    
+        rows = self._merge_newest_first(pages, SaleRow, row_format, limit)
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = tuple(self._row_value(rows[-1], key, SaleRow, row_format) for _, key in order)
+        return rows, next_cursor
+    
+    def count_sales(self, start_date: str = None, end_date: str = None, **filters) -> int:
+        """Count live and archived sales matching the filters (cached until the next write)"""
+        where, params = self._sales_filters(start_date, end_date, **filters)
+        count = self._cached_count(f"SELECT COUNT(*) FROM sales s WHERE {where}", params)
+        with self.pool.reader() as conn:
+            archives = self._sales_archives(conn, start_date, end_date,
+                                            filters.get('by_business_date', False))
+        for schema, archive_file, before in archives:
+            count += self._cached_count(
+                f"SELECT COUNT(*) FROM {schema}.sales s WHERE {where}{self.ARCHIVE_BOUND}",
+                params + [before], (schema, archive_file)
+            )
+        return count
+    
+    # Sales archive
+    def _sales_archives(self, conn: sqlite3.Connection, start_date: Optional[str],
+                        end_date: Optional[str], by_business_date: bool = False) -> List[Tuple[str, str, str]]:
+        """Get (schema, archive file, archived_before) for the archived years a date range reaches
+        
+        Years that cannot be read are left out with a warning: a missing
+        file, or one a report snapshot's open transaction has not attached.
+        """
+        found = []
+        for year, before in archive.archives_in_range(archive.list_archives(conn), start_date,
+                                                      end_date, by_business_date):
+            archive_file = archive.archive_path(self.archive_dir, year)
+            schema = archive.archive_schema(year)
+            if not os.path.exists(archive_file):
+                logger.warning("Sales archive %s not found; its sales are left out", archive_file)
+                continue
+            if conn.in_transaction and not archive.is_attached(conn, schema):
+                logger.warning("Sales archive %s is past the report snapshot's attach limit; "
+                               "its sales are left out", archive_file)
+                continue
+            found.append((schema, archive_file, before))
+        return found
+        
+    @classmethod
+    def _merge_newest_first(cls, results: List[List], record_cls: type, row_format: str,
+                            limit: Optional[int] = None) -> List:
+        """Merge per-source rows already sorted newest first by (created_at, id)"""
+        def key(row):
+            return (cls._row_value(row, 'created_at', record_cls, row_format),
+                    cls._row_value(row, 'id', record_cls, row_format))
+        return list(islice(heapq.merge(*results, key=key, reverse=True), limit))
+        
+    def archive_sales(self, months: Optional[int] = None) -> Dict[int, int]:
+        """Move sales older than ``months`` (ARCHIVE_AFTER_MONTHS) whole months to per-year archive files
+        
+        Returns {year: sales moved}. Each year is copied to its file in one
+        transaction and removed from the live database in a second one.
+        """
+        cutoff = archive.archive_cutoff(date.today(), months or self.ARCHIVE_AFTER_MONTHS)
+        with self.pool.reader() as conn:
+            years = [int(row[0]) for row in conn.execute(
+                "SELECT DISTINCT SUBSTR(business_date, 1, 4) FROM sales WHERE business_date < ?",
+                (cutoff,)
+            )]
+        if years:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            
+        moved = {}
+        for year in years:
+            start = f"{year:04d}-01-01"
+            before = min(cutoff, f"{year + 1:04d}-01-01")
+            schema = archive.archive_schema(year)
+            with self.pool.writer() as conn:
+                with archive.attached(conn, archive.archive_path(self.archive_dir, year), schema):
+                    # Report snapshots reading the file must not hold up the move
+                    conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+                    conn.execute("BEGIN IMMEDIATE")
+                    archive.create_archive_tables(conn, schema)
+                    archive.copy_period(conn, schema, start, before)
+                    conn.commit()
+                    
+                    conn.execute("BEGIN IMMEDIATE")
+                    moved[year] = archive.remove_period(conn, year, start, before)
+                    conn.commit()
+        return moved
+        
+    def list_sales_archives(self) -> List[Dict[str, Any]]:
+        """Get the archived years with their bound, sale count and file"""
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT year, archived_before, sale_count FROM sales_archives ORDER BY year").fetchall()
+        return [dict(row, file=archive.archive_path(self.archive_dir, row['year'])) for row in rows]
+    
+    def get_sales_rollup(self, start_date: str = None, end_date: str = None,
+                         period: str = 'day', by_payment_method: bool = False) -> List[Dict]:
+        """Get sale count, gross, discount and tax per business day or month
+        
+        Reads the trigger-maintained daily_sales/monthly_sales tables, so the
+        cost depends on the number of days in the range, not of sales.
+        """
+        if period not in ('day', 'month'):
+            raise ValueError(f"Unknown rollup period: {period}")
+        table = 'daily_sales' if period == 'day' else 'monthly_sales'
+        length = 10 if period == 'day' else 7
+        
+        where = "1=1"
+        params = []
+        if start_date:
+            where += f" AND {period} >= ?"
+            params.append(start_date[:length])
+        if end_date:
+            where += f" AND {period} <= ?"
+            params.append(end_date[:length])
+            
+        group = f"{period}, payment_method" if by_payment_method else period
+        method = "payment_method, " if by_payment_method else ""
+        with self.pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {period} AS period, {method}SUM(sale_count) AS sale_count,
+                       SUM(gross) AS gross, SUM(discount) AS discount, SUM(tax) AS tax
+                FROM {table}
+                WHERE {where}
+                GROUP BY {group}
+                ORDER BY {group}
+            ''', params)
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+        # Summed exactly in minor units, converted once per period
+        for row in rows:
+            for column in rollups.ROLLUP_MONEY:
+                row[column] = money.from_minor(row[column])
+        return rows
+    
+    def rebuild_sales_rollups(self):
+        """Recompute the sales rollup tables from the live sales table (archived periods are kept)"""
+        with self.pool.writer() as conn:
+            rollups.rebuild_sales_rollups(conn.cursor(), archive.live_since(conn))
+            
+    def check_sales_rollups(self) -> List[Dict]:
+        """Get rollup rows that differ from a fresh aggregate over the live sales"""
+        with self.pool.reader() as conn:
+            return rollups.check_sales_rollups(conn, archive.live_since(conn))
+    
+    @staticmethod
+    def _next_day(date_str: str) -> str:
+        """Get the exclusive upper bound for an inclusive 'YYYY-MM-DD' end date"""
+        day = datetime.strptime(date_str[:10], "%Y-%m-%d")
+        return (day + timedelta(days=1)).strftime("%Y-%m-%d")
     
     # Settings operations
+    def _load_settings(self) -> Dict[str, str]:
+        """Get the settings cache, reading the whole table on first use"""
+        settings = self._settings
+        if settings is None:
+            with self._settings_lock:
+                if self._settings is None:
+                    with self.pool.reader() as conn:
+                        self._settings = dict(conn.execute("SELECT key, value FROM settings").fetchall())
+                settings = self._settings
+        return settings
+    
     def get_setting(self, key: str, default_value: str = '') -> str:
-        """Get a setting value"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-            row = cursor.fetchone()
-            return row['value'] if row else default_value
+        """Get a setting value (a dictionary lookup after the first call)"""
+        return self._load_settings().get(key, default_value)
+    
+    def get_settings(self) -> Dict[str, str]:
+        """Get a copy of all settings"""
+        return dict(self._load_settings())
     
     def set_setting(self, key: str, value: str):
         """Set a setting value"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+        self.set_settings({key: value})
+        
+    @group_committed
+    def set_settings(self, values: Dict[str, str]):
+        """Set several setting values in one transaction
+        
+        The database is written first; the cache is updated only once
+        the transaction has committed (which, with group commit, may be
+        a batch shared with other writes).
+        """
+        if not values:
+            return
+        # Stored as TEXT, so cache what a reload would return
+        values = {key: str(value) for key, value in values.items()}
+        settings = self._load_settings()
+        
+        def publish():
+            with self._settings_lock:
+                if self._settings is settings:
+                    settings.update(values)
+                    
+        with self.pool.writer() as conn:
+            conn.executemany('''
                 INSERT OR REPLACE INTO settings (key, value, updated_at)
                 VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (key, value))
-            conn.commit()
\ No newline at end of file
+            ''', list(values.items()))
+            # Runs while the writer is still held, so caches update in commit order
+            self.pool.after_commit(publish)
+                
+    def invalidate_settings(self):
+        """Drop the settings cache so the next read reloads it from the database"""
+        self._settings = None
\ No newline at end of file
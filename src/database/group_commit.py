@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Group Commit - One writer thread committing many small writes together
+
+Every DatabaseManager write commits its own transaction, and with the
+balanced and safe profiles every commit waits for the disk. When group
+commit is on, the write methods hand their work to a GroupCommitQueue
+instead: its thread collects the writes that arrive within a short window
+(5 ms by default, closing early when writes stop arriving), runs each in its own SAVEPOINT of one transaction and
+commits once. A write that fails is rolled back alone and its caller gets
+the exception; the others still commit. Callers get their results only
+after the commit, so a returned sale id is as durable as without the queue.
+"""
+
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from .connection_pool import ConnectionPool
+
+DEFAULT_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 256
+
+_Item = Tuple[Future, Callable, tuple, dict]
+
+
+class GroupCommitQueue:
+    """Runs submitted write functions on one thread, many per transaction
+
+    The functions use ``pool.writer()`` as usual; on the queue's thread
+    those blocks are nested inside the batch transaction and commit
+    nothing themselves.
+    """
+
+    def __init__(self, pool: ConnectionPool, window: float = DEFAULT_WINDOW,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.pool = pool
+        self.window = max(0.0, window)
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue ``func(*args, **kwargs)``; the future resolves once its batch has committed"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("group commit queue is closed")
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Run ``func`` in the next batch and wait for its result (or exception)"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def close(self):
+        """Commit the writes already queued and stop the thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stop = self._collect(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _collect(self, first: _Item) -> Tuple[List[_Item], bool]:
+        """Gather the writes arriving within the window after ``first``
+
+        The batch closes early once no write has arrived for a tenth of
+        the window, so a lone write or a burst that has already arrived
+        does not wait out the whole window.
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        idle = self.window / 10
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, min(idle, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, batch: List[_Item]):
+        """Run one batch in a single transaction, each write in its own savepoint"""
+        results = []
+        try:
+            with self.pool.writer() as conn:
+                # Take the write lock up front; the savepoints then nest in this transaction
+                conn.execute("BEGIN IMMEDIATE")
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with self.pool.savepoint():
+                            results.append((future, func(*args, **kwargs)))
+                    except Exception as e:
+                        if not conn.in_transaction:
+                            # SQLite gave up the whole transaction: every write in it is lost
+                            raise
+                        future.set_exception(e)
+        except BaseException as e:
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for future, result in results:
+            future.set_result(result)
+
+
+def group_committed(method: Callable) -> Callable:
+    """Send a DatabaseManager write method through its write queue, when enabled
+
+    Calls made inside a writer() block (including the queue's own thread)
+    run directly in that transaction.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        write_queue = self.write_queue
+        if write_queue is None or self.pool.in_write():
+            return method(self, *args, **kwargs)
+        return write_queue.call(method, self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Schema Migrations - Ordered, versioned schema changes keyed on PRAGMA user_version
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from .money import MINOR_UNITS, MONEY_COLUMNS
+from .rollups import (install_sales_rollups, rebuild_sales_rollups,
+                      install_inventory_stats, rebuild_inventory_stats)
+
+DEFAULT_SETTINGS = {
+    'theme': 'light',
+    'language': 'ar',
+    'auto_backup': 'true',
+    'backup_frequency': 'daily',
+    'tax_rate': '15.0',
+    'currency': 'ريال',
+    'low_stock_alert': 'true'
+}
+
+
+def migration_001_initial_schema(cursor: sqlite3.Cursor):
+    """Create the base tables and default settings"""
+    # Products table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            brand TEXT,
+            model TEXT,
+            category TEXT,
+            price DECIMAL(10,2) NOT NULL,
+            cost DECIMAL(10,2),
+            stock_quantity INTEGER DEFAULT 0,
+            min_stock_level INTEGER DEFAULT 5,
+            barcode TEXT UNIQUE,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Customers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT UNIQUE NOT NULL,
+            email TEXT,
+            address TEXT,
+            city TEXT,
+            total_purchases DECIMAL(10,2) DEFAULT 0,
+            loyalty_points INTEGER DEFAULT 0,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Suppliers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS suppliers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            company TEXT,
+            phone TEXT,
+            email TEXT,
+            address TEXT,
+            payment_terms TEXT,
+            total_orders DECIMAL(10,2) DEFAULT 0,
+            outstanding_balance DECIMAL(10,2) DEFAULT 0,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Sales table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            total_amount DECIMAL(10,2) NOT NULL,
+            discount_amount DECIMAL(10,2) DEFAULT 0,
+            tax_amount DECIMAL(10,2) DEFAULT 0,
+            payment_method TEXT,
+            status TEXT DEFAULT 'completed',
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        )
+    ''')
+    
+    # Sale items table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL,
+            total_price DECIMAL(10,2) NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales (id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+    
+    # Services table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            service_type TEXT NOT NULL,
+            description TEXT,
+            amount DECIMAL(10,2) NOT NULL,
+            commission DECIMAL(10,2) DEFAULT 0,
+            status TEXT DEFAULT 'completed',
+            reference_number TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        )
+    ''')
+    
+    # Settings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    for key, value in DEFAULT_SETTINGS.items():
+        cursor.execute('''
+            INSERT OR IGNORE INTO settings (key, value)
+            VALUES (?, ?)
+        ''', (key, value))
+
+
+def migration_002_hot_path_indexes(cursor: sqlite3.Cursor):
+    """Index the columns used by reports, history lookups and listings"""
+    # Sales reports filter and sort on created_at
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales (created_at)")
+    # Customer history: one customer's sales in date order
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales (customer_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items (sale_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items (product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_services_customer ON services (customer_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_services_created_at ON services (created_at)")
+    # Product and customer lists are ordered by name, optionally per category
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)")
+    cursor.execute("ANALYZE")
+
+
+
+def migration_003_sales_business_date(cursor: sqlite3.Cursor):
+    """Store each sale's local business date so day filters need no DATE()"""
+    cursor.execute("ALTER TABLE sales ADD COLUMN business_date TEXT")
+    cursor.execute("UPDATE sales SET business_date = DATE(created_at, 'localtime')")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_business_date
+        AFTER INSERT ON sales
+        WHEN NEW.business_date IS NULL
+        BEGIN
+            UPDATE sales SET business_date = DATE(NEW.created_at, 'localtime')
+            WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_business_date ON sales (business_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer_business_date ON sales (customer_id, business_date)")
+
+
+
+def migration_004_products_fts(cursor: sqlite3.Cursor):
+    """Full-text index over normalized product text, kept in sync by triggers
+    
+    Relies on the normalize_ar() SQL function that DatabaseManager registers
+    on every connection it opens.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+            name, brand, model, description, barcode,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    # bm25 column weights: name, brand, model, description, barcode
+    cursor.execute('''
+        INSERT INTO products_fts (products_fts, rank)
+        VALUES ('rank', 'bm25(10.0, 5.0, 5.0, 1.0, 8.0)')
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert
+        AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, name, brand, model, description, barcode)
+            VALUES (NEW.id, normalize_ar(NEW.name), normalize_ar(NEW.brand),
+                    normalize_ar(NEW.model), normalize_ar(NEW.description),
+                    normalize_ar(NEW.barcode));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+        AFTER UPDATE OF name, brand, model, description, barcode ON products
+        BEGIN
+            DELETE FROM products_fts WHERE rowid = OLD.id;
+            INSERT INTO products_fts (rowid, name, brand, model, description, barcode)
+            VALUES (NEW.id, normalize_ar(NEW.name), normalize_ar(NEW.brand),
+                    normalize_ar(NEW.model), normalize_ar(NEW.description),
+                    normalize_ar(NEW.barcode));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete
+        AFTER DELETE ON products
+        BEGIN
+            DELETE FROM products_fts WHERE rowid = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        INSERT INTO products_fts (rowid, name, brand, model, description, barcode)
+        SELECT id, normalize_ar(name), normalize_ar(brand), normalize_ar(model),
+               normalize_ar(description), normalize_ar(barcode)
+        FROM products
+    ''')
+
+
+def migration_005_sales_rollups(cursor: sqlite3.Cursor):
+    """Trigger-maintained daily and monthly sales totals, backfilled from sales"""
+    install_sales_rollups(cursor)
+    rebuild_sales_rollups(cursor)
+
+
+def migration_006_inventory_stats(cursor: sqlite3.Cursor):
+    """Trigger-maintained inventory counters for the summary cards"""
+    install_inventory_stats(cursor)
+    rebuild_inventory_stats(cursor)
+
+
+def migration_007_low_stock_alerts(cursor: sqlite3.Cursor):
+    """Record products as they cross their minimum stock level
+    
+    One row per product currently at or below its minimum; a product that
+    recovers loses its row, so crossing again gets a new, higher id.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS low_stock_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL UNIQUE,
+            stock_quantity INTEGER,
+            min_stock_level INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    new_low = "COALESCE(NEW.stock_quantity, 0) <= COALESCE(NEW.min_stock_level, 0)"
+    old_low = "COALESCE(OLD.stock_quantity, 0) <= COALESCE(OLD.min_stock_level, 0)"
+    record_alert = '''
+        INSERT OR IGNORE INTO low_stock_alerts (product_id, stock_quantity, min_stock_level)
+        VALUES (NEW.id, NEW.stock_quantity, NEW.min_stock_level);
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_low_stock_insert
+        AFTER INSERT ON products
+        WHEN {new_low}
+        BEGIN
+            {record_alert}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_low_stock_crossed
+        AFTER UPDATE OF stock_quantity, min_stock_level ON products
+        WHEN {new_low} AND NOT ({old_low})
+        BEGIN
+            {record_alert}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_low_stock_recovered
+        AFTER UPDATE OF stock_quantity, min_stock_level ON products
+        WHEN {old_low} AND NOT ({new_low})
+        BEGIN
+            DELETE FROM low_stock_alerts WHERE product_id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_low_stock_delete
+        AFTER DELETE ON products
+        BEGIN
+            DELETE FROM low_stock_alerts WHERE product_id = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO low_stock_alerts (product_id, stock_quantity, min_stock_level)
+        SELECT id, stock_quantity, min_stock_level FROM products
+        WHERE COALESCE(stock_quantity, 0) <= COALESCE(min_stock_level, 0)
+        ORDER BY id
+    ''')
+
+
+def migration_008_change_log(cursor: sqlite3.Cursor):
+    """Versioned change feed for products, customers, sales and services
+    
+    Triggers append one entry per changed row; readers keep the latest op
+    per row. Appending keeps the cost per write to a sequential insert, and
+    DatabaseManager.prune_change_log() bounds the history.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+    ''')
+    for table in ('products', 'customers', 'sales', 'services'):
+        for op, event, row in (('insert', 'INSERT', 'NEW'), ('update', 'UPDATE', 'NEW'),
+                               ('delete', 'DELETE', 'OLD')):
+            # Filling in business_date right after a sale's insert is not a change
+            when = "WHEN OLD.business_date IS NOT NULL" if (table, op) == ('sales', 'update') else ""
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_change_{op}
+                AFTER {event} ON {table} {when}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op)
+                    VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+
+
+def migration_009_money_minor_units(cursor: sqlite3.Cursor):
+    """Store money as INTEGER minor units (halalas) instead of REAL amounts
+    
+    The columns keep their DECIMAL declaration: its NUMERIC affinity stores
+    whole numbers as INTEGER. Triggers are set aside during the rewrite so
+    it does not re-index, re-log or re-roll every row, and the rollups are
+    rebuilt from the converted values afterwards.
+    """
+    for table, columns in MONEY_COLUMNS.items():
+        triggers = cursor.execute('''
+            SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?
+        ''', (table,)).fetchall()
+        for name, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+        
+        # ROUND(x, 2) first so 1.005 stored as 1.00499... still becomes 101
+        assignments = ", ".join(
+            f"{column} = CAST(ROUND(ROUND({column}, 2) * {MINOR_UNITS}) AS INTEGER)"
+            for column in columns
+        )
+        cursor.execute(f"UPDATE {table} SET {assignments}")
+        
+        for _, sql in triggers:
+            cursor.execute(sql)
+    
+    rebuild_sales_rollups(cursor)
+    rebuild_inventory_stats(cursor)
+
+
+def migration_010_sales_archives(cursor: sqlite3.Cursor):
+    """Per-year bounds of the sales moved to archive files (see archive.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_archives (
+            year INTEGER PRIMARY KEY,
+            archived_before TEXT NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def migration_011_branch_sync(cursor: sqlite3.Cursor):
+    """Watermarks and row keys for exchanging changesets with other branches (see sync.py)"""
+    # This branch (is_local = 1, version last exported) and every branch
+    # changesets were imported from (version last imported)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            branch TEXT PRIMARY KEY,
+            is_local INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Rows first created at another branch: (origin branch, id there) -> id
+    # here. A NULL row_id marks a row deleted before it reached this branch.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_keys (
+            table_name TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            origin_id INTEGER NOT NULL,
+            row_id INTEGER,
+            PRIMARY KEY (table_name, origin, origin_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_keys_row ON sync_keys (table_name, row_id)")
+
+
+def migration_012_sync_row_clocks(cursor: sqlite3.Cursor):
+    """Row clocks deciding which edit of a product or customer wins a sync
+    
+    ``sync_clock`` is the edit's time in Unix milliseconds (see sync.py),
+    started from updated_at; ``sync_origin`` is the branch that made it,
+    NULL for this one. Triggers are set aside during the backfill so it
+    does not log every row as changed.
+    """
+    for table in ('products', 'customers'):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN sync_clock INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN sync_origin TEXT")
+        triggers = cursor.execute('''
+            SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?
+        ''', (table,)).fetchall()
+        for name, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+        
+        cursor.execute(f'''
+            UPDATE {table}
+            SET sync_clock = CAST(ROUND((julianday(COALESCE(updated_at, created_at)) - 2440587.5) * 86400000) AS INTEGER)
+            WHERE COALESCE(updated_at, created_at) IS NOT NULL
+        ''')
+        
+        for _, sql in triggers:
+            cursor.execute(sql)
+
+
+# (version, description, migration) - append only, never reorder or edit
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, 'initial schema', migration_001_initial_schema),
+    (2, 'hot-path indexes', migration_002_hot_path_indexes),
+    (3, 'sales business date', migration_003_sales_business_date),
+    (4, 'products full-text search', migration_004_products_fts),
+    (5, 'sales rollups', migration_005_sales_rollups),
+    (6, 'inventory stats', migration_006_inventory_stats),
+    (7, 'low stock alerts', migration_007_low_stock_alerts),
+    (8, 'change log', migration_008_change_log),
+    (9, 'money in minor units', migration_009_money_minor_units),
+    (10, 'sales archives', migration_010_sales_archives),
+    (11, 'branch sync', migration_011_branch_sync),
+    (12, 'sync row clocks', migration_012_sync_row_clocks),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the schema version stored in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction"""
+    applied = []
+    current = get_schema_version(conn)
+    
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        
+    return applied
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Money - Integer minor-unit amounts at the database boundary
+
+Money columns hold whole halalas (1/100 of the currency unit) as SQLite
+INTEGERs, so SUM() and the rollup triggers add exactly. DatabaseManager
+converts amounts to minor units on the way in and back to currency units
+(floats) on the way out; the rest of the application never sees minor units.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+MINOR_UNITS = 100
+
+# table -> money columns stored in minor units
+MONEY_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'products': ('price', 'cost'),
+    'customers': ('total_purchases',),
+    'suppliers': ('total_orders', 'outstanding_balance'),
+    'sales': ('total_amount', 'discount_amount', 'tax_amount'),
+    'sale_items': ('unit_price', 'total_price'),
+    'services': ('amount', 'commission'),
+}
+
+# Result column names converted back to currency units by DatabaseManager
+MONEY_FIELDS = frozenset(column for columns in MONEY_COLUMNS.values() for column in columns)
+
+
+def to_minor(value: Any) -> Optional[int]:
+    """Convert an amount in currency units (number or numeric string) to minor units
+
+    Rounds half away from zero on the decimal text, so 1.005 becomes 101.
+    Raises ValueError for anything that is not a finite amount.
+    """
+    if value is None:
+        return None
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount: {value!r}")
+    return int((amount * MINOR_UNITS).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor(value: Optional[int]) -> Optional[float]:
+    """Convert minor units back to currency units"""
+    if value is None:
+        return None
+    return value / MINOR_UNITS
+
+
+def money_indexes(names: Sequence[str]) -> List[int]:
+    """Positions of the money columns in a result's column names"""
+    return [index for index, name in enumerate(names) if name in MONEY_FIELDS]
+
+
+def rows_from_minor(rows: List[tuple], indexes: Sequence[int]) -> List[tuple]:
+    """Convert the money columns at ``indexes`` of fetched rows to currency units"""
+    if not indexes:
+        return rows
+    converted = []
+    for row in rows:
+        row = list(row)
+        for index in indexes:
+            if row[index] is not None:
+                row[index] /= MINOR_UNITS
+        converted.append(tuple(row))
+    return converted
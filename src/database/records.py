@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Records - Compact row types for list queries
+
+Listing queries can return these instead of one dict per row. Each record
+class names the columns a list screen needs (``_columns``), so large text
+such as description and notes is never fetched. Records still support
+``row['name']`` and ``row.get('name')`` so screen code written for dicts
+keeps working.
+
+The 'columns' format turns the same projection into one NumPy array per
+field (see columnar.py), typed by the record's ``_dtypes``.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+ROW_FORMATS = ('dict', 'record', 'tuple', 'columns')
+PAGE_FORMATS = ('dict', 'record', 'tuple')
+
+
+class Record:
+    """Base class for __slots__ records built from a projected query row"""
+    __slots__ = ()
+    _columns: Tuple[str, ...] = ()
+    _dtypes: Tuple[str, ...] = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+    @classmethod
+    def field_index(cls, key: str) -> int:
+        """Position of a field in the tuple form of this record"""
+        return cls.__slots__.index(key)
+
+
+class ProductRow(Record):
+    """Product list / inventory row (no description)"""
+    __slots__ = ('id', 'name', 'brand', 'model', 'category', 'price',
+                 'stock_quantity', 'min_stock_level', 'barcode', 'created_at')
+    _columns = __slots__
+    _dtypes = ('int64', 'object', 'object', 'object', 'object', 'float64',
+               'int64', 'int64', 'object', 'datetime64[s]')
+
+    id: int
+    name: str
+    brand: Optional[str]
+    model: Optional[str]
+    category: Optional[str]
+    price: float
+    stock_quantity: int
+    min_stock_level: int
+    barcode: Optional[str]
+    created_at: str
+
+
+class CustomerRow(Record):
+    """Customer list row (no address or notes)"""
+    __slots__ = ('id', 'name', 'phone', 'email', 'city', 'total_purchases',
+                 'loyalty_points', 'created_at')
+    _columns = __slots__
+    _dtypes = ('int64', 'object', 'object', 'object', 'object', 'float64',
+               'int64', 'datetime64[s]')
+
+    id: int
+    name: str
+    phone: str
+    email: Optional[str]
+    city: Optional[str]
+    total_purchases: float
+    loyalty_points: int
+    created_at: str
+
+
+class SaleRow(Record):
+    """Sales report row with the customer's name (no notes)"""
+    __slots__ = ('id', 'customer_id', 'total_amount', 'discount_amount', 'tax_amount',
+                 'payment_method', 'status', 'created_at', 'customer_name')
+    _columns = ('s.id', 's.customer_id', 's.total_amount', 's.discount_amount', 's.tax_amount',
+                's.payment_method', 's.status', 's.created_at', 'c.name')
+    _dtypes = ('int64', 'int64', 'float64', 'float64', 'float64',
+               'object', 'object', 'datetime64[s]', 'object')
+
+    id: int
+    customer_id: Optional[int]
+    total_amount: float
+    discount_amount: float
+    tax_amount: float
+    payment_method: Optional[str]
+    status: str
+    created_at: str
+    customer_name: Optional[str]
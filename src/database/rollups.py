@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollups - Aggregate tables kept current by triggers
+
+``daily_sales`` and ``monthly_sales`` hold the sale count, gross, discount
+and tax per business day (or month) and payment method. ``inventory_stats``
+is a single row of catalog counters: products, units, stock value, low
+stock and out of stock. Triggers apply every insert, update and delete
+inside the writing transaction, so the rollups always match their source
+tables. Amounts are integer minor units, like the columns they sum.
+
+Usage:
+    python src/database/rollups.py rebuild <database.db>
+    python src/database/rollups.py check <database.db>
+"""
+
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Matches the business_date trigger, which fills the column after insert
+DAY_EXPR = "COALESCE({row}.business_date, DATE({row}.created_at, 'localtime'))"
+MONTH_EXPR = "SUBSTR(" + DAY_EXPR + ", 1, 7)"
+
+# rollup table -> (period column, period expression)
+ROLLUP_TABLES = {
+    'daily_sales': ('day', DAY_EXPR),
+    'monthly_sales': ('month', MONTH_EXPR),
+}
+
+# Rollup columns holding money, in minor units like the sales columns
+ROLLUP_MONEY = ('gross', 'discount', 'tax')
+
+
+def _add_row(table: str, row: str) -> str:
+    """Statement folding one sale row (NEW or OLD) into a rollup table"""
+    column, expr = ROLLUP_TABLES[table]
+    return f'''
+        INSERT INTO {table} ({column}, payment_method, sale_count, gross, discount, tax)
+        VALUES ({expr.format(row=row)}, COALESCE({row}.payment_method, ''), 1,
+                COALESCE({row}.total_amount, 0), COALESCE({row}.discount_amount, 0),
+                COALESCE({row}.tax_amount, 0))
+        ON CONFLICT ({column}, payment_method) DO UPDATE SET
+            sale_count = sale_count + 1,
+            gross = gross + excluded.gross,
+            discount = discount + excluded.discount,
+            tax = tax + excluded.tax;
+    '''
+
+
+def _remove_row(table: str, row: str) -> str:
+    """Statements taking one sale row back out of a rollup table"""
+    column, expr = ROLLUP_TABLES[table]
+    key = f"{column} = {expr.format(row=row)} AND payment_method = COALESCE({row}.payment_method, '')"
+    return f'''
+        UPDATE {table} SET
+            sale_count = sale_count - 1,
+            gross = gross - COALESCE({row}.total_amount, 0),
+            discount = discount - COALESCE({row}.discount_amount, 0),
+            tax = tax - COALESCE({row}.tax_amount, 0)
+        WHERE {key};
+        DELETE FROM {table} WHERE {key} AND sale_count <= 0;
+    '''
+
+
+def install_sales_rollups(cursor: sqlite3.Cursor):
+    """Create the rollup tables and the triggers that maintain them"""
+    for table, (column, _) in ROLLUP_TABLES.items():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {column} TEXT NOT NULL,
+                payment_method TEXT NOT NULL DEFAULT '',
+                sale_count INTEGER NOT NULL DEFAULT 0,
+                gross DECIMAL(12,2) NOT NULL DEFAULT 0,
+                discount DECIMAL(12,2) NOT NULL DEFAULT 0,
+                tax DECIMAL(12,2) NOT NULL DEFAULT 0,
+                PRIMARY KEY ({column}, payment_method)
+            ) WITHOUT ROWID
+        ''')
+
+    tables = list(ROLLUP_TABLES)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_insert
+        AFTER INSERT ON sales
+        BEGIN
+            {''.join(_add_row(table, 'NEW') for table in tables)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_delete
+        AFTER DELETE ON sales
+        BEGIN
+            {''.join(_remove_row(table, 'OLD') for table in tables)}
+        END
+    ''')
+    # Filling in business_date after insert leaves the rollup key unchanged,
+    # so only changes to a rolled-up value move the row
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_update
+        AFTER UPDATE OF total_amount, discount_amount, tax_amount, payment_method,
+                        business_date, created_at ON sales
+        WHEN {DAY_EXPR.format(row='OLD')} IS NOT {DAY_EXPR.format(row='NEW')}
+          OR OLD.payment_method IS NOT NEW.payment_method
+          OR OLD.total_amount IS NOT NEW.total_amount
+          OR OLD.discount_amount IS NOT NEW.discount_amount
+          OR OLD.tax_amount IS NOT NEW.tax_amount
+        BEGIN
+            {''.join(_remove_row(table, 'OLD') for table in tables)}
+            {''.join(_add_row(table, 'NEW') for table in tables)}
+        END
+    ''')
+
+
+def _since(table: str, since: Optional[str]) -> Tuple[str, str, List[str]]:
+    """WHERE clauses (rollup rows, sales rows) and params limiting a rollup to periods from ``since``"""
+    if since is None:
+        return "1=1", "1=1", []
+    column, expr = ROLLUP_TABLES[table]
+    period = since[:10] if table == 'daily_sales' else since[:7]
+    return f"{column} >= ?", f"{expr.format(row='sales')} >= ?", [period]
+
+
+def _rollup_query(table: str, since: Optional[str] = None) -> str:
+    """Recompute a rollup table's rows from the sales table"""
+    column, expr = ROLLUP_TABLES[table]
+    _, where, _ = _since(table, since)
+    return f'''
+        SELECT {expr.format(row='sales')} AS {column}, COALESCE(payment_method, '') AS payment_method,
+               COUNT(*) AS sale_count, COALESCE(SUM(total_amount), 0) AS gross,
+               COALESCE(SUM(discount_amount), 0) AS discount, COALESCE(SUM(tax_amount), 0) AS tax
+        FROM sales
+        WHERE {where}
+        GROUP BY 1, 2
+    '''
+
+
+def rebuild_sales_rollups(cursor: sqlite3.Cursor, since: Optional[str] = None):
+    """Backfill the rollup tables inside the caller's transaction
+
+    With ``since`` (the first live business day, a month start), earlier
+    periods are left alone: their sales are archived and only the rollups
+    still hold their totals.
+    """
+    for table, (column, _) in ROLLUP_TABLES.items():
+        where, _, params = _since(table, since)
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+        cursor.execute(f'''
+            INSERT INTO {table} ({column}, payment_method, sale_count, gross, discount, tax)
+            {_rollup_query(table, since)}
+        ''', params)
+
+
+def check_sales_rollups(conn: sqlite3.Connection, since: Optional[str] = None) -> List[Dict]:
+    """Compare the rollup tables with a fresh aggregate; returns the rows that drifted
+
+    Amounts are whole minor units, so any difference is drift. With
+    ``since``, only periods still backed by live sales are compared.
+    """
+    drift = []
+    for table, (column, _) in ROLLUP_TABLES.items():
+        where, _, params = _since(table, since)
+        expected = {(row[0], row[1]): tuple(row[2:])
+                    for row in conn.execute(_rollup_query(table, since), params)}
+        stored = {(row[0], row[1]): tuple(row[2:])
+                  for row in conn.execute(f'''
+                      SELECT {column}, payment_method, sale_count, gross, discount, tax FROM {table}
+                      WHERE {where}
+                  ''', params)}
+        for key in sorted(expected.keys() | stored.keys()):
+            want = expected.get(key, (0, 0, 0, 0))
+            have = stored.get(key, (0, 0, 0, 0))
+            if want != have:
+                drift.append({'table': table, 'period': key[0], 'payment_method': key[1],
+                              'expected': want, 'stored': have})
+    return drift
+
+
+# inventory_stats column -> one product row's contribution
+INVENTORY_COUNTERS = {
+    'product_count': "1",
+    'stock_units': "COALESCE({row}.stock_quantity, 0)",
+    'stock_value': "COALESCE({row}.price, 0) * COALESCE({row}.stock_quantity, 0)",
+    'low_stock_count': "(COALESCE({row}.stock_quantity, 0) <= COALESCE({row}.min_stock_level, 0))",
+    'out_of_stock_count': "(COALESCE({row}.stock_quantity, 0) <= 0)",
+}
+
+
+def _apply_product(row: str, sign: str) -> str:
+    """Statement adding (+) or subtracting (-) one product row's counters"""
+    assignments = ", ".join(f"{column} = {column} {sign} {expr.format(row=row)}"
+                            for column, expr in INVENTORY_COUNTERS.items())
+    return f"UPDATE inventory_stats SET {assignments} WHERE id = 1;"
+
+
+def install_inventory_stats(cursor: sqlite3.Cursor):
+    """Create the inventory_stats row and the product triggers that maintain it"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            product_count INTEGER NOT NULL DEFAULT 0,
+            stock_units INTEGER NOT NULL DEFAULT 0,
+            stock_value DECIMAL(14,2) NOT NULL DEFAULT 0,
+            low_stock_count INTEGER NOT NULL DEFAULT 0,
+            out_of_stock_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO inventory_stats (id) VALUES (1)")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_insert
+        AFTER INSERT ON products
+        BEGIN
+            {_apply_product('NEW', '+')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_delete
+        AFTER DELETE ON products
+        BEGIN
+            {_apply_product('OLD', '-')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_update
+        AFTER UPDATE OF price, stock_quantity, min_stock_level ON products
+        WHEN OLD.price IS NOT NEW.price
+          OR OLD.stock_quantity IS NOT NEW.stock_quantity
+          OR OLD.min_stock_level IS NOT NEW.min_stock_level
+        BEGIN
+            {_apply_product('OLD', '-')}
+            {_apply_product('NEW', '+')}
+        END
+    ''')
+
+
+def _inventory_query() -> str:
+    """Recompute the inventory counters from the products table"""
+    columns = ", ".join(f"COALESCE(SUM({expr.format(row='products')}), 0) AS {column}"
+                        for column, expr in INVENTORY_COUNTERS.items())
+    return f"SELECT {columns} FROM products"
+
+
+def rebuild_inventory_stats(cursor: sqlite3.Cursor):
+    """Recompute the inventory counters inside the caller's transaction"""
+    row = cursor.execute(_inventory_query()).fetchone()
+    assignments = ", ".join(f"{column} = ?" for column in INVENTORY_COUNTERS)
+    cursor.execute(f"UPDATE inventory_stats SET {assignments} WHERE id = 1", tuple(row))
+
+
+def check_inventory_stats(conn: sqlite3.Connection) -> Dict[str, Tuple]:
+    """Compare the stored counters with a fresh count; returns {counter: (expected, stored)} that drifted"""
+    expected = conn.execute(_inventory_query()).fetchone()
+    stored = conn.execute(f"SELECT {', '.join(INVENTORY_COUNTERS)} FROM inventory_stats WHERE id = 1").fetchone()
+    return {column: (want, have)
+            for column, want, have in zip(INVENTORY_COUNTERS, expected, stored)
+            if want != have}
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 2 and argv[0] in ('rebuild', 'check'):
+        conn = sqlite3.connect(argv[1])
+        try:
+            # Periods before the first live day are archived (see archive.py)
+            since = None
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sales_archives'").fetchone():
+                since = conn.execute("SELECT MAX(archived_before) FROM sales_archives").fetchone()[0]
+            if argv[0] == 'rebuild':
+                with conn:
+                    rebuild_sales_rollups(conn.cursor(), since)
+                    rebuild_inventory_stats(conn.cursor())
+                print("Rollups rebuilt")
+                return 0
+            drift = check_sales_rollups(conn, since)
+            for row in drift:
+                print(f"{row['table']:<14} {row['period']:<10} {row['payment_method'] or '-':<10} "
+                      f"expected {row['expected']} stored {row['stored']}")
+            counters = check_inventory_stats(conn)
+            for column, (want, have) in counters.items():
+                print(f"{'inventory_stats':<14} {column:<20} expected {want} stored {have}")
+            print(f"{len(drift) + len(counters)} rollup values drifted")
+            return 1 if drift or counters else 0
+        finally:
+            conn.close()
+    print(__doc__.strip().split("Usage:")[1])
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sync - Row-level changesets exchanged between branch databases as files
+
+Each branch exports the products, customers, sales and services changed
+since its last export (read from change_log) into a gzip'd JSON changeset
+file, and imports the files other branches left in a shared folder or on
+a USB stick. The cost follows the number of changed rows, not the size
+of the database; a branch's first export, or one after change_log was
+pruned past the last export, carries every row.
+
+Rows are identified across branches by (origin branch, id at origin).
+Ids of other tables a row refers to travel as such keys, and a changeset
+carries the products and customers its sales and services refer to.
+Changesets from one branch are applied in order: one that does not start
+at or before that branch's import watermark waits for the missing file.
+
+Conflict rules, the same at every branch whatever order files arrive in:
+
+* Products and customers: the version with the later row clock wins.
+  Every edit sets ``sync_clock`` to the time in milliseconds, or one
+  past the clock it replaces if that is later, so an edit made after
+  importing a row beats it whatever the branches' clocks say; equal
+  clocks fall back to the branch that made the edit (``sync_origin``,
+  NULL for this branch), so both sides keep the same one. A row first
+  seen from another branch is matched to a local row with the same
+  barcode (products) or phone (customers) instead of being added twice.
+* Stock levels and customer purchase totals/points are per branch and
+  are not exchanged; imported sales add to the local customer totals.
+* Sales and services are added once and never overwritten.
+* A delete wins over updates, except that a row still referred to here,
+  or by a sale in the same changeset, is kept.
+
+Archiving sales is not a change: archived sales are not sent as deletes.
+Imported rows are not written to change_log, so they are not sent back.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import money
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+# Row clock of a local edit: now in Unix milliseconds, past the clock it replaces
+CLOCK_NOW = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+CLOCK_NEXT = f"MAX(sync_clock + 1, {CLOCK_NOW})"
+
+# Columns a changeset carries for each table, besides the row key
+SYNC_COLUMNS = {
+    'products': ('name', 'brand', 'model', 'category', 'price', 'cost', 'min_stock_level',
+                 'barcode', 'description', 'created_at', 'updated_at', 'sync_clock', 'sync_origin'),
+    'customers': ('name', 'phone', 'email', 'address', 'city', 'notes', 'created_at', 'updated_at',
+                  'sync_clock', 'sync_origin'),
+    'sales': ('customer_id', 'total_amount', 'discount_amount', 'tax_amount', 'payment_method',
+              'status', 'notes', 'created_at', 'business_date'),
+    'services': ('customer_id', 'service_type', 'description', 'amount', 'commission', 'status',
+                 'reference_number', 'created_at'),
+}
+SALE_ITEM_COLUMNS = ('product_id', 'quantity', 'unit_price', 'total_price')
+
+# Catalog tables merged last-writer-wins; the others are insert-only
+SHARED_TABLES = ('products', 'customers')
+RECORD_TABLES = ('sales', 'services')
+
+# change_log triggers set aside while a changeset is applied
+CHANGE_TRIGGERS = tuple(f"trg_{table}_change_{op}" for table in SYNC_COLUMNS
+                        for op in ('insert', 'update', 'delete'))
+
+# Unique columns matching a row first seen from another branch to a local one
+NATURAL_KEYS = {'products': 'barcode', 'customers': 'phone'}
+
+# (table, column) -> table whose id the column holds, sent as that row's key
+REFERENCES = {
+    ('sales', 'customer_id'): 'customers',
+    ('services', 'customer_id'): 'customers',
+    ('sale_items', 'product_id'): 'products',
+}
+
+CHANGESET_PATTERN = re.compile(r"^changeset_(?P<branch>\w+)_(?P<since>\d+)_(?P<version>\d+)\.json\.gz$")
+
+Key = Tuple[str, int]
+
+
+def changeset_name(branch: str, since: int, version: int) -> str:
+    """File name of a changeset; sorts by version for each branch"""
+    return f"changeset_{branch}_{since:010d}_{version:010d}.json.gz"
+
+
+def local_branch(conn: sqlite3.Connection) -> Optional[str]:
+    """This database's branch id (None until the first sync)"""
+    row = conn.execute("SELECT branch FROM sync_state WHERE is_local = 1").fetchone()
+    return row[0] if row else None
+
+
+def ensure_local_branch(conn: sqlite3.Connection) -> str:
+    """This database's branch id, created on first use (needs a write transaction)"""
+    branch = local_branch(conn)
+    if branch is None:
+        branch = uuid.uuid4().hex[:12]
+        conn.execute("INSERT INTO sync_state (branch, is_local) VALUES (?, 1)", (branch,))
+    return branch
+
+
+def start_new_branch(conn: sqlite3.Connection) -> Optional[str]:
+    """Give a database restored from a backup a new branch id (None if it never synced)
+
+    The restore took the change log and id sequences back in time, so new
+    rows could reuse ids the old branch id already sent. Existing rows keep
+    their keys under the old id, which becomes another branch: importing
+    its later changesets brings back what the restore lost.
+    """
+    old = local_branch(conn)
+    if old is None:
+        return None
+    for table in SYNC_COLUMNS:
+        conn.execute(f'''
+            INSERT OR IGNORE INTO sync_keys (table_name, origin, origin_id, row_id)
+            SELECT ?, ?, id, id FROM {table}
+        ''', (table, old))
+    conn.execute("UPDATE sync_state SET is_local = 0 WHERE branch = ?", (old,))
+    return ensure_local_branch(conn)
+
+
+def sync_version(conn: sqlite3.Connection, branch: str) -> int:
+    """Version last exported (this branch) or imported (another branch)"""
+    row = conn.execute("SELECT version FROM sync_state WHERE branch = ?", (branch,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_sync_version(conn: sqlite3.Connection, branch: str, version: int):
+    """Advance a branch's watermark (never moves it back)"""
+    conn.execute('''
+        INSERT INTO sync_state (branch, version) VALUES (?, ?)
+        ON CONFLICT (branch) DO UPDATE SET
+            version = MAX(version, excluded.version),
+            synced_at = CURRENT_TIMESTAMP
+    ''', (branch, version))
+
+
+def _chunks(ids: Iterable[int], size: int = 500) -> Iterator[List[int]]:
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _row_keys(conn: sqlite3.Connection, branch: str, table: str, ids: Iterable[int]) -> Dict[int, Key]:
+    """Keys of local rows: the smallest key mapped to a row, else (this branch, id)"""
+    ids = list(ids)
+    keys = {row_id: (branch, row_id) for row_id in ids}
+    for chunk in _chunks(ids):
+        mapped = conn.execute(f'''
+            SELECT row_id, origin, origin_id FROM sync_keys
+            WHERE table_name = ? AND row_id IN ({", ".join("?" * len(chunk))})
+            ORDER BY origin DESC, origin_id DESC
+        ''', [table] + chunk)
+        for row_id, origin, origin_id in mapped:
+            keys[row_id] = (origin, origin_id)
+    return keys
+
+
+def _fetch(conn: sqlite3.Connection, table: str, ids: Iterable[int]) -> Dict[int, tuple]:
+    """Rows by id, as tuples of the table's SYNC_COLUMNS"""
+    columns = ", ".join(SYNC_COLUMNS[table])
+    rows = {}
+    for chunk in _chunks(ids):
+        for row in conn.execute(f'''
+            SELECT id, {columns} FROM {table} WHERE id IN ({", ".join("?" * len(chunk))})
+        ''', chunk):
+            rows[row[0]] = tuple(row[1:])
+    return rows
+
+
+def build_changeset(conn: sqlite3.Connection, branch: str, since: int, version: int,
+                    changes: Optional[List[Tuple[str, int, str]]]) -> Dict[str, Any]:
+    """Collect the changed rows as a changeset
+
+    ``changes`` is what DatabaseManager.get_changes() returned for
+    ``since``; None exports every row (a full changeset).
+    """
+    upserts: Dict[str, Set[int]] = {table: set() for table in SYNC_COLUMNS}
+    deletes: Dict[str, Set[int]] = {table: set() for table in SYNC_COLUMNS}
+    if changes is None:
+        for table in SYNC_COLUMNS:
+            upserts[table].update(row[0] for row in conn.execute(f"SELECT id FROM {table}"))
+    else:
+        for table, row_id, op in changes:
+            if table in SYNC_COLUMNS:
+                (deletes if op == 'delete' else upserts)[table].add(row_id)
+
+    records = {table: _fetch(conn, table, sorted(upserts[table])) for table in RECORD_TABLES}
+    items: Dict[int, List[tuple]] = {}
+    for chunk in _chunks(sorted(records['sales'])):
+        for row in conn.execute(f'''
+            SELECT sale_id, {", ".join(SALE_ITEM_COLUMNS)} FROM sale_items
+            WHERE sale_id IN ({", ".join("?" * len(chunk))}) ORDER BY id
+        ''', chunk):
+            items.setdefault(row[0], []).append(tuple(row[1:]))
+
+    # Send the catalog rows the sales and services refer to along with them
+    for table in RECORD_TABLES:
+        customer_index = SYNC_COLUMNS[table].index('customer_id')
+        upserts['customers'].update(row[customer_index] for row in records[table].values()
+                                    if row[customer_index] is not None)
+    upserts['products'].update(item[0] for sale_items in items.values() for item in sale_items)
+
+    shared = {table: _fetch(conn, table, sorted(upserts[table])) for table in SHARED_TABLES}
+    keys = {table: _row_keys(conn, branch, table, list(upserts[table]) + list(deletes[table]))
+            for table in SYNC_COLUMNS}
+
+    def encode(table: str, row_id: int, row: tuple) -> list:
+        values = []
+        for column, value in zip(SYNC_COLUMNS[table], row):
+            target = REFERENCES.get((table, column))
+            if target and value is not None:
+                value = list(keys[target][value])
+            elif column == 'sync_origin' and value is None:
+                value = branch
+            values.append(value)
+        return list(keys[table][row_id]) + values
+
+    tables = {}
+    for table in SYNC_COLUMNS:
+        rows = shared[table] if table in SHARED_TABLES else records[table]
+        encoded = []
+        for row_id, row in rows.items():
+            values = encode(table, row_id, row)
+            if table == 'sales':
+                values.append([list(keys['products'][item[0]]) + list(item[1:])
+                               for item in items.get(row_id, [])])
+            encoded.append(values)
+        tables[table] = {
+            'columns': list(SYNC_COLUMNS[table]),
+            'rows': encoded,
+            'deleted': [list(keys[table][row_id]) for row_id in sorted(deletes[table])],
+        }
+
+    return {
+        'format': FORMAT_VERSION,
+        'branch': branch,
+        'since': 0 if changes is None else since,
+        'version': version,
+        'full': changes is None,
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'item_columns': list(SALE_ITEM_COLUMNS),
+        'tables': tables,
+    }
+
+
+def write_changeset(changeset: Dict[str, Any], directory: str) -> str:
+    """Write a changeset file into ``directory``; readers never see a partial file"""
+    path = os.path.join(directory, changeset_name(changeset['branch'], changeset['since'],
+                                                  changeset['version']))
+    partial_path = path + ".part"
+    with gzip.open(partial_path, 'wb') as f:
+        f.write(json.dumps(changeset, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    os.replace(partial_path, path)
+    return path
+
+
+def read_changeset(path: str) -> Dict[str, Any]:
+    """Load a changeset file"""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            changeset = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Not a changeset file: {path}: {e}") from e
+    if changeset.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported changeset format: {changeset.get('format')}")
+    return changeset
+
+
+def list_changesets(directory: str) -> Dict[str, List[Tuple[int, int, str]]]:
+    """Changeset files in ``directory`` as {branch: [(since, version, path)]}, by version"""
+    found: Dict[str, List[Tuple[int, int, str]]] = {}
+    for name in sorted(os.listdir(directory)):
+        match = CHANGESET_PATTERN.match(name)
+        if match:
+            found.setdefault(match['branch'], []).append(
+                (int(match['since']), int(match['version']), os.path.join(directory, name)))
+    for files in found.values():
+        files.sort(key=lambda entry: (entry[1], entry[0]))
+    return found
+
+
+def _resolve(conn: sqlite3.Connection, branch: str, table: str, key: Key) -> Tuple[Optional[int], bool]:
+    """Local id for a row key (None if there is no such row) and whether the key is known here
+
+    A known key without a local row was deleted (or archived) here.
+    """
+    origin, origin_id = key
+    if origin == branch:
+        local_id = origin_id
+    else:
+        row = conn.execute('''
+            SELECT row_id FROM sync_keys WHERE table_name = ? AND origin = ? AND origin_id = ?
+        ''', (table, origin, origin_id)).fetchone()
+        if row is None:
+            return None, False
+        local_id = row[0]
+    if local_id is not None and conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (local_id,)).fetchone() is None:
+        local_id = None
+    return local_id, True
+
+
+def _remember(conn: sqlite3.Connection, branch: str, table: str, key: Key, row_id: Optional[int]):
+    """Record which local row (None: none) stands for another branch's row"""
+    if key[0] != branch:
+        conn.execute('''
+            INSERT OR REPLACE INTO sync_keys (table_name, origin, origin_id, row_id) VALUES (?, ?, ?, ?)
+        ''', (table, key[0], key[1], row_id))
+
+
+def _row_version(columns: List[str], values: tuple, branch: str) -> Tuple[int, str]:
+    """(row clock, branch that made the edit) of a product or customer version"""
+    return values[columns.index('sync_clock')] or 0, values[columns.index('sync_origin')] or branch
+
+
+def apply_changeset(conn: sqlite3.Connection, branch: str, changeset: Dict[str, Any]) -> Dict[str, int]:
+    """Apply another branch's changeset inside the caller's write transaction
+
+    Returns counts of rows 'inserted', 'updated', 'deleted', 'unchanged'
+    (already here, older, or deleted here) and 'conflicts' (rejected by a
+    unique or foreign key constraint, kept as they are here, and logged).
+    A changeset already imported changes nothing. Raises ValueError for a
+    changeset from this branch or one that starts after the import
+    watermark. The change_log triggers are set aside while rows are
+    applied, in the same transaction.
+    """
+    stats = dict.fromkeys(('inserted', 'updated', 'deleted', 'unchanged', 'conflicts'), 0)
+    source = changeset['branch']
+    if source == branch:
+        raise ValueError("Changeset was exported by this branch")
+    imported = sync_version(conn, source)
+    if changeset['version'] <= imported:
+        return stats
+    if not changeset['full'] and changeset['since'] > imported:
+        raise ValueError(f"Missing changes {imported}-{changeset['since']} from branch {source}")
+
+    tables = changeset['tables']
+    referenced: Dict[str, Set[Key]] = {'customers': set(), 'products': set()}
+    for table in RECORD_TABLES:
+        customer_index = tables[table]['columns'].index('customer_id') + 2
+        referenced['customers'].update(tuple(row[customer_index]) for row in tables[table]['rows']
+                                       if row[customer_index] is not None)
+    referenced['products'].update(tuple(item[:2]) for row in tables['sales']['rows'] for item in row[-1])
+
+    if not conn.in_transaction:
+        # Dropping the triggers is rolled back with everything else on failure
+        conn.execute("BEGIN IMMEDIATE")
+    triggers = conn.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ({", ".join("?" * len(CHANGE_TRIGGERS))})
+    ''', CHANGE_TRIGGERS).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+
+    for table in SHARED_TABLES:
+        for row in tables[table]['rows']:
+            _apply_shared(conn, branch, table, tables[table]['columns'], row, referenced[table], stats)
+    for table in RECORD_TABLES:
+        for row in tables[table]['rows']:
+            _apply_record(conn, branch, table, tables[table]['columns'], row, stats)
+    for table in SHARED_TABLES:
+        for key in tables[table]['deleted']:
+            _apply_delete(conn, branch, table, tuple(key), stats)
+
+    for _, sql in triggers:
+        conn.execute(sql)
+    set_sync_version(conn, source, changeset['version'])
+    return stats
+
+
+def _apply_shared(conn: sqlite3.Connection, branch: str, table: str, columns: List[str],
+                  row: list, referenced: Set[Key], stats: Dict[str, int]):
+    """Insert or update a product or customer, last writer wins"""
+    key = (row[0], row[1])
+    known_columns = [column for column in columns if column in SYNC_COLUMNS[table]]
+    # An edit made here keeps a NULL origin, as local edits do
+    values = tuple(None if column == 'sync_origin' and value == branch else value
+                   for column, value in zip(columns, row[2:]) if column in SYNC_COLUMNS[table])
+    local_id, known = _resolve(conn, branch, table, key)
+
+    if local_id is None and not known:
+        natural = NATURAL_KEYS[table]
+        value = values[known_columns.index(natural)] if natural in known_columns else None
+        if value:
+            match = conn.execute(f"SELECT id FROM {table} WHERE {natural} = ?", (value,)).fetchone()
+            if match:
+                local_id = match[0]
+                _remember(conn, branch, table, key, local_id)
+
+    try:
+        if local_id is not None:
+            current = conn.execute(f"SELECT {', '.join(known_columns)} FROM {table} WHERE id = ?",
+                                   (local_id,)).fetchone()
+            if _row_version(known_columns, values, branch) <= _row_version(known_columns, tuple(current), branch):
+                stats['unchanged'] += 1
+                return
+            conn.execute(f'''
+                UPDATE {table} SET {", ".join(f"{column} = ?" for column in known_columns)} WHERE id = ?
+            ''', values + (local_id,))
+            stats['updated'] += 1
+            return
+
+        if known and key not in referenced:
+            # Deleted here: the delete wins
+            stats['unchanged'] += 1
+            return
+
+        if key[0] == branch:
+            # One of this branch's rows, deleted here but still needed: keep its id
+            insert_columns, params = ['id'] + known_columns, (key[1],) + values
+        else:
+            insert_columns, params = known_columns, values
+        local_id = conn.execute(f'''
+            INSERT INTO {table} ({", ".join(insert_columns)}) VALUES ({", ".join("?" * len(params))})
+        ''', params).lastrowid
+        _remember(conn, branch, table, key, local_id)
+        stats['inserted'] += 1
+    except sqlite3.IntegrityError as e:
+        logger.warning("Sync conflict in %s %s: %s", table, key, e)
+        stats['conflicts'] += 1
+
+
+def _apply_record(conn: sqlite3.Connection, branch: str, table: str, columns: List[str],
+                  row: list, stats: Dict[str, int]):
+    """Add a sale (with its items) or service unless it is already known here"""
+    key = (row[0], row[1])
+    _, known = _resolve(conn, branch, table, key)
+    if known:
+        stats['unchanged'] += 1
+        return
+
+    values = dict(zip(columns, row[2:]))
+    values = {column: value for column, value in values.items() if column in SYNC_COLUMNS[table]}
+    customer = values.get('customer_id')
+    if customer is not None:
+        values['customer_id'] = _resolve(conn, branch, 'customers', tuple(customer))[0]
+
+    conn.execute("SAVEPOINT sync_record")
+    try:
+        record_id = conn.execute(f'''
+            INSERT INTO {table} ({", ".join(values)}) VALUES ({", ".join("?" * len(values))})
+        ''', tuple(values.values())).lastrowid
+        if table == 'sales':
+            items = []
+            for item in row[-1]:
+                product_id = _resolve(conn, branch, 'products', tuple(item[:2]))[0]
+                if product_id is None:
+                    raise sqlite3.IntegrityError(f"unknown product {item[:2]}")
+                items.append((record_id, product_id) + tuple(item[2:]))
+            conn.executemany(f'''
+                INSERT INTO sale_items (sale_id, {", ".join(SALE_ITEM_COLUMNS)}) VALUES (?, ?, ?, ?, ?)
+            ''', items)
+            if values.get('customer_id'):
+                # As add_sale() does: 1 point per 10 units
+                conn.execute('''
+                    UPDATE customers SET
+                        total_purchases = total_purchases + ?,
+                        loyalty_points = loyalty_points + ?
+                    WHERE id = ?
+                ''', (values['total_amount'], int(money.from_minor(values['total_amount']) / 10),
+                      values['customer_id']))
+        conn.execute("RELEASE sync_record")
+    except sqlite3.IntegrityError as e:
+        conn.execute("ROLLBACK TO sync_record")
+        conn.execute("RELEASE sync_record")
+        logger.warning("Sync conflict in %s %s: %s", table, key, e)
+        stats['conflicts'] += 1
+        return
+    _remember(conn, branch, table, key, record_id)
+    stats['inserted'] += 1
+
+
+def _apply_delete(conn: sqlite3.Connection, branch: str, table: str, key: Key, stats: Dict[str, int]):
+    """Delete a product or customer unless rows here still refer to it"""
+    local_id, known = _resolve(conn, branch, table, key)
+    if local_id is None:
+        if not known:
+            # Not here yet: keep it from arriving later
+            _remember(conn, branch, table, key, None)
+        return
+    try:
+        conn.execute(f"DELETE FROM {table} WHERE id = ?", (local_id,))
+    except sqlite3.IntegrityError as e:
+        logger.warning("Sync conflict deleting %s %s: %s", table, key, e)
+        stats['conflicts'] += 1
+        return
+    stats['deleted'] += 1
@@ -23,16 +23,19 @@ from .modules.services import ServicesModule
 from .modules.settings import SettingsModule
 from ..database.db_manager import DatabaseManager
 from ..utils.settings_manager import SettingsManager
+from ..utils.db_executor import DatabaseExecutor
 
 class MainWindow(QMainWindow):
     # Signals
     module_changed = pyqtSignal(str)
+    low_stock_crossed = pyqtSignal(object)  # products that just reached their minimum stock
     
     def __init__(self, db_manager: DatabaseManager, settings_manager: SettingsManager):
         super().__init__()
         
         self.db_manager = db_manager
         self.settings_manager = settings_manager
+        self.db_executor = DatabaseExecutor.shared(db_manager)
         self.theme_manager = ThemeManager()
         self.notification_manager = NotificationManager(self)
         
@@ -244,20 +247,30 @@ class MainWindow(QMainWindow):
         
         # Settings manager connections
         self.settings_manager.theme_changed.connect(self.theme_manager.apply_theme)
+        self.settings_manager.settings_changed.connect(self.on_settings_changed)
+        
+        # Reload every module in place after a backup is restored
+        settings_module = self.modules.get('settings')
+        if hasattr(settings_module, 'database_restored'):
+            settings_module.database_restored.connect(self.on_database_restored)
+        if hasattr(settings_module, 'branches_synced'):
+            settings_module.branches_synced.connect(self.on_branches_synced)
         
     def setup_auto_features(self):
         """Setup auto-save and other automatic features"""
         # Auto-save timer
-        if self.settings_manager.get('auto_save', True):
+        if self.settings_manager.current.auto_save:
             self.auto_save_timer = QTimer()
             self.auto_save_timer.timeout.connect(self.auto_save)
             self.auto_save_timer.start(60000)  # Auto-save every minute
             
-        # Low stock check timer
+        # Low stock alerts: one summary at startup, then only products that
+        # newly cross their minimum, as soon as the sale or edit commits
         if self.settings_manager.is_low_stock_alert_enabled():
-            self.stock_check_timer = QTimer()
-            self.stock_check_timer.timeout.connect(self.check_low_stock)
-            self.stock_check_timer.start(300000)  # Check every 5 minutes
+            self.check_low_stock()
+            self.low_stock_crossed.connect(self.show_new_low_stock_warning)
+            self.low_stock_listener = self.low_stock_crossed.emit
+            self.db_manager.add_low_stock_listener(self.low_stock_listener)
             
         # Auto backup timer
         if self.settings_manager.is_auto_backup_enabled():
@@ -378,6 +391,30 @@ class MainWindow(QMainWindow):
         """Handle theme change"""
         self.update_theme_button()
         
+    def on_settings_changed(self, changes: dict):
+        """Apply settings that affect running services"""
+        if 'db_profile' in changes:
+            self.db_manager.set_profile(changes['db_profile'])
+        if 'group_commit' in changes:
+            if changes['group_commit']:
+                self.db_manager.enable_group_commit()
+            else:
+                self.db_manager.disable_group_commit()
+            
+    def on_database_restored(self):
+        """Refresh all modules from the restored database"""
+        for module in self.modules.values():
+            module.refresh_data(full=True)
+        self.status_label.setText("تم استعادة قاعدة البيانات")
+        QTimer.singleShot(5000, lambda: self.status_label.setText("جاهز"))
+        
+    def on_branches_synced(self):
+        """Refresh all modules after importing other branches' changes"""
+        for module in self.modules.values():
+            module.refresh_data(full=True)
+        self.status_label.setText("تمت مزامنة الفروع")
+        QTimer.singleShot(5000, lambda: self.status_label.setText("جاهز"))
+        
     def on_quick_search(self, text: str):
         """Handle quick search"""
         if len(text) >= 2:  # Start searching after 2 characters
@@ -398,37 +435,65 @@ class MainWindow(QMainWindow):
             
     def check_low_stock(self):
         """Check for low stock products and show notifications"""
-        try:
-            low_stock_products = self.db_manager.get_low_stock_products()
-            if low_stock_products:
-                count = len(low_stock_products)
-                message = f"تحذير: يوجد {count} منتج بمخزون منخفض"
-                self.notification_manager.show_warning("تنبيه المخزون", message)
-        except Exception as e:
-            print(f"Low stock check error: {e}")
+        self.db_executor.submit(
+            self.db_manager.get_low_stock_products, row_format='record',
+            key='low_stock', on_result=self.show_low_stock_warning,
+            on_error=lambda e: print(f"Low stock check error: {e}")
+        )
+        
+    def show_low_stock_warning(self, low_stock_products):
+        """Notify about products at or below their minimum stock"""
+        if low_stock_products:
+            count = len(low_stock_products)
+            message = f"تحذير: يوجد {count} منتج بمخزون منخفض"
+            self.notification_manager.show_warning("تنبيه المخزون", message)
             
+    def show_new_low_stock_warning(self, products):
+        """Notify about products that just reached their minimum stock"""
+        if len(products) == 1:
+            product = products[0]
+            message = f"المنتج {product.name} وصل إلى الحد الأدنى للمخزون (المتبقي: {product.stock_quantity})"
+        else:
+            message = f"تحذير: {len(products)} منتج وصلت إلى الحد الأدنى للمخزون"
+        self.notification_manager.show_warning("تنبيه المخزون", message)
+        
     def auto_backup(self):
-        """Perform automatic backup"""
-        try:
-            backup_path = self.db_manager.backup_database()
-            self.status_label.setText(f"تم إنشاء نسخة احتياطية: {backup_path}")
-            QTimer.singleShot(5000, lambda: self.status_label.setText("جاهز"))
-        except Exception as e:
-            print(f"Auto backup error: {e}")
-            
+        """Perform automatic backup (on a database worker thread)"""
+        self.db_executor.submit(
+            self.run_auto_backup, key='backup',
+            on_result=self.on_auto_backup_done,
+            on_error=lambda e: print(f"Auto backup error: {e}")
+        )
+        
+    def run_auto_backup(self) -> dict:
+        """Archive old sales, add an incremental restore point, prune expired chains and old change history"""
+        self.db_manager.archive_sales()
+        restore_point = self.db_manager.incremental_backup()
+        self.db_manager.auto_cleanup_backups()
+        self.db_manager.prune_change_log()
+        return restore_point
+        
+    def on_auto_backup_done(self, restore_point: dict):
+        """Show the finished automatic backup in the status bar"""
+        kind = "كاملة" if restore_point['kind'] == 'full' else "تزايدية"
+        self.status_label.setText(
+            f"تم إنشاء نسخة احتياطية {kind}: {restore_point['pages']} صفحة"
+        )
+        QTimer.singleShot(5000, lambda: self.status_label.setText("جاهز"))
+        
     def create_backup(self):
-        """Create manual backup"""
-        try:
-            backup_path = self.db_manager.backup_database()
-            self.notification_manager.show_success(
+        """Create manual backup (on a database worker thread)"""
+        self.db_executor.submit(
+            self.db_manager.backup_database, key='backup',
+            on_result=lambda backup_path: self.notification_manager.show_success(
                 "نسخ احتياطي", 
                 f"تم إنشاء النسخة الاحتياطية بنجاح:\n{backup_path}"
-            )
-        except Exception as e:
-            self.notification_manager.show_error(
+            ),
+            on_error=lambda e: self.notification_manager.show_error(
                 "خطأ", 
                 f"فشل في إنشاء النسخة الاحتياطية:\n{str(e)}"
             )
+        )
             
     def update_time(self):
         """Update time display"""
@@ -449,17 +514,24 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Handle application close"""
         # Save current window state
-        self.settings_manager.set('window_geometry', self.saveGeometry())
-        self.settings_manager.set('window_state', self.saveState())
+        self.settings_manager.update({
+            'window_geometry': self.saveGeometry(),
+            'window_state': self.saveState(),
+        })
         
         # Stop all timers
         if hasattr(self, 'auto_save_timer'):
             self.auto_save_timer.stop()
-        if hasattr(self, 'stock_check_timer'):
-            self.stock_check_timer.stop()
         if hasattr(self, 'auto_backup_timer'):
             self.auto_backup_timer.stop()
         if hasattr(self, 'time_timer'):
             self.time_timer.stop()
             
+        # Let running database tasks finish before the connections close
+        self.db_executor.shutdown()
+        if hasattr(self, 'low_stock_listener'):
+            self.db_manager.remove_low_stock_listener(self.low_stock_listener)
+        # Drain the group-commit queue and close the pooled connections
+        self.db_manager.close()
+            
         event.accept()
\ No newline at end of file
@@ -4,25 +4,35 @@
 Base Module - Base class for all application modules
 """
 
+from typing import Any, Callable, Optional, Tuple
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt6.QtCore import Qt, pyqtSignal
 from ...database.db_manager import DatabaseManager
 from ...utils.settings_manager import SettingsManager
+from ...utils.db_executor import DatabaseExecutor
 
 class BaseModule(QWidget):
     # Common signals
     data_changed = pyqtSignal()
     status_message = pyqtSignal(str)
     
+    # change_log tables whose edits refresh_data() applies row by row
+    change_tables: Tuple[str, ...] = ()
+    # Above this many changed rows a full reload is cheaper
+    MAX_INCREMENTAL_CHANGES = 500
+    
     def __init__(self, db_manager: DatabaseManager, settings_manager: SettingsManager, module_name: str = ""):
         super().__init__()
         
         self.db_manager = db_manager
         self.settings_manager = settings_manager
         self.module_name = module_name
+        self.db_executor = DatabaseExecutor.shared(db_manager)
+        # change_log version the shown data reflects (None until the first load)
+        self.data_version = None
         
         self.setup_ui()
-        self.load_data()
+        self.load_data_async()
         
     def setup_ui(self):
         """Setup the base UI - to be overridden by subclasses"""
@@ -39,10 +49,100 @@ class BaseModule(QWidget):
         """Load data for the module - to be overridden"""
         pass
         
-    def refresh_data(self):
-        """Refresh module data"""
-        self.load_data()
-        self.data_changed.emit()
+    def data_request(self) -> Any:
+        """Capture the filters fetch_data() needs from the widgets (GUI thread)"""
+        return None
+        
+    def fetch_data(self, request: Any) -> Any:
+        """Run the module's queries - runs on a database worker, must not touch widgets
+        
+        Override together with apply_data() to make load_data_async() non-blocking;
+        modules that do not override it are loaded with load_data().
+        """
+        return None
+        
+    def apply_data(self, data: Any):
+        """Show the result of fetch_data() (GUI thread)"""
+        pass
+        
+    def fetch_changed_rows(self, changes: list, request: Any) -> Any:
+        """Fetch what apply_changes() needs for (table_name, row_id, op) changes (worker thread)
+        
+        Return None to fall back to a full reload.
+        """
+        return None
+        
+    def apply_changes(self, data: Any):
+        """Patch the shown data with the result of fetch_changed_rows() (GUI thread)"""
+        pass
+        
+    def load_data_async(self, on_loaded: Optional[Callable[[], None]] = None):
+        """Load data without blocking the GUI thread
+        
+        Modules implementing fetch_data()/apply_data() query on a worker
+        thread; a newer load supersedes one still running. Other modules
+        fall back to the blocking load_data().
+        """
+        if type(self).fetch_data is BaseModule.fetch_data:
+            self.load_data()
+            if on_loaded:
+                on_loaded()
+            return None
+            
+        return self.db_executor.submit(
+            self.fetch_loaded, self.data_request(), key=(self, 'load_data'),
+            on_result=lambda result: self.apply_loaded(result, on_loaded),
+            on_error=self.on_load_error
+        )
+        
+    def fetch_loaded(self, request: Any) -> Tuple[Optional[int], bool, Any]:
+        """Run fetch_data(), noting the change version it reflects (worker thread)"""
+        # Read first: a change committed during the fetch is applied again next time
+        version = self.db_manager.get_change_version() if self.change_tables else None
+        return version, False, self.fetch_data(request)
+        
+    def fetch_changes(self, since: int, request: Any) -> Tuple[Optional[int], bool, Any]:
+        """Fetch the rows changed since ``since``, or everything if that is cheaper (worker thread)"""
+        changes, version = self.db_manager.get_changes(since, self.change_tables,
+                                                       limit=self.MAX_INCREMENTAL_CHANGES + 1)
+        if changes is not None and len(changes) <= self.MAX_INCREMENTAL_CHANGES:
+            data = self.fetch_changed_rows(changes, request) if changes else None
+            if data is not None or not changes:
+                return version, True, data
+        return self.fetch_loaded(request)
+        
+    def apply_loaded(self, result: Tuple[Optional[int], bool, Any],
+                     on_loaded: Optional[Callable[[], None]] = None):
+        """Show a full load or a set of changes (GUI thread)"""
+        version, incremental, data = result
+        if incremental:
+            if data is not None:
+                self.apply_changes(data)
+        else:
+            self.apply_data(data)
+        self.data_version = version
+        if on_loaded:
+            on_loaded()
+            
+    def on_load_error(self, error: BaseException):
+        """Report a failed background load"""
+        print(f"Error loading {self.module_name} data: {error}")
+        
+    def refresh_data(self, full: bool = False):
+        """Refresh module data
+        
+        Modules with change_tables fetch and apply only the rows changed
+        since their last load; ``full`` forces a complete reload.
+        """
+        if full or not self.change_tables or self.data_version is None:
+            self.load_data_async(on_loaded=self.data_changed.emit)
+            return
+            
+        self.db_executor.submit(
+            self.fetch_changes, self.data_version, self.data_request(), key=(self, 'load_data'),
+            on_result=lambda result: self.apply_loaded(result, self.data_changed.emit),
+            on_error=self.on_load_error
+        )
         
     def search(self, query: str):
         """Search functionality - to be overridden"""
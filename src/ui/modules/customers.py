@@ -4,6 +4,8 @@
 Customers Module - Customer Management Interface
 """
 
+from bisect import bisect_left
+
 from PyQt6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QFormLayout, QTableWidget,
     QTableWidgetItem, QPushButton, QLineEdit, QTextEdit,
@@ -19,7 +21,13 @@ from ..widgets.data_table import EnhancedTableWidget
 from ..dialogs.customer_dialog import CustomerDialog
 
 class CustomersModule(BaseModule):
+    change_tables = ('customers',)
+    
     def __init__(self, db_manager, settings_manager):
+        # Shown customers in (name, id) order, their keys, and keys by id
+        self.customers = []
+        self.customer_keys = []
+        self.customer_keys_by_id = {}
         super().__init__(db_manager, settings_manager, "العملاء")
         
     def setup_ui(self):
@@ -460,51 +468,99 @@ class CustomersModule(BaseModule):
     def load_data(self):
         """Load customers data"""
         try:
-            # Load customers
-            customers = self.db_manager.get_customers()
-            self.populate_customers_table(customers)
-            
-            # Load customer selector for history
-            self.populate_customer_selector(customers)
-            
-            # Load loyalty statistics
-            self.update_loyalty_stats(customers)
-            
-            # Load top customers
-            self.load_top_customers(customers)
-            
+            self.apply_data(self.fetch_data(self.data_request()))
         except Exception as e:
             print(f"Error loading customers data: {e}")
             
+    def fetch_data(self, request) -> list:
+        """Query the customers list"""
+        return self.db_manager.get_customers(row_format='record')
+        
+    def apply_data(self, customers: list):
+        """Show customers fetched by fetch_data()"""
+        self.customers = list(customers)
+        self.customer_keys = [(customer['name'], customer['id']) for customer in self.customers]
+        self.customer_keys_by_id = {key[1]: key for key in self.customer_keys}
+        
+        # Load customers
+        self.populate_customers_table(customers)
+        
+        # Load customer selector for history
+        self.populate_customer_selector(customers)
+        
+        # Load loyalty statistics
+        self.update_loyalty_stats(customers)
+        
+        # Load top customers
+        self.load_top_customers(customers)
+        
+    def fetch_changed_rows(self, changes: list, request) -> dict:
+        """Fetch the changed customers"""
+        changed_ids = [row_id for _, row_id, _ in changes]
+        return {
+            'changed_ids': changed_ids,
+            'customers': self.db_manager.get_customers_by_ids(changed_ids, row_format='record')
+        }
+        
+    def apply_changes(self, data: dict):
+        """Move, add or drop the changed customers in the table and selector"""
+        for customer_id in data['changed_ids']:
+            key = self.customer_keys_by_id.pop(customer_id, None)
+            if key is not None:
+                row = bisect_left(self.customer_keys, key)
+                self.customers_table.removeRow(row)
+                self.customer_selector.removeItem(row + 1)
+                del self.customers[row]
+                del self.customer_keys[row]
+                
+        for customer in data['customers']:
+            key = (customer['name'], customer['id'])
+            row = bisect_left(self.customer_keys, key)
+            self.customers_table.insertRow(row)
+            self.set_customer_row(row, customer)
+            self.customer_selector.insertItem(row + 1, f"{customer['name']} ({customer['phone']})",
+                                              customer['id'])
+            self.customers.insert(row, customer)
+            self.customer_keys.insert(row, key)
+            self.customer_keys_by_id[key[1]] = key
+            
+        self.results_label.setText(f"{len(self.customers)} عميل")
+        self.update_loyalty_stats(self.customers)
+        self.load_top_customers(self.customers)
+            
     def populate_customers_table(self, customers):
         """Populate customers table"""
         self.customers_table.setRowCount(len(customers))
         
         for row, customer in enumerate(customers):
-            self.customers_table.setItem(row, 0, QTableWidgetItem(str(customer['id'])))
-            self.customers_table.setItem(row, 1, QTableWidgetItem(customer['name'] or ''))
-            self.customers_table.setItem(row, 2, QTableWidgetItem(customer['phone'] or ''))
-            self.customers_table.setItem(row, 3, QTableWidgetItem(customer['email'] or ''))
-            self.customers_table.setItem(row, 4, QTableWidgetItem(customer['city'] or ''))
-            
-            # Format purchases
-            purchases = f"{customer['total_purchases']:,.2f} ريال" if customer['total_purchases'] else '0 ريال'
-            self.customers_table.setItem(row, 5, QTableWidgetItem(purchases))
-            
-            # Loyalty points
-            points = str(customer['loyalty_points']) if customer['loyalty_points'] else '0'
-            self.customers_table.setItem(row, 6, QTableWidgetItem(points))
-            
-            # Registration date
-            reg_date = customer['created_at'][:10] if customer['created_at'] else '-'
-            self.customers_table.setItem(row, 7, QTableWidgetItem(reg_date))
-            
-            # Last purchase (placeholder)
-            self.customers_table.setItem(row, 8, QTableWidgetItem('-'))
+            self.set_customer_row(row, customer)
             
         # Update count
         self.results_label.setText(f"{len(customers)} عميل")
         
+    def set_customer_row(self, row: int, customer):
+        """Fill one customers table row"""
+        self.customers_table.setItem(row, 0, QTableWidgetItem(str(customer['id'])))
+        self.customers_table.setItem(row, 1, QTableWidgetItem(customer['name'] or ''))
+        self.customers_table.setItem(row, 2, QTableWidgetItem(customer['phone'] or ''))
+        self.customers_table.setItem(row, 3, QTableWidgetItem(customer['email'] or ''))
+        self.customers_table.setItem(row, 4, QTableWidgetItem(customer['city'] or ''))
+        
+        # Format purchases
+        purchases = f"{customer['total_purchases']:,.2f} ريال" if customer['total_purchases'] else '0 ريال'
+        self.customers_table.setItem(row, 5, QTableWidgetItem(purchases))
+        
+        # Loyalty points
+        points = str(customer['loyalty_points']) if customer['loyalty_points'] else '0'
+        self.customers_table.setItem(row, 6, QTableWidgetItem(points))
+        
+        # Registration date
+        reg_date = customer['created_at'][:10] if customer['created_at'] else '-'
+        self.customers_table.setItem(row, 7, QTableWidgetItem(reg_date))
+        
+        # Last purchase (placeholder)
+        self.customers_table.setItem(row, 8, QTableWidgetItem('-'))
+        
     def populate_customer_selector(self, customers):
         """Populate customer selector for history tab"""
         self.customer_selector.clear()
@@ -732,8 +788,9 @@ class CustomersModule(BaseModule):
         
         try:
             # Load sales for customer
-            sales = self.db_manager.get_sales_report(start_date, end_date)
-            customer_sales = [s for s in sales if s.get('customer_id') == customer_id]
+            customer_sales = self.db_manager.get_sales_report(
+                start_date, end_date, customer_id=customer_id, row_format='record'
+            )
             
             # Populate history table
             self.history_table.setRowCount(len(customer_sales))
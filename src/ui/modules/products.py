@@ -4,6 +4,9 @@
 Products Module - Product Management Interface
 """
 
+import csv
+from bisect import bisect_left
+
 from PyQt6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QGridLayout, QFormLayout,
     QTableWidget, QTableWidgetItem, QPushButton, QLineEdit,
@@ -21,7 +24,18 @@ from ..widgets.charts import StockChart
 from ..dialogs.product_dialog import ProductDialog
 
 class ProductsModule(BaseModule):
+    PAGE_SIZE = 200
+    change_tables = ('products',)
+    
     def __init__(self, db_manager, settings_manager):
+        self.products_cursor = None
+        self.products_exhausted = False
+        # Filters of the listed rows, and whether a page query is running
+        self.products_request = None
+        self.products_page_pending = False
+        # (name, id) of every table row, in row order, and by product id
+        self.product_keys = []
+        self.product_keys_by_id = {}
         super().__init__(db_manager, settings_manager, "المنتجات")
         
     def setup_ui(self):
@@ -193,6 +207,7 @@ class ProductsModule(BaseModule):
         table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         table.itemSelectionChanged.connect(self.on_selection_changed)
         table.itemDoubleClicked.connect(self.edit_product)
+        table.verticalScrollBar().valueChanged.connect(self.on_products_scrolled)
         
         return table
         
@@ -382,61 +397,200 @@ class ProductsModule(BaseModule):
     def load_data(self):
         """Load products data"""
         try:
-            # Load products
-            products = self.db_manager.get_products()
-            self.populate_products_table(products)
-            
-            # Update summary
-            self.update_inventory_summary(products)
+            self.apply_data(self.fetch_data(self.data_request()))
+        except Exception as e:
+            print(f"Error loading products data: {e}")
             
-            # Load low stock alerts
-            self.load_stock_alerts()
+    def data_request(self) -> dict:
+        """Current list filters"""
+        return {
+            'search_text': self.search_input.text().strip(),
+            'category': self.category_filter.currentData() or ""
+        }
+        
+    def fetch_data(self, request: dict) -> dict:
+        """Query the first products page, inventory counters and low stock alerts"""
+        return {
+            'request': request,
+            'page': self.query_products_page(request['search_text'], request['category']),
+            'summary': self.db_manager.get_inventory_stats(),
+            'alerts': self.db_manager.get_low_stock_products(row_format='record')
+        }
+        
+    def apply_data(self, data: dict):
+        """Show products data fetched by fetch_data()"""
+        # Load the first page of the products list
+        self.show_products_page(data['page'], data['request'], reset=True)
+        
+        # Update summary
+        self.update_inventory_summary(data['summary'])
+        
+        # Load low stock alerts
+        self.populate_alerts_table(data['alerts'])
+        
+        # Load categories
+        self.load_categories()
+        
+    def fetch_changed_rows(self, changes: list, request: dict) -> dict:
+        """Fetch the changed products plus fresh counters and alerts"""
+        if request['search_text']:
+            # Ranked search results have no stable position to patch
+            return None
+        changed_ids = [row_id for _, row_id, _ in changes]
+        category = request['category']
+        products = [product for product in self.db_manager.get_products_by_ids(changed_ids, row_format='record')
+                    if not category or product['category'] == category]
+        summary = self.db_manager.get_inventory_stats()
+        return {
+            'request': request,
+            'changed_ids': changed_ids,
+            'products': products,
+            'total': self.db_manager.count_products(category=category) if category else summary['product_count'],
+            'summary': summary,
+            'alerts': self.db_manager.get_low_stock_products(row_format='record')
+        }
+        
+    def apply_changes(self, data: dict):
+        """Patch the changed rows into the table and refresh the counters"""
+        if data['request'] != self.data_request():
+            # The filters changed while fetching: reload the list for the new ones
+            self.filter_products()
+        else:
+            self.patch_products_table(data['changed_ids'], data['products'])
+            self.results_label.setText(f"{data['total']} منتج")
             
-            # Load categories
-            self.load_categories()
+        self.update_inventory_summary(data['summary'])
+        self.populate_alerts_table(data['alerts'])
+        
+    def patch_products_table(self, changed_ids, products):
+        """Move, add or drop the rows of changed products, keeping the (name, id) order"""
+        for product_id in changed_ids:
+            key = self.product_keys_by_id.pop(product_id, None)
+            if key is not None:
+                row = bisect_left(self.product_keys, key)
+                self.products_table.removeRow(row)
+                del self.product_keys[row]
+                
+        for product in products:
+            key = (product['name'], product['id'])
+            # Rows past the loaded pages arrive with a later page
+            if (not self.products_exhausted and self.products_cursor is not None
+                    and key > tuple(self.products_cursor)):
+                continue
+            row = bisect_left(self.product_keys, key)
+            self.products_table.insertRow(row)
+            self.set_product_row(row, product)
+            self.product_keys.insert(row, key)
+            self.product_keys_by_id[key[1]] = key
             
-        except Exception as e:
-            print(f"Error loading products data: {e}")
+    def query_products_page(self, search_text: str, category: str, after=None):
+        """Fetch one page of the products list as (products, next_cursor, total)"""
+        if search_text:
+            # Typing in the search box shows the best-ranked matches only
+            products = self.db_manager.search_products(search_text, category, limit=self.PAGE_SIZE,
+                                                        row_format='record')
+            return products, None, len(products)
             
-    def populate_products_table(self, products):
-        """Populate the products table with data"""
-        self.products_table.setRowCount(len(products))
+        products, next_cursor = self.db_manager.get_products_page(
+            category=category, after=after, limit=self.PAGE_SIZE, row_format='record'
+        )
+        return products, next_cursor, self.db_manager.count_products(category=category)
+        
+    def show_products_page(self, page, request: dict, reset: bool = False):
+        """Append a page returned by query_products_page() for ``request`` to the table"""
+        products, self.products_cursor, total = page
+        if reset:
+            self.products_table.setRowCount(0)
+            self.products_request = request
+        self.products_exhausted = self.products_cursor is None
+        self.products_page_pending = False
+        self.populate_products_table(products, append=True)
         
-        for row, product in enumerate(products):
-            self.products_table.setItem(row, 0, QTableWidgetItem(str(product['id'])))
-            self.products_table.setItem(row, 1, QTableWidgetItem(product['name'] or ''))
-            self.products_table.setItem(row, 2, QTableWidgetItem(product['brand'] or ''))
-            self.products_table.setItem(row, 3, QTableWidgetItem(product['model'] or ''))
-            self.products_table.setItem(row, 4, QTableWidgetItem(product['category'] or ''))
+        # Update results count
+        self.results_label.setText(f"{total} منتج")
+        
+    def load_products_page(self):
+        """Fetch the next page of the listed products on a database worker"""
+        if self.products_exhausted or self.products_page_pending or self.products_request is None:
+            return
             
-            # Price formatting
-            price = f"{product['price']:.2f} ريال" if product['price'] else '-'
-            self.products_table.setItem(row, 5, QTableWidgetItem(price))
+        self.products_page_pending = True
+        request = self.products_request
+        self.db_executor.submit(
+            self.query_products_page, request['search_text'], request['category'], self.products_cursor,
+            key=(self, 'products_page'),
+            on_result=lambda page: self.on_products_page(page, request),
+            on_error=self.on_products_page_error
+        )
+        
+    def on_products_page(self, page, request: dict):
+        """Append a page fetched by load_products_page()"""
+        if request is not self.products_request:
+            # The list was reloaded while fetching; its own paging carries on
+            return
+        self.show_products_page(page, request)
+        
+    def on_products_page_error(self, error: BaseException):
+        """Let paging retry after a failed page query"""
+        print(f"Error loading products page: {error}")
+        self.products_page_pending = False
+        
+    def on_products_scrolled(self, value: int):
+        """Fetch the next page when the table is scrolled near the bottom"""
+        scroll_bar = self.products_table.verticalScrollBar()
+        if value >= scroll_bar.maximum() - 5:
+            self.load_products_page()
             
-            # Stock with color coding
-            stock_item = QTableWidgetItem(str(product['stock_quantity']))
-            if product['stock_quantity'] <= product['min_stock_level']:
-                stock_item.setBackground(Qt.GlobalColor.red)
-            elif product['stock_quantity'] <= product['min_stock_level'] * 2:
-                stock_item.setBackground(Qt.GlobalColor.yellow)
-            self.products_table.setItem(row, 6, stock_item)
+    def populate_products_table(self, products, append: bool = False):
+        """Populate the products table with data"""
+        first_row = self.products_table.rowCount() if append else 0
+        self.products_table.setRowCount(first_row + len(products))
+        if first_row == 0:
+            self.product_keys = []
+            self.product_keys_by_id = {}
             
-            self.products_table.setItem(row, 7, QTableWidgetItem(str(product['min_stock_level'])))
-            self.products_table.setItem(row, 8, QTableWidgetItem(product['barcode'] or ''))
+        for row, product in enumerate(products, first_row):
+            self.set_product_row(row, product)
+            key = (product['name'], product['id'])
+            self.product_keys.append(key)
+            self.product_keys_by_id[key[1]] = key
             
-            # Date formatting
-            created_date = product['created_at'][:10] if product['created_at'] else '-'
-            self.products_table.setItem(row, 9, QTableWidgetItem(created_date))
+        if not append:
+            self.results_label.setText(f"{len(products)} منتج")
             
-        # Update results count
-        self.results_label.setText(f"{len(products)} منتج")
-        
-    def update_inventory_summary(self, products):
-        """Update inventory summary cards"""
-        total_products = len(products)
-        total_value = sum(p['price'] * p['stock_quantity'] for p in products if p['price'] and p['stock_quantity'])
-        low_stock = len([p for p in products if p['stock_quantity'] <= p['min_stock_level']])
-        out_of_stock = len([p for p in products if p['stock_quantity'] == 0])
+    def set_product_row(self, row: int, product):
+        """Fill one products table row"""
+        self.products_table.setItem(row, 0, QTableWidgetItem(str(product['id'])))
+        self.products_table.setItem(row, 1, QTableWidgetItem(product['name'] or ''))
+        self.products_table.setItem(row, 2, QTableWidgetItem(product['brand'] or ''))
+        self.products_table.setItem(row, 3, QTableWidgetItem(product['model'] or ''))
+        self.products_table.setItem(row, 4, QTableWidgetItem(product['category'] or ''))
+        
+        # Price formatting
+        price = f"{product['price']:.2f} ريال" if product['price'] else '-'
+        self.products_table.setItem(row, 5, QTableWidgetItem(price))
+        
+        # Stock with color coding
+        stock_item = QTableWidgetItem(str(product['stock_quantity']))
+        if product['stock_quantity'] <= product['min_stock_level']:
+            stock_item.setBackground(Qt.GlobalColor.red)
+        elif product['stock_quantity'] <= product['min_stock_level'] * 2:
+            stock_item.setBackground(Qt.GlobalColor.yellow)
+        self.products_table.setItem(row, 6, stock_item)
+        
+        self.products_table.setItem(row, 7, QTableWidgetItem(str(product['min_stock_level'])))
+        self.products_table.setItem(row, 8, QTableWidgetItem(product['barcode'] or ''))
+        
+        # Date formatting
+        created_date = product['created_at'][:10] if product['created_at'] else '-'
+        self.products_table.setItem(row, 9, QTableWidgetItem(created_date))
+        
+    def update_inventory_summary(self, stats):
+        """Update inventory summary cards from the inventory counters"""
+        total_products = stats['product_count']
+        total_value = stats['stock_value']
+        low_stock = stats['low_stock_count']
+        out_of_stock = stats['out_of_stock_count']
         
         if "إجمالي المنتجات" in self.summary_labels:
             self.summary_labels["إجمالي المنتجات"].setText(str(total_products))
@@ -450,7 +604,7 @@ class ProductsModule(BaseModule):
     def load_stock_alerts(self):
         """Load low stock alerts"""
         try:
-            low_stock_products = self.db_manager.get_low_stock_products()
+            low_stock_products = self.db_manager.get_low_stock_products(row_format='record')
             self.populate_alerts_table(low_stock_products)
         except Exception as e:
             print(f"Error loading stock alerts: {e}")
@@ -542,12 +696,16 @@ class ProductsModule(BaseModule):
             
     def filter_products(self):
         """Filter products based on search and filter criteria"""
-        search_text = self.search_input.text().lower()
-        category = self.category_filter.currentData() if self.category_filter.currentData() else ""
-        
-        # This would implement the filtering logic
-        # For now, just trigger a data reload
-        self.load_data()
+        # Block scroll paging until the new first page arrives; each keystroke
+        # supersedes the previous query
+        self.products_page_pending = True
+        request = self.data_request()
+        self.db_executor.submit(
+            self.query_products_page, request['search_text'], request['category'],
+            key=(self, 'products_page'),
+            on_result=lambda page: self.show_products_page(page, request, reset=True),
+            on_error=self.on_products_page_error
+        )
         
     def sort_products(self):
         """Sort products based on selected criteria"""
@@ -612,15 +770,47 @@ class ProductsModule(BaseModule):
                 QMessageBox.critical(self, "خطأ", f"فشل في حذف المنتج:\n{str(e)}")
                 
     def import_products(self):
-        """Import products from file"""
+        """Import products from a CSV price list, keyed by barcode, on a database worker"""
         file_path, _ = QFileDialog.getOpenFileName(
             self, "استيراد المنتجات", "", 
-            "Excel Files (*.xlsx);;CSV Files (*.csv)"
+            "CSV Files (*.csv)"
         )
         
         if file_path:
-            # Implementation would handle file import
-            QMessageBox.information(self, "استيراد", "تم استيراد المنتجات بنجاح")
+            self.import_btn.setEnabled(False)
+            self.status_message.emit("جاري استيراد المنتجات...")
+            self.db_executor.submit(
+                self.upsert_products_file, file_path,
+                on_result=self.on_products_imported,
+                on_error=self.on_products_import_error
+            )
+            
+    def upsert_products_file(self, file_path: str) -> list:
+        """Upsert every row of a CSV price list (worker thread)"""
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            # The reader is consumed lazily, chunk by chunk
+            return self.db_manager.upsert_products(csv.DictReader(f))
+            
+    def on_products_imported(self, outcomes: list):
+        """Show the summary of a finished import"""
+        self.import_btn.setEnabled(True)
+        inserted = sum(1 for o in outcomes if o['status'] == 'inserted')
+        updated = sum(1 for o in outcomes if o['status'] == 'updated')
+        rejected = [o for o in outcomes if o['status'] == 'rejected']
+        
+        message = f"تمت إضافة {inserted} منتج وتحديث {updated} منتج"
+        if rejected:
+            message += f"\nتم رفض {len(rejected)} سطر"
+            first = rejected[0]
+            message += f" (أول خطأ في السطر {first['row'] + 2}: {first['error']})"
+            
+        self.refresh_data()
+        QMessageBox.information(self, "استيراد", message)
+        
+    def on_products_import_error(self, error: BaseException):
+        """Report a failed import"""
+        self.import_btn.setEnabled(True)
+        QMessageBox.critical(self, "خطأ", f"فشل في استيراد المنتجات:\n{str(error)}")
             
     def export_products(self):
         """Export products to file"""
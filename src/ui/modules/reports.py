@@ -13,6 +13,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QDate
 from PyQt6.QtGui import QFont
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -20,6 +21,9 @@ from matplotlib.figure import Figure
 from .base_module import BaseModule
 
 class ReportsModule(BaseModule):
+    # Date ranges longer than this are charted per month
+    MONTHLY_CHART_DAYS = 120
+    
     def __init__(self, db_manager, settings_manager):
         super().__init__(db_manager, settings_manager, "التقارير")
         
@@ -455,19 +459,43 @@ class ReportsModule(BaseModule):
         self.end_date.setDate(end_date)
         
     def generate_sales_report(self):
-        """Generate sales report"""
+        """Generate sales report (the queries run off the GUI thread)"""
+        start_date = self.start_date.date().toString("yyyy-MM-dd")
+        end_date = self.end_date.date().toString("yyyy-MM-dd")
+        days = self.start_date.date().daysTo(self.end_date.date())
+        period = 'month' if days > self.MONTHLY_CHART_DAYS else 'day'
+        
+        # A newer date range supersedes this one
+        self.db_executor.submit(
+            self.fetch_sales_report, start_date, end_date, period,
+            key=(self, 'sales_report'), on_result=self.show_sales_report,
+            on_error=lambda e: print(f"Error generating sales report: {e}")
+        )
+        
+    def fetch_sales_report(self, start_date: str, end_date: str, period: str) -> dict:
+        """Load the sales rows and the rollup totals for a date range (worker thread)
+        
+        Both come from one read snapshot, so the table and totals agree
+        and sales committed meanwhile are neither waited for nor blocked.
+        """
+        with self.db_manager.report_snapshot():
+            return {
+                'sales': self.db_manager.get_sales_report(start_date, end_date, by_business_date=True,
+                                                          row_format='columns'),
+                'totals': self.db_manager.get_sales_rollup(start_date, end_date),
+                'period': period,
+            }
+        
+    def show_sales_report(self, report):
+        """Show sales report: summary and chart from the rollups, table from the rows"""
         try:
-            start_date = self.start_date.date().toString("yyyy-MM-dd")
-            end_date = self.end_date.date().toString("yyyy-MM-dd")
-            
-            # Load sales data
-            sales = self.db_manager.get_sales_report(start_date, end_date)
+            totals = report['totals']
             
             # Update summary
-            total_sales = sum(s['total_amount'] for s in sales)
-            total_invoices = len(sales)
+            total_sales = sum(row['gross'] for row in totals)
+            total_invoices = sum(row['sale_count'] for row in totals)
             avg_invoice = total_sales / total_invoices if total_invoices > 0 else 0
-            total_tax = sum(s['tax_amount'] for s in sales)
+            total_tax = sum(row['tax'] for row in totals)
             
             if "إجمالي المبيعات" in self.sales_summary_labels:
                 self.sales_summary_labels["إجمالي المبيعات"].setText(f"{total_sales:,.2f} ريال")
@@ -479,47 +507,58 @@ class ReportsModule(BaseModule):
                 self.sales_summary_labels["إجمالي الضريبة"].setText(f"{total_tax:,.2f} ريال")
                 
             # Update table
-            self.populate_sales_table(sales)
+            self.populate_sales_table(report['sales'])
             
             # Update chart
-            self.update_sales_chart(sales)
+            self.update_sales_chart(totals, report['period'])
             
         except Exception as e:
             print(f"Error generating sales report: {e}")
             
     def populate_sales_table(self, sales):
-        """Populate sales table"""
-        self.sales_table.setRowCount(len(sales))
-        
-        for row, sale in enumerate(sales):
-            self.sales_table.setItem(row, 0, QTableWidgetItem(str(sale['id'])))
-            self.sales_table.setItem(row, 1, QTableWidgetItem(sale['created_at'][:10]))
-            self.sales_table.setItem(row, 2, QTableWidgetItem(sale.get('customer_name', 'غير محدد')))
-            self.sales_table.setItem(row, 3, QTableWidgetItem(f"{sale['total_amount']:,.2f}"))
-            self.sales_table.setItem(row, 4, QTableWidgetItem(f"{sale['discount_amount']:,.2f}"))
-            self.sales_table.setItem(row, 5, QTableWidgetItem(f"{sale['tax_amount']:,.2f}"))
-            self.sales_table.setItem(row, 6, QTableWidgetItem(sale.get('payment_method', '-')))
+        """Populate sales table from sales columns"""
+        self.sales_table.setRowCount(len(sales['id']))
+        
+        rows = zip(
+            sales['id'].tolist(),
+            np.datetime_as_string(sales['created_at'], unit='D').tolist(),
+            sales['customer_name'].tolist(),
+            sales['total_amount'].tolist(),
+            sales['discount_amount'].tolist(),
+            sales['tax_amount'].tolist(),
+            sales['payment_method'].tolist(),
+        )
+        for row, (sale_id, date, customer_name, total, discount, tax, payment_method) in enumerate(rows):
+            self.sales_table.setItem(row, 0, QTableWidgetItem(str(sale_id)))
+            self.sales_table.setItem(row, 1, QTableWidgetItem(date))
+            self.sales_table.setItem(row, 2, QTableWidgetItem(customer_name or 'غير محدد'))
+            self.sales_table.setItem(row, 3, QTableWidgetItem(f"{total:,.2f}"))
+            self.sales_table.setItem(row, 4, QTableWidgetItem(f"{discount:,.2f}"))
+            self.sales_table.setItem(row, 5, QTableWidgetItem(f"{tax:,.2f}"))
+            self.sales_table.setItem(row, 6, QTableWidgetItem(payment_method or '-'))
             
-    def update_sales_chart(self, sales):
-        """Update sales chart"""
+    def update_sales_chart(self, totals, period: str = 'day'):
+        """Update sales chart from rollup totals"""
         self.sales_figure.clear()
         
-        if not sales:
+        if not totals:
             return
             
-        # Group sales by date
-        daily_sales = {}
-        for sale in sales:
-            date = sale['created_at'][:10]
-            daily_sales[date] = daily_sales.get(date, 0) + sale['total_amount']
-            
         # Create chart
         ax = self.sales_figure.add_subplot(111)
-        dates = list(daily_sales.keys())
-        amounts = list(daily_sales.values())
+        if period == 'month':
+            # Months at either end of the range are partial, so sum the days
+            monthly = {}
+            for row in totals:
+                monthly[row['period'][:7]] = monthly.get(row['period'][:7], 0) + row['gross']
+            dates, amounts = list(monthly), list(monthly.values())
+        else:
+            dates = [row['period'] for row in totals]
+            amounts = [row['gross'] for row in totals]
         
         ax.plot(dates, amounts, marker='o', linewidth=2, markersize=6)
-        ax.set_title('المبيعات اليومية', fontsize=14, fontweight='bold')
+        title = 'المبيعات الشهرية' if period == 'month' else 'المبيعات اليومية'
+        ax.set_title(title, fontsize=14, fontweight='bold')
         ax.set_xlabel('التاريخ')
         ax.set_ylabel('المبلغ (ريال)')
         ax.grid(True, alpha=0.3)
@@ -531,16 +570,26 @@ class ReportsModule(BaseModule):
         self.sales_canvas.draw()
         
     def generate_inventory_report(self):
-        """Generate inventory report"""
-        try:
-            # Load inventory data
-            products = self.db_manager.get_products()
+        """Generate inventory report (the query runs off the GUI thread)"""
+        self.db_executor.submit(
+            self.fetch_inventory_report,
+            key=(self, 'inventory_report'), on_result=self.show_inventory_report,
+            on_error=lambda e: print(f"Error generating inventory report: {e}")
+        )
+        
+    def fetch_inventory_report(self) -> dict:
+        """Load the inventory counters on the report connection (worker thread)"""
+        with self.db_manager.report_snapshot():
+            return self.db_manager.get_inventory_stats()
             
+    def show_inventory_report(self, stats):
+        """Show inventory report from the inventory counters"""
+        try:
             # Update summary
-            total_products = len(products)
-            total_value = sum(p['price'] * p['stock_quantity'] for p in products if p['price'] and p['stock_quantity'])
-            low_stock = len([p for p in products if p['stock_quantity'] <= p['min_stock_level']])
-            out_of_stock = len([p for p in products if p['stock_quantity'] == 0])
+            total_products = stats['product_count']
+            total_value = stats['stock_value']
+            low_stock = stats['low_stock_count']
+            out_of_stock = stats['out_of_stock_count']
             
             if "إجمالي المنتجات" in self.inventory_summary_labels:
                 self.inventory_summary_labels["إجمالي المنتجات"].setText(str(total_products))
@@ -552,24 +601,25 @@ class ReportsModule(BaseModule):
                 self.inventory_summary_labels["غير متوفر"].setText(str(out_of_stock))
                 
             # Update inventory chart
-            self.update_inventory_chart(products)
+            self.update_inventory_chart(stats)
             
         except Exception as e:
             print(f"Error generating inventory report: {e}")
             
-    def update_inventory_chart(self, products):
+    def update_inventory_chart(self, stats):
         """Update inventory chart"""
         self.inventory_figure.clear()
         
-        if not products:
+        if not stats['product_count']:
             return
             
         # Create stock status pie chart
         ax = self.inventory_figure.add_subplot(111)
         
-        in_stock = len([p for p in products if p['stock_quantity'] > p['min_stock_level']])
-        low_stock = len([p for p in products if 0 < p['stock_quantity'] <= p['min_stock_level']])
-        out_of_stock = len([p for p in products if p['stock_quantity'] == 0])
+        # Out of stock products are also counted as low stock
+        in_stock = stats['product_count'] - stats['low_stock_count']
+        low_stock = max(stats['low_stock_count'] - stats['out_of_stock_count'], 0)
+        out_of_stock = stats['out_of_stock_count']
         
         labels = ['متوفر', 'مخزون منخفض', 'غير متوفر']
         sizes = [in_stock, low_stock, out_of_stock]
@@ -424,7 +424,7 @@ class ServicesModule(BaseModule):
     def load_customers(self):
         """Load customers for combo boxes"""
         try:
-            customers = self.db_manager.get_customers()
+            customers = self.db_manager.get_customers(row_format='record')
             
             for combo in [self.customer_combo, self.payment_customer]:
                 combo.clear()
@@ -12,14 +12,23 @@ from PyQt6.QtWidgets import (
     QComboBox, QDateEdit, QDoubleSpinBox, QSpinBox,
     QCheckBox, QSlider, QFileDialog, QProgressBar
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QDate, QTimer
+from PyQt6.QtCore import Qt, pyqtSignal, QDate
 from PyQt6.QtGui import QFont
 
 from .base_module import BaseModule
+from ...database.profiles import PROFILE_NAMES
 
 class SettingsModule(BaseModule):
+    # (copied_pages, total_pages) from the backup/restore worker thread
+    backup_progress_changed = pyqtSignal(int, int)
+    # The live database was replaced by a backup; modules should reload
+    database_restored = pyqtSignal()
+    # Changes from other branches were imported; modules should reload
+    branches_synced = pyqtSignal()
+    
     def __init__(self, db_manager, settings_manager):
         super().__init__(db_manager, settings_manager, "الإعدادات")
+        self.backup_progress_changed.connect(self.on_backup_progress)
         
     def setup_ui(self):
         """Setup settings module UI"""
@@ -110,6 +119,20 @@ class SettingsModule(BaseModule):
         
         layout.addWidget(autosave_group)
         
+        # Database performance settings
+        database_group = QGroupBox("قاعدة البيانات")
+        database_layout = QFormLayout(database_group)
+        
+        self.db_profile_combo = QComboBox()
+        for profile, title in PROFILE_NAMES.items():
+            self.db_profile_combo.addItem(title, profile)
+        database_layout.addRow("ملف الأداء:", self.db_profile_combo)
+        
+        self.group_commit_enabled = QCheckBox("تجميع عمليات الحفظ المتزامنة")
+        database_layout.addRow("الحفظ المجمّع:", self.group_commit_enabled)
+        
+        layout.addWidget(database_group)
+        
         layout.addStretch()
         
         return tab
@@ -355,6 +378,28 @@ class SettingsModule(BaseModule):
         
         layout.addWidget(cloud_group)
         
+        # Branch sync through a shared folder or USB stick
+        sync_group = QGroupBox("مزامنة الفروع")
+        sync_layout = QFormLayout(sync_group)
+        
+        self.sync_folder = QLineEdit()
+        sync_folder_layout = QHBoxLayout()
+        sync_folder_layout.addWidget(self.sync_folder)
+        
+        sync_browse_btn = QPushButton("تصفح")
+        sync_browse_btn.setObjectName("secondary_button")
+        sync_browse_btn.clicked.connect(self.browse_sync_folder)
+        sync_folder_layout.addWidget(sync_browse_btn)
+        
+        sync_layout.addRow("مجلد المزامنة:", sync_folder_layout)
+        
+        self.sync_btn = QPushButton("🔄 مزامنة الآن")
+        self.sync_btn.setObjectName("primary_button")
+        self.sync_btn.clicked.connect(self.sync_branches)
+        sync_layout.addRow("المزامنة:", self.sync_btn)
+        
+        layout.addWidget(sync_group)
+        
         # Backup history
         history_group = QGroupBox("سجل النسخ الاحتياطية")
         history_layout = QVBoxLayout(history_group)
@@ -470,7 +515,7 @@ class SettingsModule(BaseModule):
             
             # Load notification settings
             self.sound_notifications.setChecked(
-                self.settings_manager.get('notification_sound', True)
+                self.settings_manager.current.notification_sound
             )
             self.low_stock_alerts.setChecked(
                 self.settings_manager.is_low_stock_alert_enabled()
@@ -478,9 +523,15 @@ class SettingsModule(BaseModule):
             
             # Load auto-save settings
             self.auto_save_enabled.setChecked(
-                self.settings_manager.get('auto_save', True)
+                self.settings_manager.current.auto_save
             )
             
+            # Load database profile
+            index = self.db_profile_combo.findData(self.settings_manager.get_db_profile())
+            if index >= 0:
+                self.db_profile_combo.setCurrentIndex(index)
+            self.group_commit_enabled.setChecked(self.settings_manager.current.group_commit)
+            
             # Load backup settings
             self.auto_backup_enabled.setChecked(
                 self.settings_manager.is_auto_backup_enabled()
@@ -497,6 +548,9 @@ class SettingsModule(BaseModule):
             # Load business settings
             self.tax_rate.setValue(self.settings_manager.get_tax_rate())
             
+            # Load branch sync folder
+            self.sync_folder.setText(self.settings_manager.current.sync_folder)
+            
             # Load backup history
             self.load_backup_history()
             
@@ -542,34 +596,43 @@ class SettingsModule(BaseModule):
             self.backup_location.setText(folder)
             
     def create_backup(self):
-        """Create manual backup"""
-        try:
-            self.backup_progress.setVisible(True)
-            self.backup_progress.setValue(0)
-            
-            # Simulate backup progress
-            for i in range(101):
-                self.backup_progress.setValue(i)
-                QTimer.singleShot(i * 10, lambda: None)  # Simulate work
-                
-            backup_path = self.db_manager.backup_database()
-            
-            self.backup_progress.setVisible(False)
-            
-            QMessageBox.information(
-                self, "نسخ احتياطي",
-                f"تم إنشاء النسخة الاحتياطية بنجاح:\n{backup_path}"
-            )
-            
-            # Refresh backup history
-            self.load_backup_history()
-            
-        except Exception as e:
-            self.backup_progress.setVisible(False)
-            QMessageBox.critical(
-                self, "خطأ",
-                f"فشل في إنشاء النسخة الاحتياطية:\n{str(e)}"
-            )
+        """Create manual backup on a database worker thread"""
+        self.backup_btn.setEnabled(False)
+        self.backup_progress.setVisible(True)
+        self.backup_progress.setRange(0, 0)  # Busy until the first step reports
+        
+        self.db_executor.submit(
+            self.db_manager.backup_database, progress=self.backup_progress_changed.emit,
+            key=(self, 'backup'), on_result=self.on_backup_finished,
+            on_error=self.on_backup_failed
+        )
+        
+    def on_backup_progress(self, copied: int, total: int):
+        """Show real backup progress in pages"""
+        self.backup_progress.setRange(0, total)
+        self.backup_progress.setValue(copied)
+        
+    def on_backup_finished(self, backup_path: str):
+        """Report a completed manual backup"""
+        self.backup_progress.setVisible(False)
+        self.backup_btn.setEnabled(True)
+        
+        QMessageBox.information(
+            self, "نسخ احتياطي",
+            f"تم إنشاء النسخة الاحتياطية بنجاح:\n{backup_path}"
+        )
+        
+        # Refresh backup history
+        self.load_backup_history()
+        
+    def on_backup_failed(self, error: BaseException):
+        """Report a failed manual backup"""
+        self.backup_progress.setVisible(False)
+        self.backup_btn.setEnabled(True)
+        QMessageBox.critical(
+            self, "خطأ",
+            f"فشل في إنشاء النسخة الاحتياطية:\n{str(error)}"
+        )
             
     def restore_backup(self):
         """Restore from backup"""
@@ -588,40 +651,114 @@ class SettingsModule(BaseModule):
             )
             
             if reply == QMessageBox.StandardButton.Yes:
-                try:
-                    # Here would be the actual restore process
-                    QMessageBox.information(
-                        self, "استعادة",
-                        "تم استعادة النسخة الاحتياطية بنجاح\n"
-                        "سيتم إعادة تشغيل البرنامج"
-                    )
-                    
-                except Exception as e:
-                    QMessageBox.critical(
-                        self, "خطأ",
-                        f"فشل في استعادة النسخة الاحتياطية:\n{str(e)}"
-                    )
+                self.backup_btn.setEnabled(False)
+                self.restore_btn.setEnabled(False)
+                self.backup_progress.setVisible(True)
+                self.backup_progress.setRange(0, 0)
+                
+                # Verified with quick_check, then loaded into the live database
+                self.db_executor.submit(
+                    self.db_manager.restore_database, file_path,
+                    progress=self.backup_progress_changed.emit,
+                    key=(self, 'restore'), on_result=self.on_restore_finished,
+                    on_error=self.on_restore_failed
+                )
+                
+    def on_restore_finished(self, _result=None):
+        """Reload every module after a hot restore"""
+        self.backup_progress.setVisible(False)
+        self.backup_btn.setEnabled(True)
+        self.restore_btn.setEnabled(True)
+        self.database_restored.emit()
+        
+        QMessageBox.information(
+            self, "استعادة",
+            "تم استعادة النسخة الاحتياطية بنجاح"
+        )
+        
+    def on_restore_failed(self, error: BaseException):
+        """Report a rejected or failed restore; the live database is unchanged"""
+        self.backup_progress.setVisible(False)
+        self.backup_btn.setEnabled(True)
+        self.restore_btn.setEnabled(True)
+        QMessageBox.critical(
+            self, "خطأ",
+            f"فشل في استعادة النسخة الاحتياطية:\n{str(error)}"
+        )
                     
+    def browse_sync_folder(self):
+        """Browse for the folder changesets are exchanged through"""
+        folder = QFileDialog.getExistingDirectory(
+            self, "اختيار مجلد المزامنة",
+            self.sync_folder.text()
+        )
+        
+        if folder:
+            self.sync_folder.setText(folder)
+            
+    def sync_branches(self):
+        """Export this branch's changes to the sync folder and import the other branches'"""
+        folder = self.sync_folder.text().strip()
+        if not folder:
+            QMessageBox.warning(self, "خطأ", "يرجى اختيار مجلد المزامنة")
+            return
+        
+        self.settings_manager.set('sync_folder', folder)
+        self.sync_btn.setEnabled(False)
+        self.db_executor.submit(
+            self.db_manager.sync_branches, folder,
+            key=(self, 'sync'), on_result=self.on_sync_finished,
+            on_error=self.on_sync_failed
+        )
+        
+    def on_sync_finished(self, stats: dict):
+        """Report a completed branch sync and reload the modules"""
+        self.sync_btn.setEnabled(True)
+        self.branches_synced.emit()
+        
+        message = (
+            f"تمت المزامنة بنجاح\n"
+            f"جديد: {stats['inserted']}  محدّث: {stats['updated']}  محذوف: {stats['deleted']}\n"
+            f"تعارضات: {stats['conflicts']}"
+        )
+        if stats['pending']:
+            message += f"\nملفات بانتظار ملفات سابقة مفقودة: {stats['pending']}"
+        QMessageBox.information(self, "مزامنة الفروع", message)
+        
+    def on_sync_failed(self, error: BaseException):
+        """Report a failed branch sync"""
+        self.sync_btn.setEnabled(True)
+        QMessageBox.critical(
+            self, "خطأ",
+            f"فشل في مزامنة الفروع:\n{str(error)}"
+        )
+        
     def save_settings(self):
         """Save all settings"""
         try:
-            # Save general settings
-            lang = "ar" if self.language_combo.currentText() == "العربية" else "en"
-            self.settings_manager.set_language(lang)
-            
-            # Save appearance settings
-            theme = "light" if self.theme_combo.currentText() == "فاتح" else "dark"
-            self.settings_manager.set_theme(theme)
-            
-            # Save other settings
-            self.settings_manager.set('notification_sound', self.sound_notifications.isChecked())
-            self.settings_manager.set('low_stock_alert', self.low_stock_alerts.isChecked())
-            self.settings_manager.set('auto_save', self.auto_save_enabled.isChecked())
-            self.settings_manager.set('auto_backup', self.auto_backup_enabled.isChecked())
+            # Persisted once, with one change signal, when the batch ends
+            with self.settings_manager.batch():
+                # Save general settings
+                lang = "ar" if self.language_combo.currentText() == "العربية" else "en"
+                self.settings_manager.set_language(lang)
+                
+                # Save appearance settings
+                theme = "light" if self.theme_combo.currentText() == "فاتح" else "dark"
+                self.settings_manager.set_theme(theme)
+                
+                # Save other settings
+                self.settings_manager.set('notification_sound', self.sound_notifications.isChecked())
+                self.settings_manager.set('low_stock_alert', self.low_stock_alerts.isChecked())
+                self.settings_manager.set('auto_save', self.auto_save_enabled.isChecked())
+                self.settings_manager.set('auto_backup', self.auto_backup_enabled.isChecked())
+                self.settings_manager.set_db_profile(self.db_profile_combo.currentData())
+                self.settings_manager.set('group_commit', self.group_commit_enabled.isChecked())
             
             # Save business settings
-            self.db_manager.set_setting('tax_rate', str(self.tax_rate.value()))
-            self.db_manager.set_setting('currency', self.currency_input.text())
+            self.db_manager.set_settings({
+                'tax_rate': str(self.tax_rate.value()),
+                'currency': self.currency_input.text(),
+            })
             
             self.status_message.emit("تم حفظ الإعدادات بنجاح")
             
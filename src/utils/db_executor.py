@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Database Executor - Runs database calls off the GUI thread
+"""
+
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+
+class DatabaseExecutor(QObject):
+    """Run DatabaseManager calls on worker threads and hand results back to the GUI thread
+
+    Worker threads get their own connections from the manager's pool.
+    Callbacks passed to submit() and the finished/failed signals always
+    run on the thread that owns the executor (the GUI thread).
+    """
+
+    # Signals for keyed tasks: (key, result) / (key, exception)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+
+    # Internal: carries a completed task from a worker to the GUI thread
+    _task_done = pyqtSignal(object)
+
+    _shared = weakref.WeakKeyDictionary()
+
+    def __init__(self, db_manager, max_workers: int = 2):
+        super().__init__()
+        self.db_manager = db_manager
+        self.workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._latest: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._task_done.connect(self._deliver)
+
+    @classmethod
+    def shared(cls, db_manager) -> 'DatabaseExecutor':
+        """Get the executor shared by every module using ``db_manager``"""
+        executor = cls._shared.get(db_manager)
+        if executor is None:
+            executor = cls(db_manager)
+            cls._shared[db_manager] = executor
+        return executor
+
+    def submit(self, func: Callable, *args, key: Optional[Hashable] = None,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """Run ``func(*args, **kwargs)`` on a worker thread
+
+        A newer task with the same ``key`` (e.g. the same view reloading)
+        supersedes the older one: it is cancelled if it has not started yet,
+        and its result is dropped if it has.
+        """
+        future = self.workers.submit(func, *args, **kwargs)
+
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = future
+            if previous is not None:
+                previous.cancel()
+
+        future.add_done_callback(lambda done: self._task_done.emit((key, done, on_result, on_error)))
+        return future
+
+    def is_current(self, key: Hashable, future: Future) -> bool:
+        """Check that ``future`` is still the newest task for ``key``"""
+        with self._lock:
+            return self._latest.get(key) is future
+
+    def _deliver(self, task):
+        """Run callbacks for a finished task on the executor's thread"""
+        key, future, on_result, on_error = task
+
+        if key is not None:
+            with self._lock:
+                if self._latest.get(key) is not future:
+                    return
+                del self._latest[key]
+
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Database task error: {error}")
+            if key is not None:
+                self.failed.emit(key, error)
+            return
+
+        result = future.result()
+        if on_result:
+            on_result(result)
+        if key is not None:
+            self.finished.emit(key, result)
+
+    def shutdown(self, wait: bool = True):
+        """Drop queued tasks and wait for running ones to finish"""
+        with self._lock:
+            self._latest.clear()
+        self.workers.shutdown(wait=wait, cancel_futures=True)
@@ -2,68 +2,180 @@
 # -*- coding: utf-8 -*-
 """
 Settings Manager - Application Settings Management
+
+Settings are read from QSettings once into a typed, immutable AppSettings
+snapshot; getters are attribute reads on ``SettingsManager.current``.
+Writes go through update() (or a batch()), which persists the changed
+keys with one sync and emits one coalesced change set.
 """
 
 import json
 import os
-from typing import Any, Dict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Iterator
 from PyQt6.QtCore import QSettings, QObject, pyqtSignal
 
+@dataclass(frozen=True)
+class AppSettings:
+    """Typed settings schema: field types drive conversion, defaults are the defaults"""
+    theme: str = 'light'
+    language: str = 'ar'
+    auto_backup: bool = True
+    backup_frequency: str = 'daily'
+    tax_rate: float = 15.0
+    currency: str = 'ريال'
+    low_stock_alert: bool = True
+    window_geometry: Any = ''
+    window_state: Any = ''
+    font_family: str = 'Tahoma'
+    font_size: int = 10
+    auto_save: bool = True
+    notification_sound: bool = True
+    backup_location: str = 'local'
+    db_profile: str = 'balanced'
+    group_commit: bool = False
+    sync_folder: str = ''
+
+SETTING_TYPES: Dict[str, Any] = {field.name: field.type for field in fields(AppSettings)}
+
+# Binary window layout, not meaningful in an exported settings file
+NOT_EXPORTED = ('window_geometry', 'window_state')
+
+def convert_setting(key: str, value: Any) -> Any:
+    """Convert a stored or imported value to the schema type of ``key``
+    
+    QSettings INI files hand back strings ('true', '15.0'); unknown keys
+    and untyped fields are returned unchanged. Raises ValueError for a
+    value that does not fit the type.
+    """
+    kind = SETTING_TYPES.get(key, Any)
+    if kind is Any or isinstance(value, kind) and not (kind is int and isinstance(value, bool)):
+        return value
+    if kind is bool:
+        text = str(value).strip().lower()
+        if text in ('true', '1', 'yes', 'on'):
+            return True
+        if text in ('false', '0', 'no', 'off', ''):
+            return False
+        raise ValueError(f"invalid value for {key}: {value!r}")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid value for {key}: {value!r}") from None
+
 class SettingsManager(QObject):
     # Signals for settings changes
     theme_changed = pyqtSignal(str)
     language_changed = pyqtSignal(str)
-    settings_changed = pyqtSignal(str, str)
+    # One {key: new value} dict per committed update or batch
+    settings_changed = pyqtSignal(dict)
     
     def __init__(self):
         super().__init__()
         self.settings = QSettings("MobileShop", "ManagementSystem")
+        self.current = AppSettings()
+        self.extra: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+        self._batch_depth = 0
         self.setup_default_settings()
-        
+        self.load()
+    
     def setup_default_settings(self):
         """Setup default application settings"""
-        defaults = {
-            'theme': 'light',
-            'language': 'ar',
-            'auto_backup': True,
-            'backup_frequency': 'daily',
-            'tax_rate': 15.0,
-            'currency': 'ريال',
-            'low_stock_alert': True,
-            'window_geometry': '',
-            'window_state': '',
-            'font_family': 'Tahoma',
-            'font_size': 10,
-            'auto_save': True,
-            'notification_sound': True,
-            'backup_location': 'local'
-        }
-        
-        for key, value in defaults.items():
-            if not self.settings.contains(key):
-                self.settings.setValue(key, value)
+        defaults = asdict(AppSettings())
+        missing = [key for key in defaults if not self.settings.contains(key)]
+        for key in missing:
+            self.settings.setValue(key, defaults[key])
+        if missing:
+            self.settings.sync()
+    
+    def load(self):
+        """Read every stored setting into the typed snapshot"""
+        values = {}
+        extra = {}
+        for key in self.settings.allKeys():
+            value = self.settings.value(key)
+            if key not in SETTING_TYPES:
+                extra[key] = value
+                continue
+            try:
+                values[key] = convert_setting(key, value)
+            except ValueError as e:
+                print(f"Error loading setting {key}: {e}")
+        self.current = AppSettings(**values)
+        self.extra = extra
     
     def get(self, key: str, default_value: Any = None) -> Any:
         """Get a setting value"""
-        return self.settings.value(key, default_value)
+        if key in self._pending:
+            return self._pending[key]
+        if key in SETTING_TYPES:
+            return getattr(self.current, key)
+        return self.extra.get(key, default_value)
     
     def set(self, key: str, value: Any):
         """Set a setting value"""
-        old_value = self.get(key)
-        self.settings.setValue(key, value)
+        self.update({key: value})
+    
+    @contextmanager
+    def batch(self) -> Iterator['SettingsManager']:
+        """Group set()/update() calls: persisted and signalled once on exit
+        
+        Nothing is written if the block raises.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._batch_depth == 1:
+                self._pending.clear()
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0:
+            pending, self._pending = self._pending, {}
+            self._commit(pending)
+    
+    def update(self, values: Dict[str, Any]):
+        """Set several setting values at once
+        
+        All values are converted before anything is stored, so an invalid
+        value (ValueError) leaves every setting unchanged.
+        """
+        converted = {key: convert_setting(key, value) for key, value in values.items()}
+        if self._batch_depth:
+            self._pending.update(converted)
+        else:
+            self._commit(converted)
+    
+    def _commit(self, values: Dict[str, Any]):
+        """Persist and announce the values that differ from the snapshot"""
+        changes = {key: value for key, value in values.items()
+                   if key not in SETTING_TYPES and key not in self.extra or self.get(key) != value}
+        if not changes:
+            return
+        
+        for key, value in changes.items():
+            self.settings.setValue(key, value)
+        self.settings.sync()
+        
+        typed = {key: value for key, value in changes.items() if key in SETTING_TYPES}
+        self.current = replace(self.current, **typed)
+        self.extra.update((key, value) for key, value in changes.items() if key not in SETTING_TYPES)
         
         # Emit specific signals for important settings
-        if key == 'theme' and old_value != value:
-            self.theme_changed.emit(value)
-        elif key == 'language' and old_value != value:
-            self.language_changed.emit(value)
+        if 'theme' in changes:
+            self.theme_changed.emit(self.current.theme)
+        if 'language' in changes:
+            self.language_changed.emit(self.current.language)
         
         # Emit general settings change signal
-        self.settings_changed.emit(key, str(value))
+        self.settings_changed.emit(changes)
     
     def get_theme(self) -> str:
         """Get current theme"""
-        return self.get('theme', 'light')
+        return self.current.theme
     
     def set_theme(self, theme: str):
         """Set current theme"""
@@ -71,7 +183,7 @@ class SettingsManager(QObject):
     
     def get_language(self) -> str:
         """Get current language"""
-        return self.get('language', 'ar')
+        return self.current.language
     
     def set_language(self, language: str):
         """Set current language"""
@@ -79,30 +191,38 @@ class SettingsManager(QObject):
     
     def is_auto_backup_enabled(self) -> bool:
         """Check if auto backup is enabled"""
-        return self.get('auto_backup', True)
+        return self.current.auto_backup
     
     def get_backup_frequency(self) -> str:
         """Get backup frequency"""
-        return self.get('backup_frequency', 'daily')
+        return self.current.backup_frequency
     
     def get_tax_rate(self) -> float:
         """Get tax rate"""
-        return float(self.get('tax_rate', 15.0))
+        return self.current.tax_rate
     
     def get_currency(self) -> str:
         """Get currency symbol"""
-        return self.get('currency', 'ريال')
+        return self.current.currency
     
     def is_low_stock_alert_enabled(self) -> bool:
         """Check if low stock alerts are enabled"""
-        return self.get('low_stock_alert', True)
+        return self.current.low_stock_alert
+    
+    def get_db_profile(self) -> str:
+        """Get database performance profile"""
+        return self.current.db_profile
+    
+    def set_db_profile(self, profile: str):
+        """Set database performance profile"""
+        self.set('db_profile', profile)
     
     def export_settings(self, file_path: str) -> bool:
         """Export settings to a JSON file"""
         try:
-            settings_dict = {}
-            for key in self.settings.allKeys():
-                settings_dict[key] = self.settings.value(key)
+            settings_dict = {key: value for key, value in asdict(self.current).items()
+                             if key not in NOT_EXPORTED}
+            settings_dict.update(self.extra)
             
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(settings_dict, f, ensure_ascii=False, indent=2)
@@ -116,12 +236,11 @@ class SettingsManager(QObject):
         try:
             if not os.path.exists(file_path):
                 return False
-                
+            
             with open(file_path, 'r', encoding='utf-8') as f:
                 settings_dict = json.load(f)
             
-            for key, value in settings_dict.items():
-                self.set(key, value)
+            self.update(settings_dict)
             
             return True
         except Exception as e:
@@ -131,4 +250,15 @@ class SettingsManager(QObject):
     def reset_to_defaults(self):
         """Reset all settings to default values"""
         self.settings.clear()
-        self.setup_default_settings()
\ No newline at end of file
+        self.extra = {}
+        defaults = asdict(AppSettings())
+        self.current, previous = AppSettings(), self.current
+        self.setup_default_settings()
+        
+        changes = {key: value for key, value in defaults.items() if getattr(previous, key) != value}
+        if 'theme' in changes:
+            self.theme_changed.emit(self.current.theme)
+        if 'language' in changes:
+            self.language_changed.emit(self.current.language)
+        if changes:
+            self.settings_changed.emit(changes)
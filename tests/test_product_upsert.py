@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for bulk product upserts - partial updates of existing barcodes
+
+Usage: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+
+
+class ProductUpsertTest(unittest.TestCase):
+    """upsert_products against an existing catalogue"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, 'shop.db'))
+        self.manager.initialize_database()
+        self.product_id = self.manager.add_product({'name': 'Phone', 'price': 1200.5, 'barcode': 'P1',
+                                                    'stock_quantity': 3})
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def product(self) -> dict:
+        return self.manager.get_products_by_ids([self.product_id])[0]
+
+    def test_stock_only_update_keeps_price_and_name(self):
+        outcomes = self.manager.upsert_products([{'barcode': 'P1', 'stock_quantity': 40}])
+
+        self.assertEqual(outcomes[0]['status'], 'updated')
+        self.assertIsNone(outcomes[0]['error'])
+        product = self.product()
+        self.assertEqual(product['stock_quantity'], 40)
+        self.assertEqual(product['price'], 1200.5)
+        self.assertEqual(product['name'], 'Phone')
+
+    def test_new_product_needs_name_and_price(self):
+        outcomes = self.manager.upsert_products([
+            {'barcode': 'P2', 'price': 10},
+            {'barcode': 'P3', 'name': 'Charger'},
+            {'barcode': 'P4', 'name': 'Cable', 'price': 5},
+        ])
+
+        self.assertEqual([outcome['status'] for outcome in outcomes], ['rejected', 'rejected', 'inserted'])
+        self.assertEqual([outcome['error'] for outcome in outcomes[:2]], ["missing name", "missing price"])
+
+
+if __name__ == '__main__':
+    unittest.main()
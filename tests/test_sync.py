@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for branch sync conflict rules - which edit wins, deletes, and
+imported rows not being sent back
+
+Usage: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.db_manager import DatabaseManager
+
+
+class BranchSyncTest(unittest.TestCase):
+    """Two branches exchanging changesets through a shared directory"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shared = os.path.join(self.tmp.name, 'usb')
+        self.a = self.make_branch('a')
+        self.b = self.make_branch('b')
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+        self.tmp.cleanup()
+
+    def make_branch(self, name: str) -> DatabaseManager:
+        manager = DatabaseManager(os.path.join(self.tmp.name, name, 'shop.db'))
+        manager.initialize_database()
+        return manager
+
+    def send(self, source: DatabaseManager, target: DatabaseManager):
+        source.export_changeset(self.shared)
+        return target.import_changesets(self.shared)
+
+    def product_id(self, manager: DatabaseManager, barcode: str) -> int:
+        with manager.pool.reader() as conn:
+            return conn.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()[0]
+
+    def product_name(self, manager: DatabaseManager, barcode: str) -> str:
+        return manager.get_products_by_ids([self.product_id(manager, barcode)])[0]['name']
+
+    def rename(self, manager: DatabaseManager, barcode: str, name: str):
+        product = manager.get_products_by_ids([self.product_id(manager, barcode)])[0]
+        product['name'] = name
+        manager.update_product(product['id'], product)
+
+    def test_later_edit_wins_within_the_same_second(self):
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1'})
+        self.send(self.a, self.b)
+        # Values that would win a value comparison, edited first
+        self.rename(self.a, 'P1', 'Phone z')
+        self.send(self.a, self.b)
+        self.rename(self.b, 'P1', 'Phone a')
+        stats = self.send(self.b, self.a)
+
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(self.product_name(self.a, 'P1'), 'Phone a')
+        self.assertEqual(self.product_name(self.b, 'P1'), 'Phone a')
+
+    def test_concurrent_edits_converge(self):
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1'})
+        self.send(self.a, self.b)
+        self.rename(self.a, 'P1', 'Phone A')
+        self.rename(self.b, 'P1', 'Phone B')
+        for manager in (self.a, self.b):
+            with manager.pool.writer() as conn:
+                conn.execute("UPDATE products SET sync_clock = 1000")
+
+        self.send(self.a, self.b)
+        self.send(self.b, self.a)
+        self.assertEqual(self.product_name(self.a, 'P1'), self.product_name(self.b, 'P1'))
+
+    def test_imported_rows_are_not_sent_back(self):
+        # Past the first export, which carries every row
+        self.b.add_customer({'name': 'Omar', 'phone': '0500000002'})
+        self.b.export_changeset(self.shared)
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1'})
+        self.a.add_customer({'name': 'Ali', 'phone': '0500000001'})
+        self.send(self.a, self.b)
+
+        self.assertIsNone(self.b.export_changeset(self.shared))
+        self.rename(self.b, 'P1', 'Phone v2')
+        self.assertIsNotNone(self.b.export_changeset(self.shared))
+        self.assertEqual(self.a.import_changesets(self.shared)['updated'], 1)
+
+    def test_delete_reaches_other_branch(self):
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1'})
+        self.send(self.a, self.b)
+        with self.a.pool.writer() as conn:
+            conn.execute("DELETE FROM products WHERE barcode = 'P1'")
+
+        stats = self.send(self.a, self.b)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(self.b.get_products_by_ids([1]), [])
+
+    def test_delete_of_a_sold_product_is_a_logged_conflict(self):
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1', 'stock_quantity': 5})
+        self.send(self.a, self.b)
+        product_id = self.product_id(self.b, 'P1')
+        self.b.add_sale({'total_amount': 10, 'payment_method': 'cash'},
+                        [{'product_id': product_id, 'quantity': 1, 'unit_price': 10, 'total_price': 10}])
+        with self.a.pool.writer() as conn:
+            conn.execute("DELETE FROM products WHERE barcode = 'P1'")
+
+        with self.assertLogs('database.sync', 'WARNING'):
+            stats = self.send(self.a, self.b)
+        self.assertEqual(stats['conflicts'], 1)
+        self.assertEqual(self.product_name(self.b, 'P1'), 'Phone')
+
+    def test_unique_conflict_is_logged_and_kept(self):
+        self.a.add_product({'name': 'Phone', 'price': 10, 'barcode': 'P1'})
+        self.send(self.a, self.b)
+        self.b.add_product({'name': 'Charger', 'price': 5, 'barcode': 'P2'})
+        product = self.a.get_products_by_ids([self.product_id(self.a, 'P1')])[0]
+        product['barcode'] = 'P2'
+        self.a.update_product(product['id'], product)
+
+        with self.assertLogs('database.sync', 'WARNING'):
+            stats = self.send(self.a, self.b)
+        self.assertEqual(stats['conflicts'], 1)
+        self.assertEqual(self.product_name(self.b, 'P1'), 'Phone')
+        self.assertEqual(self.product_name(self.b, 'P2'), 'Charger')
+
+
+if __name__ == '__main__':
+    unittest.main()